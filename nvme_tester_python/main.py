@@ -15,6 +15,11 @@ from datetime import datetime
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from src.test_manager import TestManager
+from src.discovery import DeviceDiscovery
+from src.fleet import FleetRunner, STATUS_PASS, is_passing_result
+from src.scheduler import TestScheduler
+from src.latency import default_recorder
+from src.results_db import default_database
 
 class NVMeTestUI:
     """Interfaz de usuario para el sistema de testing NVMe"""
@@ -42,6 +47,7 @@ class NVMeTestUI:
         }
         self.serial_number = None
         self.device_path = None  # Agregar para almacenar la ruta del dispositivo
+        self.discovery = None  # Servicio de descubrimiento compartido entre escaneos
     
     def show_banner(self):
         """Muestra el banner principal de la aplicación"""
@@ -94,7 +100,7 @@ class NVMeTestUI:
                         if 0 <= device_index < len(auto_devices):
                             selected_device = auto_devices[device_index]
                             self.serial_number = selected_device['serial']
-                            self.device_path = selected_device['path']
+                            self.device_path = DeviceDiscovery.preferred_path(selected_device)
                             
                             print(f"\nDispositivo seleccionado:")
                             print(f"   Ruta: {self.device_path}")
@@ -121,58 +127,20 @@ class NVMeTestUI:
 
     def auto_detect_nvme_devices(self):
         """Detecta automáticamente dispositivos NVMe y obtiene sus números de serie"""
-        devices = []
-        
         try:
-            # Importar aquí para evitar problemas de inicialización
-            from src.nvme_wrapper import NvmeCommands
-            from src.logger import TestLogger
-            
-            # Crear logger temporal para la detección
-            temp_logger = TestLogger("auto_detection")
+            # Un solo servicio (y logger) para todos los re-escaneos
+            if self.discovery is None:
+                self.discovery = DeviceDiscovery()
             
-            # Buscar dispositivos NVMe en el sistema
-            nvme_paths = self.find_nvme_devices()
+            print("Escaneando dispositivos NVMe (sysfs)...")
+            devices = self.discovery.discover()
             
-            if not nvme_paths:
-                print("No se encontraron dispositivos NVMe en /dev/")
+            if not devices:
+                print("No se encontraron dispositivos NVMe")
                 return []
             
-            print(f"Escaneando {len(nvme_paths)} dispositivo(s) NVMe...")
-            
-            for device_path in nvme_paths:
-                try:
-                    print(f"   Consultando {device_path}...")
-                    
-                    # Crear instancia temporal del wrapper para este dispositivo
-                    nvme_wrapper = NvmeCommands(temp_logger, device=device_path)
-                    
-                    # Obtener información del controlador
-                    id_ctrl_result = nvme_wrapper.idctrol(json_output=True)
-                    
-                    if id_ctrl_result and isinstance(id_ctrl_result, dict):
-                        serial = id_ctrl_result.get('sn', '').strip()
-                        model = id_ctrl_result.get('mn', 'Unknown').strip()
-                        firmware = id_ctrl_result.get('fr', 'Unknown').strip()
-                        
-                        if serial:  # Solo agregar si tiene número de serie válido
-                            device_info = {
-                                'path': device_path,
-                                'serial': serial,
-                                'model': model,
-                                'firmware': firmware,
-                                'raw_data': id_ctrl_result
-                            }
-                            devices.append(device_info)
-                            print(f"      ✓ Detectado: {serial}")
-                        else:
-                            print(f"      ✗ Sin número de serie válido")
-                    else:
-                        print(f"      ✗ No se pudo obtener información")
-                        
-                except Exception as e:
-                    print(f"      ✗ Error consultando {device_path}: {str(e)}")
-                    continue
+            for device in devices:
+                print(f"   {device['path']}: ✓ Detectado: {device['serial']}")
         
         except Exception as e:
             print(f"Error durante la detección automática: {str(e)}")
@@ -180,47 +148,6 @@ class NVMeTestUI:
         
         return devices
 
-    def find_nvme_devices(self):
-        """Busca dispositivos NVMe en el sistema"""
-        nvme_devices = []
-        
-        try:
-            import glob
-            
-            # Buscar dispositivos NVMe principales (nvme0, nvme1, etc.)
-            nvme_pattern = "/dev/nvme[0-9]*"
-            potential_devices = glob.glob(nvme_pattern)
-            
-            # Filtrar solo dispositivos principales (no particiones)
-            for device in potential_devices:
-                # Solo dispositivos principales como /dev/nvme0, no /dev/nvme0n1
-                if device.endswith(('n1', 'n2', 'n3', 'n4', 'p1', 'p2', 'p3', 'p4')):
-                    continue
-                nvme_devices.append(device)
-            
-            # Si no encontramos dispositivos principales, buscar namespaces
-            if not nvme_devices:
-                namespace_pattern = "/dev/nvme[0-9]*n[0-9]*"
-                namespace_devices = glob.glob(namespace_pattern)
-                
-                # Tomar solo el primer namespace de cada dispositivo
-                seen_controllers = set()
-                for device in sorted(namespace_devices):
-                    # Extraer número de controlador (ej: nvme0 de nvme0n1)
-                    import re
-                    match = re.match(r'/dev/(nvme\d+)', device)
-                    if match:
-                        controller = match.group(1)
-                        if controller not in seen_controllers:
-                            nvme_devices.append(device)
-                            seen_controllers.add(controller)
-        
-            return sorted(nvme_devices)
-            
-        except Exception as e:
-            print(f"Error buscando dispositivos NVMe: {str(e)}")
-            return []
-
     def manual_serial_input(self):
         """Permite ingreso manual del número de serie"""
         print("\nINGRESO MANUAL DE NUMERO DE SERIE")
@@ -269,8 +196,9 @@ class NVMeTestUI:
         
         print("4. Ver información detallada de un test")
         print("5. Cambiar número de serie")
-        print("6. Ejecutar todos los tests (secuencial)")
+        print("6. Ejecutar todos los tests")
         print("7. Re-escanear dispositivos")
+        print("8. Ejecutar un test en todos los dispositivos (paralelo)")
         print("0. Salir")
         print("-" * 60)
     
@@ -363,13 +291,11 @@ class NVMeTestUI:
         print("="*70)
         print(f"Hora de inicio: {datetime.now().strftime('%H:%M:%S')}")
         
-        # Mostrar barra de progreso simulada
         print("\nPreparando ejecución...")
-        self.show_progress_bar("Inicializando", 3)
         
         try:
             # Crear y ejecutar el test
-            test_manager = TestManager(self.serial_number, test_name)
+            test_manager = TestManager(self.serial_number, test_name, device_path=self.device_path)
             
             if test_manager.test is None:
                 print(f"ERROR: No se pudo inicializar el test {test_name}")
@@ -407,8 +333,8 @@ class NVMeTestUI:
             return False
     
     def execute_all_tests(self):
-        """Ejecuta todos los tests secuencialmente"""
-        print(f"\nEJECUCION SECUENCIAL DE TODOS LOS TESTS")
+        """Ejecuta todos los tests, en paralelo cuando sus recursos son compatibles"""
+        print(f"\nEJECUCION DE TODOS LOS TESTS")
         print("="*70)
         print(f"Dispositivo: {self.serial_number}")
         print(f"Total de tests: {len(self.test_cases)}")
@@ -423,37 +349,79 @@ class NVMeTestUI:
             print("Ejecución cancelada")
             return
         
-        results = {}
         total_start = time.time()
+        test_names = [test['name'] for test in self.test_cases.values()]
         
-        for i, (key, test) in enumerate(self.test_cases.items(), 1):
-            print(f"\nEJECUTANDO TEST {i}/{len(self.test_cases)}: {test['name']}")
-            print("-" * 60)
-            
-            try:
-                result = self.execute_test(test['name'])
-                results[test['name']] = result
-                
-                if result:
-                    print(f"Test {test['name']} completado exitosamente")
-                else:
-                    print(f"Test {test['name']} falló")
-                    
-                # Pausa entre tests
-                if i < len(self.test_cases):
-                    print("\nPausa entre tests...")
-                    time.sleep(2)
-                    
-            except Exception as e:
-                print(f"Error en test {test['name']}: {e}")
-                results[test['name']] = False
+        def show_result(test_name, result, duration):
+            status = "completado exitosamente" if is_passing_result(result) else "falló"
+            print(f"Test {test_name} {status} ({duration:.2f}s)")
+        
+        # Las pruebas compatibles (p.ej. identify + SMART) corren a la vez; las destructivas, solas
+        print("\nPlanificando tests según los recursos que utilizan...")
+        scheduler = TestScheduler(self.serial_number, test_names, device_path=self.device_path)
+        try:
+            test_results = scheduler.run(on_result=show_result)
+        except Exception as e:
+            print(f"Error durante la ejecución: {e}")
+            test_results = []
+        results = {name: False for name in test_names}
+        results.update((name, is_passing_result(result)) for name, result in test_results)
         
         total_end = time.time()
         total_duration = total_end - total_start
         
         # Mostrar resumen final
         self.show_execution_summary(results, total_duration)
+        self.show_results_location(scheduler.session)
     
+    def execute_fleet_test(self):
+        """Ejecuta un test en todos los dispositivos detectados, un proceso por dispositivo"""
+        print(f"\nEJECUCION EN PARALELO (TODOS LOS DISPOSITIVOS)")
+        print("="*70)
+        for key, test in self.test_cases.items():
+            print(f"{key}. {test['name']}")
+        choice = input("Seleccione el test: ").strip()
+        if choice not in self.test_cases:
+            print("Opción inválida")
+            return
+        test_name = self.test_cases[choice]['name']
+
+        workers = input("Procesos simultáneos [8]: ").strip()
+        max_workers = int(workers) if workers.isdigit() and int(workers) > 0 else 8
+
+        if test_name == 'test_smart_log_healt':
+            print("\nADVERTENCIA: Este test ELIMINARA namespaces y FORMATEARA todos los dispositivos")
+        confirm = input(f"\n¿Ejecutar {test_name} en todos los dispositivos? (s/n): ").lower()
+        if confirm != 's':
+            print("Ejecución cancelada")
+            return
+
+        def show_result(report):
+            print(f"   [{report['status']}] {report['serial']} ({report['device']}) "
+                  f"{report['duration']:.2f}s")
+
+        summary = FleetRunner(test_name, max_workers=max_workers).run(on_result=show_result)
+
+        print(f"\nRESUMEN DE FLOTA: {test_name}")
+        print("="*70)
+        print(f"Dispositivos: {summary['total']}")
+        print(f"   Exitosos: {summary['passed']}")
+        print(f"   Fallidos: {summary['failed']}")
+        print(f"   Errores: {summary['errors']}")
+        print(f"Tiempo total: {summary['wall_time']:.2f}s (suma por dispositivo: {summary['device_time']:.2f}s)")
+        for report in summary['reports']:
+            if report['status'] != STATUS_PASS and report['error']:
+                print(f"   {report['serial']}: {report['error'].splitlines()[0]}")
+        self.show_results_location(summary['session'])
+
+    def show_results_location(self, session):
+        """Indica donde quedaron guardadas las ejecuciones de la sesion (src/results_db.py)"""
+        database = default_database()
+        if database is None:
+            return
+        runs = database.runs(session=session)
+        print(f"\nResultados guardados: {database.path} (sesión {session}, {len(runs)} ejecución(es))")
+
     def show_execution_summary(self, results, total_duration):
         """Muestra el resumen de ejecución de todos los tests"""
         print(f"\nRESUMEN FINAL DE EJECUCION")
@@ -479,15 +447,26 @@ class NVMeTestUI:
             print(f"\nTODOS LOS TESTS PASARON EXITOSAMENTE")
         else:
             print(f"\n{failed} test(s) fallaron. Revise los logs para más detalles.")
-    
-    def show_progress_bar(self, task_name, duration):
-        """Muestra una barra de progreso simulada"""
-        print(f"Procesando {task_name}...")
-        for i in range(duration):
-            time.sleep(1)
-            progress = "█" * (i + 1) + "░" * (duration - i - 1)
-            print(f"\r   [{progress}] {((i+1)/duration)*100:.0f}%", end="", flush=True)
-        print(" [COMPLETADO]")
+        self.show_latency_report()
+
+    def show_latency_report(self):
+        """Muestra los percentiles de latencia por comando y los exporta a logs/latency_<fecha>.json"""
+        recorder = default_recorder()
+        report = recorder.report()
+        if not report:
+            return
+        print(f"\nLATENCIA POR COMANDO (us):")
+        for device, opcodes in report.items():
+            print(f"   {device}")
+            for opcode, sources in opcodes.items():
+                for source, summary in sources.items():
+                    print(f"      {opcode:<14} {source:<4} n={summary['count']:<6} p50={summary['p50']:.1f} "
+                          f"p99={summary['p99']:.1f} p99.9={summary['p99.9']:.1f} max={summary['max']:.1f}")
+        log_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
+        os.makedirs(log_dir, exist_ok=True)
+        path = os.path.join(log_dir, f"latency_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        recorder.to_json(path, include_buckets=True)
+        print(f"   Reporte JSON: {path}")
     
     def run(self):
         """Ejecuta la interfaz de usuario principal"""
@@ -528,6 +507,10 @@ class NVMeTestUI:
                     print("\nRe-escaneando dispositivos...")
                     self.get_serial_number()
                 
+                elif choice == "8":
+                    self.execute_fleet_test()
+                    input("\nPresione Enter para continuar...")
+                
                 else:
                     print("Opción inválida. Seleccione una opción del menú.")
                     time.sleep(2)
@@ -1,12 +1,23 @@
 import re
 import sys
+import os
+import tempfile
 from subprocess import Popen, PIPE
 import subprocess
 
+from .launcher import default_launcher
+
 CONST_TIMEOUT_LIMIT = 120  # 2 mins
 SECONDS_TO_MILISECONS = 1000  # second to miliseconds
 CONST_NVME = "nvme"
+NVME_CLI_ENV = "NVME_CLI"  # Binario alternativo de nvme-cli (p.ej. utils/nvme_emulator.py)
 ADMIN_CMD = 'admin-passthru'
+IO_CMD = 'io-passthru'
+
+# Command Dword 0 flags (FUSE bits 1:0, PSDT bits 7:6)
+FUSE_FLAG_MASK = 0x3
+PSDT_FLAG_BIT = 6
+PSDT_FLAG_MASK = 0x3
 
 # NVMe Command
 DW0 = "DW0"
@@ -36,6 +47,14 @@ PRP2A = "PRP2A"
 PRP2B = "PRP2B"
 MPTRA = "MPTRA"
 MPTRB = "MPTRB"
+LATENCY = "LATENCY"
+
+# nvme-cli --latency line: "<Admin|IO> Command <name> latency: N us"
+LATENCY_PATTERN = re.compile(r"latency: (\d+) us")
+LATENCY_LINE_PATTERN = re.compile(rb"^[^\n]*latency: (\d+) us\n")
+# Longest latency line expected at the start of stdout
+LATENCY_LINE_MAX_LEN = 256
+MICROSECONDS_TO_MILISECONDS = 1000
 
 # NVMe completion error
 SQHP_BIT = 0
@@ -140,7 +159,16 @@ class CompletionQueueEntry(object):
         self.phase_tag = (self.dw3 >> PBIT_BIT) & PBIT_MASK
         self.cid = (self.dw3 >> COMP_CID_BIT) & COMP_CID_MASK
 
+        if isinstance(data_buffer, (bytes, bytearray, memoryview)):
+            # Raw path: the buffer is exposed as a memoryview without intermediate copies
+            self.latency, self.data_buffer = self.extract_latency_from_bytes(data_buffer)
+            if status.get(LATENCY) is not None:
+                self.latency = status[LATENCY]
+            return
+
         self.latency, self.data_buffer = self.extract_latency_from_buffer(data_buffer)
+        if status.get(LATENCY) is not None:
+            self.latency = status[LATENCY]
 
         # data_buffer is sometimes too long of an int (i.e. 1024 digits) which causes the conversion to bytearray to fail
         # To avoid this, we need to convert it to string
@@ -159,6 +187,22 @@ class CompletionQueueEntry(object):
         elif self.data_buffer is not None and not isinstance(self.data_buffer, bytearray):
             self.data_buffer = bytearray(self.data_buffer)
 
+    def extract_latency_from_bytes(self, output):
+        """
+        Binary-safe variant of extract_latency_from_buffer: only the first line is inspected
+        (older nvme-cli prints the latency line on stdout before the raw data).
+        Returns (latency in ms or None, memoryview of the data).
+        """
+        latency = None
+        view = output if isinstance(output, memoryview) else memoryview(output)
+        if view.format != "B" or view.ndim != 1:
+            view = view.cast("B")
+        match = LATENCY_LINE_PATTERN.match(view[:LATENCY_LINE_MAX_LEN].tobytes())
+        if match is not None:
+            latency = int(match.group(1)) / MICROSECONDS_TO_MILISECONDS
+            view = view[match.end():]
+        return latency, view
+
     def extract_latency_from_buffer(self, output):
         latency = None
         data_buffer = output
@@ -179,7 +223,17 @@ class CompletionQueueEntry(object):
         return latency, data_buffer
 
 
+def nvme_cli_path():
+    """Binario de nvme-cli a ejecutar: NVME_CLI si esta definido, si no "nvme"."""
+    return os.environ.get(NVME_CLI_ENV) or CONST_NVME
+
+
 class AdminPassthru():
+    def __init__(self, transport=None, launcher=None):
+        # transport: objeto con metodo submit() (ver src/transport.py); None usa el transporte por defecto
+        self.transport = transport
+        # launcher: lanzador de nvme-cli (ver src/launcher.py); None usa el lanzador compartido
+        self.launcher = launcher or default_launcher()
 
     def obtain_status_code(self, stdout_txt, stderr):
         status = {}
@@ -188,6 +242,7 @@ class AdminPassthru():
         dword1 = 0
         dword2 = 0
         dword3 = 0
+        latency = None
 
         if stdout_txt != "":
             try:
@@ -211,24 +266,32 @@ class AdminPassthru():
             except:
                 pass
 
+            match = LATENCY_PATTERN.search(stderr)
+            if match is not None:
+                latency = int(match.group(1)) / MICROSECONDS_TO_MILISECONDS
+
         status[DW0] = dword0
         status[DW1] = dword1
         status[DW2] = dword2
         status[DW3] = dword3
+        status[LATENCY] = latency
 
         return status
 
-    def run_cmd(self, cmd):
+    def run_cmd(self, cmd, binary_output=False):
         try:
-            run_cmd = subprocess.run(cmd, capture_output=True, text=False, check=True)
-            # return run_cmd.stdout
-            # stdout_byte.decode(encoding=sys.stdout.encoding, errors="replace")
+            # Sin check: un status NVMe distinto de cero sale con returncode != 0 y se parsea igual
+            run_cmd = self.launcher.run(cmd)
             returncode = run_cmd.returncode
-            stdout_txt = run_cmd.stdout.decode(encoding=sys.stdout.encoding, errors="replace")
             stderr_txt = run_cmd.stderr.decode(encoding=sys.stdout.encoding, errors="replace")
+            if binary_output:
+                # Raw data (-b): stdout stays bytes and status/latency come from stderr only
+                status_dwords = self.obtain_status_code("", stderr_txt)
+                return run_cmd.stdout, stderr_txt, returncode, status_dwords
+            stdout_txt = run_cmd.stdout.decode(encoding=sys.stdout.encoding, errors="replace")
             status_dwords = self.obtain_status_code(stdout_txt, stderr_txt)
             return stdout_txt, stderr_txt, returncode, status_dwords
-        except subprocess.CalledProcessError as e:
+        except (subprocess.SubprocessError, OSError) as e:
             print(f"Error ejecutando el comando: {e}")
             return None
 
@@ -236,7 +299,7 @@ class AdminPassthru():
                        cdw11=None, cdw12=None, cdw13=None, cdw14=None, cdw15=None, data_len=None, metadata_len=None,
                        input_file=None, read=None, show_command=None, dry_run=None, raw_binary=None,
                        prefill=None, write=None, latency=None, use_controller_path=False, device_path=None,
-                       stdin_data=None):
+                       stdin_data=None, passthru_cmd=ADMIN_CMD):
 
         timeout = CONST_TIMEOUT_LIMIT * SECONDS_TO_MILISECONS  # Converting to miliseconds
 
@@ -266,7 +329,7 @@ class AdminPassthru():
             '-T': latency
         }
 
-        command = [ CONST_NVME, ADMIN_CMD, device_path ]
+        command = [ nvme_cli_path(), passthru_cmd, device_path ]
 
         for param in params:
             if params[param] is None:
@@ -275,7 +338,7 @@ class AdminPassthru():
             command.append(str(params[param]))
 
 
-        output, err, returncode, status_dwords = self.run_cmd(command)
+        output, err, returncode, status_dwords = self.run_cmd(command, binary_output=raw_binary is not None)
 
         if returncode:
             match = re.match(r'NVMe command result:(\d+)', err)
@@ -284,3 +347,74 @@ class AdminPassthru():
                 print(f"Error: {err}")
                 print(f"Output: {output}")
         return output, err, returncode, status_dwords
+
+    def submit_sqe(self, sqe, device_path, data_len=None, read=False, write=False, io=False):
+        """
+        Envia un SubmissionQueueEntry por el transporte configurado.
+
+        Args:
+            sqe (SubmissionQueueEntry): Comando a enviar
+            device_path (str): Ruta del controlador o namespace
+            data_len (int): Tamano del buffer de datos en bytes
+            read (bool): El comando transfiere datos del dispositivo al host
+            write (bool): El comando transfiere sqe.data_buffer al dispositivo
+            io (bool): True para comandos de I/O, False para comandos admin
+
+        Returns:
+            CompletionQueueEntry: Resultado del comando
+        """
+        if self.transport is None:
+            # Import diferido: src/transport.py importa este modulo
+            from .transport import default_transport
+            self.transport = default_transport()
+        return self.transport.submit(device_path, sqe, data_len=data_len, read=read, write=write, io=io)
+
+    def submit_cli(self, sqe, device_path, data_len=None, read=False, write=False, io=False):
+        """
+        Ejecuta un SubmissionQueueEntry con nvme-cli (admin-passthru / io-passthru).
+        Es el camino de respaldo cuando no hay transporte nativo disponible.
+        """
+        flags = None
+        if sqe.FUSE is not None or sqe.PSDT is not None:
+            flags = (sqe.FUSE or 0) & FUSE_FLAG_MASK
+            flags |= ((sqe.PSDT or 0) & PSDT_FLAG_MASK) << PSDT_FLAG_BIT
+
+        input_file = None
+        if write and sqe.data_buffer:
+            with tempfile.NamedTemporaryFile(mode='w+b', delete=False) as temp_file:
+                temp_file.write(sqe.data_buffer)
+                input_file = temp_file.name
+            if data_len is None:
+                data_len = len(sqe.data_buffer)
+
+        try:
+            output, err, return_code, status_dwords = self.admin_passthru(opcode=sqe.OPC,
+                                                                          flags=flags,
+                                                                          namespace_id=sqe.NSID,
+                                                                          cdw2=sqe.DW2,
+                                                                          cdw3=sqe.DW3,
+                                                                          cdw10=sqe.DW10,
+                                                                          cdw11=sqe.DW11,
+                                                                          cdw12=sqe.DW12,
+                                                                          cdw13=sqe.DW13,
+                                                                          cdw14=sqe.DW14,
+                                                                          cdw15=sqe.DW15,
+                                                                          use_controller_path=True,
+                                                                          latency=True,
+                                                                          raw_binary=True if read else None,
+                                                                          read=True if read else None,
+                                                                          write=True if write else None,
+                                                                          input_file=input_file,
+                                                                          data_len=data_len,
+                                                                          device_path=device_path,
+                                                                          passthru_cmd=IO_CMD if io else ADMIN_CMD)
+        finally:
+            if input_file is not None:
+                try:
+                    os.unlink(input_file)
+                except OSError:
+                    pass
+
+        cqe = CompletionQueueEntry()
+        cqe.populate_cqe(status_dwords, output)
+        return cqe
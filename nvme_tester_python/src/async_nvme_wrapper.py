@@ -0,0 +1,290 @@
+"""
+Variante asyncio de NvmeCommands.
+
+AsyncNvmeCommands reutiliza la construccion de comandos de NvmeCommands (smart_log, idctrol,
+id_ns, read, write, format_ns, ...) pero cada metodo devuelve una corrutina: el proceso nvme-cli
+se lanza con asyncio.create_subprocess_exec y los comandos passthru se envian por el transporte
+nativo en un executor. Un semaforo por dispositivo limita los comandos simultaneos sobre el
+mismo controlador, de modo que un solo event loop puede manejar cientos de comandos en muchos
+dispositivos. Los logs leidos por tramos (get_log, error_log, telemetry_log, ...), las esperas
+de estado (wait_*) y monitor() usan codigo bloqueante y se ejecutan en un hilo con
+asyncio.to_thread.
+
+Ejemplo:
+    results = asyncio.run(run_on_devices(logger, ["/dev/nvme0", "/dev/nvme1"], "smart_log",
+                                         json_output=True))
+"""
+import asyncio
+import functools
+import locale
+import time
+import weakref
+
+from .nvme_wrapper import NvmeCommands
+from .transport import default_transport
+from .identify_cache import INVALIDATING_OPCODES
+
+DEFAULT_DEVICE_CONCURRENCY = 4
+DEFAULT_COMMAND_TIMEOUT = 120  # segundos, igual que CONST_TIMEOUT_LIMIT de admin-passthru
+
+# Semaforos por event loop y dispositivo (asyncio.Semaphore queda ligado al loop donde se usa)
+_device_semaphores = weakref.WeakKeyDictionary()
+
+
+def device_semaphore(device, limit=DEFAULT_DEVICE_CONCURRENCY):
+    """
+    Devuelve el semaforo compartido de un dispositivo en el event loop actual.
+
+    Args:
+        device (str): Ruta del dispositivo
+        limit (int): Comandos simultaneos permitidos (solo se aplica al crear el semaforo)
+
+    Returns:
+        asyncio.Semaphore: Semaforo del dispositivo
+    """
+    loop = asyncio.get_running_loop()
+    semaphores = _device_semaphores.setdefault(loop, {})
+    semaphore = semaphores.get(device)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(limit)
+        semaphores[device] = semaphore
+    return semaphore
+
+
+class _SyncCommands(object):
+    """
+    Vista sincrona de un AsyncNvmeCommands: los metodos se resuelven en NvmeCommands (idctrol,
+    passthru, _execute... sin corrutinas) y el estado (dispositivo, transporte, cache de
+    identify, logger) es el del objeto asincrono. La usa el codigo bloqueante que corre en un
+    hilo aparte, como LogPageReader.
+    """
+    __slots__ = ("_nvme",)
+
+    def __init__(self, nvme):
+        object.__setattr__(self, "_nvme", nvme)
+
+    def __getattr__(self, name):
+        for klass in NvmeCommands.__mro__:
+            if name in klass.__dict__:
+                attribute = klass.__dict__[name]
+                if hasattr(attribute, "__get__"):
+                    return attribute.__get__(self, NvmeCommands)
+                break
+        return getattr(self._nvme, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._nvme, name, value)
+
+
+def _in_thread(method, bounded=True):
+    """
+    Version asincrona de un metodo bloqueante de NvmeCommands: corre en un hilo sobre _SyncCommands.
+
+    Con bounded=True ocupa el semaforo del dispositivo y aplica self.timeout como los demas
+    comandos; las esperas de estado (wait_*) y monitor() tienen su propio deadline y no
+    retienen el semaforo mientras sondean.
+    """
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        call = asyncio.to_thread(method, _SyncCommands(self), *args, **kwargs)
+        if not bounded:
+            return await call
+        async with device_semaphore(self.device, self.max_concurrency):
+            try:
+                return await asyncio.wait_for(call, timeout=self.timeout)
+            except asyncio.TimeoutError:
+                self.logger.error(f"{method.__name__} timed out on {self.device}")
+                return None
+    return wrapper
+
+
+class AsyncNvmeCommands(NvmeCommands):
+    """
+    Misma API que NvmeCommands; todos los metodos de comando devuelven corrutinas.
+    """
+    def __init__(self, logger, device="/dev/nvme0", nvme_cli=None, transport=None,
+                 max_concurrency=DEFAULT_DEVICE_CONCURRENCY, timeout=DEFAULT_COMMAND_TIMEOUT,
+                 identify_cache=True, identify_ttl=None):
+        """
+        Args:
+            logger (TestLogger): Logger de la prueba
+            device (str): Ruta del dispositivo
+            nvme_cli (str): Binario de nvme-cli (None = NVME_CLI o "nvme")
+            transport (NvmeTransport): Transporte para passthru (None usa el de por defecto)
+            max_concurrency (int): Comandos simultaneos por dispositivo
+            timeout (float): Deadline por comando en segundos (None = sin limite)
+            identify_cache (bool): Cachear id-ctrl / id-ns / list-ns (ver src/identify_cache.py)
+            identify_ttl (float): Validez de una entrada en segundos (None = hasta invalidarla)
+        """
+        super().__init__(logger, device=device, nvme_cli=nvme_cli, transport=transport,
+                         identify_cache=identify_cache, identify_ttl=identify_ttl)
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+
+    def _execute(self, cmd, json_output=False, label=None):
+        return self._execute_async(cmd, json_output, label)
+
+    async def _execute_async(self, cmd, json_output=False, label=None):
+        cache, key, generation, output = self._cache_lookup(cmd)
+        if output is None:
+            output = await self.run_command_async(cmd)
+            self._cache_update(cmd, cache, key, generation, output)
+        return self._parse_output(output, json_output, label)
+
+    async def lba_formats(self, nsid=None):
+        return self._lba_formats(await self.id_ns(nsid=nsid, json_output=True))
+
+    # Los logs por tramos (LogPageReader / TelemetryCapture) son bloqueantes: se leen en un hilo
+    get_log = _in_thread(NvmeCommands.get_log)
+    error_log = _in_thread(NvmeCommands.error_log)
+    fw_log = _in_thread(NvmeCommands.fw_log)
+    effects_log = _in_thread(NvmeCommands.effects_log)
+    endurance_log = _in_thread(NvmeCommands.endurance_log)
+    predictable_lat_log = _in_thread(NvmeCommands.predictable_lat_log)
+    telemetry_log = _in_thread(NvmeCommands.telemetry_log)
+    changed_ns_list_log = _in_thread(NvmeCommands.changed_ns_list_log)
+    persistent_event_log = _in_thread(NvmeCommands.persistent_event_log)
+    sanitize_log = _in_thread(NvmeCommands.sanitize_log)
+
+    # Las esperas de estado y el arranque del monitor sondean el dispositivo de forma bloqueante
+    wait_namespace_ready = _in_thread(NvmeCommands.wait_namespace_ready, bounded=False)
+    wait_namespaces_deleted = _in_thread(NvmeCommands.wait_namespaces_deleted, bounded=False)
+    wait_format_complete = _in_thread(NvmeCommands.wait_format_complete, bounded=False)
+    monitor = _in_thread(NvmeCommands.monitor, bounded=False)
+
+    def _direct_io(self, *args):
+        return self._direct_io_async(*args)
+
+    async def _direct_io_async(self, *args):
+        loop = asyncio.get_running_loop()
+        async with device_semaphore(self.device, self.max_concurrency):
+            return await loop.run_in_executor(None, functools.partial(NvmeCommands._direct_io, self, *args))
+
+    async def run_command_async(self, cmd, timeout=None):
+        """
+        Equivalente asincrono de run_command.
+
+        Args:
+            cmd (list): Comando nvme-cli completo
+            timeout (float): Deadline en segundos; por defecto self.timeout
+
+        Returns:
+            str: stdout del comando, None si falla o vence el deadline.
+            Si la tarea se cancela, el proceso se termina y se propaga CancelledError.
+        """
+        if timeout is None:
+            timeout = self.timeout
+        command = " ".join(str(part) for part in cmd)
+        async with device_semaphore(self.device, self.max_concurrency):
+            self.logger.info("Executing command: %s", command)
+            start = time.perf_counter()
+            process = await asyncio.create_subprocess_exec(*[str(part) for part in cmd],
+                                                           stdout=asyncio.subprocess.PIPE,
+                                                           stderr=asyncio.subprocess.PIPE)
+            try:
+                stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
+            except asyncio.TimeoutError:
+                await self._kill(process)
+                self.logger.warning(f"Command timed out after {timeout}s: {command}")
+                self.logger.count(self._command_key(cmd), ok=False)
+                return None
+            except asyncio.CancelledError:
+                await self._kill(process)
+                raise
+
+        elapsed = time.perf_counter() - start
+        encoding = locale.getpreferredencoding(False)
+        stdout = stdout.decode(encoding, errors="replace")
+        if process.returncode != 0:
+            self._log_command_failure(cmd, command, process.returncode, stdout,
+                                      stderr.decode(encoding, errors="replace"))
+            return None
+        self._record_latency(cmd, elapsed, stdout, stderr.decode(encoding, errors="replace"))
+        return stdout
+
+    @staticmethod
+    async def _kill(process):
+        if process.returncode is None:
+            try:
+                process.kill()
+            except ProcessLookupError:
+                pass
+            await process.wait()
+
+    async def passthru(self, sqe, data_len=None, read=False, write=False, io=False):
+        """
+        Equivalente asincrono de NvmeCommands.passthru: el ioctl (o nvme-cli de respaldo)
+        se ejecuta en el executor por defecto del loop, respetando el semaforo del dispositivo.
+        """
+        if self.transport is None:
+            self.transport = default_transport()
+        submit = functools.partial(self.transport.submit, self.device, sqe,
+                                   data_len=data_len, read=read, write=write, io=io)
+        async with device_semaphore(self.device, self.max_concurrency):
+            loop = asyncio.get_running_loop()
+            try:
+                return await asyncio.wait_for(loop.run_in_executor(None, submit), timeout=self.timeout)
+            except asyncio.TimeoutError:
+                self.logger.error(f"Passthru command opcode={sqe.OPC} timed out on {self.device}")
+                return None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Passthru command opcode={sqe.OPC} failed on {self.device}: {e}")
+                return None
+            finally:
+                if not io and sqe.OPC in INVALIDATING_OPCODES:
+                    self.invalidate_identify_cache()
+
+
+async def gather_limited(coros, limit=None, return_exceptions=True):
+    """
+    asyncio.gather con un limite global opcional de corrutinas activas.
+
+    Args:
+        coros (iterable): Corrutinas a ejecutar
+        limit (int): Maximo de corrutinas simultaneas (None = sin limite global)
+        return_exceptions (bool): Devolver excepciones como resultado en vez de propagarlas
+
+    Returns:
+        list: Resultados en el mismo orden que coros
+    """
+    coros = list(coros)
+    if limit is None:
+        return await asyncio.gather(*coros, return_exceptions=return_exceptions)
+
+    semaphore = asyncio.Semaphore(limit)
+
+    async def _limited(coro):
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*[_limited(coro) for coro in coros], return_exceptions=return_exceptions)
+
+
+async def run_on_devices(logger, devices, method, *args, max_concurrency=DEFAULT_DEVICE_CONCURRENCY,
+                         timeout=DEFAULT_COMMAND_TIMEOUT, deadline=None, **kwargs):
+    """
+    Ejecuta el mismo comando en varios dispositivos a la vez.
+
+    Args:
+        logger (TestLogger): Logger compartido
+        devices (list): Rutas de los dispositivos
+        method (str): Nombre del metodo de AsyncNvmeCommands (p.ej. "smart_log")
+        max_concurrency (int): Comandos simultaneos por dispositivo
+        timeout (float): Deadline por comando en segundos
+        deadline (float): Deadline global en segundos; los comandos pendientes se cancelan
+        *args, **kwargs: Argumentos del metodo
+
+    Returns:
+        dict: {device: resultado o excepcion}
+    """
+    wrappers = [AsyncNvmeCommands(logger, device=device, max_concurrency=max_concurrency, timeout=timeout)
+                for device in devices]
+    tasks = [asyncio.ensure_future(getattr(wrapper, method)(*args, **kwargs)) for wrapper in wrappers]
+    try:
+        results = await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), timeout=deadline)
+    except asyncio.TimeoutError:
+        results = [(task.exception() or task.result()) if task.done() and not task.cancelled()
+                   else asyncio.TimeoutError() for task in tasks]
+    return dict(zip(devices, results))
@@ -0,0 +1,289 @@
+"""
+Esquemas declarativos de las opciones de cada subcomando de nvme-cli.
+
+Cada subcomando declara sus opciones una sola vez: nombre del argumento en Python, opcion de
+nvme-cli y tipo (INT, STR o FLAG). CommandSchema valida los valores, omite los que valen el
+default (None / False) y arma el argv a partir de plantillas compiladas y cacheadas por conjunto
+de opciones presentes, de modo que construir un comando es copiar una lista y formatear solo los
+valores.
+
+Para lazos que repiten miles de comandos de la misma forma, prepare() fija y formatea una vez
+las opciones constantes; cada llamada a argv() formatea solo las que cambian:
+
+    prepared = NVME_COMMANDS["write"].prepare("nvme", "/dev/nvme0n1", namespace_id=1, data_size=4096,
+                                              data="/tmp/block.bin")
+    for lba in range(1000):
+        subprocess.run(prepared.argv(start_block=lba))
+"""
+import threading
+
+INT = "int"
+STR = "str"
+FLAG = "flag"
+
+
+class Option(object):
+    __slots__ = ("name", "flag", "kind", "default")
+
+    def __init__(self, name, flag, kind=INT, default=None):
+        """
+        Args:
+            name (str): Argumento en Python (namespace_id)
+            flag (str): Opcion de nvme-cli (--namespace-id); en FLAG, el token completo
+            kind (str): INT (int o cadena numerica "0xFFFFFFFF"), STR o FLAG
+            default: Valor que se omite del argv
+        """
+        self.name = name
+        self.flag = flag
+        self.kind = kind
+        self.default = False if kind == FLAG and default is None else default
+
+    def format(self, value, subcommand):
+        """Valida y formatea un valor; ValueError si no corresponde al tipo declarado."""
+        if self.kind == INT:
+            if isinstance(value, bool):
+                raise ValueError(f"{subcommand}: option '{self.name}' expects an integer, got {value!r}")
+            if isinstance(value, int):
+                return str(value)
+            try:
+                int(str(value), 0)
+            except ValueError:
+                raise ValueError(f"{subcommand}: option '{self.name}' expects an integer, got {value!r}") from None
+        return str(value)
+
+
+def options(*declarations):
+    """Tupla de Option desde (nombre, opcion[, tipo[, default]])."""
+    return tuple(Option(*declaration) for declaration in declarations)
+
+
+class CommandSchema(object):
+    def __init__(self, subcommand, declarations, device=True):
+        """
+        Args:
+            subcommand (str): Subcomando de nvme-cli ("read", "create-ns"...)
+            declarations (iterable): Option en el orden en que se emiten
+            device (bool): El subcomando recibe la ruta del dispositivo como posicional
+        """
+        self.subcommand = subcommand
+        self.options = {option.name: option for option in declarations}
+        self.order = {name: index for index, name in enumerate(self.options)}
+        self.device = device
+        self.prefix = 3 if device else 2
+        self._templates = {}
+        self._lock = threading.Lock()
+
+    def _present(self, values):
+        """Nombres de las opciones con valor distinto del default (TypeError si alguna no existe)."""
+        present = []
+        for name, value in values.items():
+            option = self.options.get(name)
+            if option is None:
+                raise TypeError(f"{self.subcommand}: unknown option '{name}'")
+            if value is not None and value is not option.default and value != option.default:
+                present.append(name)
+        return frozenset(present)
+
+    def _compile(self, variable, fixed=None):
+        """
+        Plantilla del argv para un conjunto de opciones.
+
+        Args:
+            variable (frozenset): Opciones cuyo valor se formatea en cada llamada
+            fixed (dict): Opciones ya formateadas {nombre: [tokens]}
+
+        Returns:
+            tuple: (argv con None en los huecos, ((indice, Option), ...))
+        """
+        fixed = fixed or {}
+        argv = [None, self.subcommand] + ([None] if self.device else [])
+        slots = []
+        for name in sorted(variable | set(fixed), key=self.order.__getitem__):
+            if name in fixed:
+                argv.extend(fixed[name])
+                continue
+            option = self.options[name]
+            argv.append(option.flag)
+            if option.kind != FLAG:
+                slots.append((len(argv), option))
+                argv.append(None)
+        return argv, tuple(slots)
+
+    def _template(self, present):
+        template = self._templates.get(present)
+        if template is None:
+            with self._lock:
+                template = self._templates.setdefault(present, self._compile(present))
+        return template
+
+    def build(self, nvme_cli, device=None, **values):
+        """
+        Returns:
+            list: argv completo [nvme_cli, subcomando, dispositivo, opciones...]
+        """
+        template, slots = self._template(self._present(values))
+        argv = template.copy()
+        argv[0] = nvme_cli
+        if self.device:
+            argv[2] = device
+        subcommand = self.subcommand
+        for index, option in slots:
+            argv[index] = option.format(values[option.name], subcommand)
+        return argv
+
+    def arguments(self, **values):
+        """Solo las opciones (sin binario, subcomando ni dispositivo)."""
+        return self.build(None, None, **values)[self.prefix:]
+
+    def prepare(self, nvme_cli, device=None, **fixed):
+        """
+        Fija las opciones que no cambian entre llamadas (se validan y formatean una vez).
+
+        Returns:
+            PreparedCommand: Constructor de argv para las opciones restantes
+        """
+        return PreparedCommand(self, nvme_cli, device, fixed)
+
+
+class PreparedCommand(object):
+    """Comando con opciones fijas ya formateadas; argv() solo formatea las variables."""
+    def __init__(self, schema, nvme_cli, device, fixed):
+        self.schema = schema
+        self.nvme_cli = nvme_cli
+        self.device = device
+        self.fixed = dict(fixed)
+        self._formatted = {}
+        for name in schema._present(fixed):
+            option = schema.options[name]
+            self._formatted[name] = ([option.flag] if option.kind == FLAG
+                                     else [option.flag, option.format(fixed[name], schema.subcommand)])
+        self._templates = {}
+
+    @property
+    def subcommand(self):
+        return self.schema.subcommand
+
+    def argv(self, **values):
+        """
+        Returns:
+            list: argv completo con las opciones fijas y las indicadas en esta llamada
+        """
+        schema = self.schema
+        present = schema._present(values)
+        template = self._templates.get(present)
+        if template is None:
+            overlap = present & self._formatted.keys()
+            if overlap:
+                raise TypeError(f"{schema.subcommand}: options {sorted(overlap)} are fixed by prepare()")
+            argv, slots = schema._compile(present, self._formatted)
+            argv[0] = self.nvme_cli
+            if schema.device:
+                argv[2] = self.device
+            template = self._templates[present] = (argv, slots)
+        argv, slots = template
+        argv = argv.copy()
+        subcommand = schema.subcommand
+        for index, option in slots:
+            argv[index] = option.format(values[option.name], subcommand)
+        return argv
+
+
+LOG_OPTIONS = options(
+    ("verbose", "-v", FLAG),
+    ("json_output", "--output-format=json", FLAG),
+    ("binary_raw", "-b", FLAG),
+)
+
+GENERAL_OPTIONS = options(
+    ("nsid", "-n"),
+    ("controllers", "-c", STR),
+    ("json_output", "--output-format=json", FLAG),
+    ("verbose", "-v", FLAG),
+)
+
+NAMESPACE_CONFIG_OPTIONS = options(
+    ("nsze", "--nsze"),
+    ("ncap", "--ncap"),
+    ("flbas", "--flbas"),
+    ("dps", "--dps"),
+    ("nmic", "--nmic"),
+    ("anagrp_id", "--anagrp-id"),
+    ("nvmset_id", "--nvmset-id"),
+    ("endg_id", "--endg-id"),
+    ("csi", "--csi"),
+    ("lbstm", "--lbstm"),
+    ("nphndls", "--nphndls"),
+    ("block_size", "--block-size"),
+    ("timeout", "--timeout"),
+    ("nsze_si", "--nsze-si", STR),
+    ("ncap_si", "--ncap-si", STR),
+    ("azr", "--azr", FLAG),
+    ("rar", "--rar"),
+    ("ror", "--ror"),
+    ("rnumzrwa", "--rnumzrwa"),
+    ("phndls", "--phndls", STR),
+)
+
+IO_OPTIONS = options(
+    ("namespace_id", "--namespace-id"),
+    ("start_block", "--start-block"),
+    ("block_count", "--block-count"),
+    ("data_size", "--data-size"),
+    ("metadata_size", "--metadata-size"),
+    ("ref_tag", "--ref-tag"),
+    ("data", "--data", STR),
+    ("metadata", "--metadata", STR),
+    ("prinfo", "--prinfo"),
+    ("app_tag_mask", "--app-tag-mask"),
+    ("app_tag", "--app-tag"),
+    ("limited_retry", "--limited-retry", FLAG),
+    ("force_unit_access", "--force-unit-access", FLAG),
+    ("dir_type", "--dir-type"),
+    ("dir_spec", "--dir-spec"),
+    ("dsm", "--dsm"),
+    ("show_command", "--show-command", FLAG),
+    ("dry_run", "--dry-run", FLAG),
+    ("latency", "--latency", FLAG),
+    ("storage_tag", "--storage-tag"),
+    ("storage_tag_check", "--storage-tag-check", FLAG),
+    ("force", "--force", FLAG),
+    ("timeout", "--timeout"),
+) + LOG_OPTIONS
+
+FORMAT_OPTIONS = options(
+    ("nsid", "--namespace-id"),
+    ("lbaf", "--lbaf"),
+    ("block_size", "--block-size"),
+    ("ses", "--ses"),
+    ("pil", "--pil"),
+    ("pi", "--pi"),
+    ("ms", "--ms"),
+    ("reset", "--reset", FLAG),
+    ("force", "--force", FLAG),
+    ("timeout", "--timeout"),
+) + LOG_OPTIONS
+
+NVME_COMMANDS = {schema.subcommand: schema for schema in (
+    CommandSchema("list", LOG_OPTIONS),
+    CommandSchema("smart-log", LOG_OPTIONS),
+    CommandSchema("id-ctrl", LOG_OPTIONS),
+    CommandSchema("id-ns", GENERAL_OPTIONS),
+    CommandSchema("list-ns", GENERAL_OPTIONS + options(("all_namespaces", "--all", FLAG))),
+    CommandSchema("set-feature", GENERAL_OPTIONS),
+    CommandSchema("get-property", GENERAL_OPTIONS),
+    CommandSchema("set-property", GENERAL_OPTIONS),
+    CommandSchema("attach-ns", GENERAL_OPTIONS),
+    CommandSchema("detach-ns", GENERAL_OPTIONS),
+    CommandSchema("create-ns", NAMESPACE_CONFIG_OPTIONS + options(
+        ("json_output", "--output-format=json", FLAG), ("verbose", "-v", FLAG))),
+    CommandSchema("delete-ns", GENERAL_OPTIONS),
+    CommandSchema("ns-rescan", ()),
+    CommandSchema("read", IO_OPTIONS),
+    CommandSchema("write", IO_OPTIONS),
+    CommandSchema("format", FORMAT_OPTIONS),
+)}
+
+# Esquemas de los metodos parametrize* de NvmeCommands (solo opciones)
+LOG_SCHEMA = CommandSchema(None, LOG_OPTIONS, device=False)
+GENERAL_SCHEMA = CommandSchema(None, GENERAL_OPTIONS, device=False)
+NAMESPACE_CONFIG_SCHEMA = CommandSchema(None, NAMESPACE_CONFIG_OPTIONS, device=False)
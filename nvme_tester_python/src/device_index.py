@@ -0,0 +1,153 @@
+"""
+Indice persistente numero de serie -> dispositivo.
+
+Guarda en disco (cache/device_index.json) la ruta del controlador, namespaces, direccion PCI,
+modelo y firmware de cada drive descubierto. Una busqueda es un acceso a dict mas una
+revalidacion barata (serial en sysfs e inodo/ctime del nodo /dev/nvmeX); el indice solo se
+regenera cuando se detecta un hotplug o un cambio de nombre.
+"""
+import json
+import os
+import tempfile
+import threading
+
+from .discovery import DeviceDiscovery, read_sysfs_attr, SYSFS_NVME_ROOT
+
+INDEX_VERSION = 1
+INDEX_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache")
+INDEX_FILE = "device_index.json"
+
+
+def device_fingerprint(controller_path):
+    """
+    Huella del nodo del controlador; cambia si udev lo recrea (hotplug, reset, renombrado).
+
+    Returns:
+        list: [st_ino, st_ctime_ns, st_rdev] o None si el nodo no existe
+    """
+    try:
+        st = os.stat(controller_path)
+    except OSError:
+        return None
+    return [st.st_ino, st.st_ctime_ns, st.st_rdev]
+
+
+class DeviceIndex(object):
+    def __init__(self, logger=None, index_path=None, discovery=None, sysfs_root=SYSFS_NVME_ROOT):
+        """
+        Args:
+            logger (TestLogger): Logger opcional
+            index_path (str): Ruta del archivo de indice (por defecto cache/device_index.json)
+            discovery (DeviceDiscovery): Servicio usado para regenerar el indice
+            sysfs_root (str): Raiz de la clase nvme en sysfs
+        """
+        self.logger = logger
+        self.index_path = index_path or os.path.join(INDEX_DIR, INDEX_FILE)
+        self.discovery = discovery or DeviceDiscovery(logger, sysfs_root=sysfs_root)
+        self.sysfs_root = sysfs_root
+        self.devices = None
+        self._lock = threading.Lock()
+
+    def _log(self, message):
+        if self.logger is not None:
+            self.logger.info(message)
+
+    def load(self):
+        """Carga el indice desde disco; un archivo ausente o corrupto equivale a indice vacio."""
+        try:
+            with open(self.index_path, "r") as f:
+                data = json.load(f)
+            if data.get('version') != INDEX_VERSION:
+                raise ValueError(f"unsupported index version {data.get('version')}")
+            self.devices = data.get('devices', {})
+        except (OSError, ValueError) as e:
+            if not isinstance(e, FileNotFoundError):
+                self._log(f"Device index ignored ({self.index_path}): {e}")
+            self.devices = {}
+        return self.devices
+
+    def save(self):
+        """Escribe el indice de forma atomica (archivo temporal + os.replace)."""
+        directory = os.path.dirname(self.index_path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(prefix=".device_index_", dir=directory)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({'version': INDEX_VERSION, 'devices': self.devices}, f, indent=2)
+            os.replace(temp_path, self.index_path)
+        except OSError:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def refresh(self):
+        """
+        Regenera el indice con un descubrimiento completo y lo guarda en disco.
+
+        Returns:
+            dict: {serial: entrada}
+        """
+        devices = {}
+        for device in self.discovery.discover():
+            entry = {key: value for key, value in device.items() if key != 'raw_data'}
+            entry['fingerprint'] = device_fingerprint(device['path'])
+            devices[device['serial']] = entry
+        with self._lock:
+            self.devices = devices
+            try:
+                self.save()
+            except OSError as e:
+                self._log(f"Unable to write device index {self.index_path}: {e}")
+        self._log(f"Device index refreshed: {len(devices)} device(s)")
+        return devices
+
+    def is_valid(self, entry):
+        """
+        Comprueba que una entrada sigue apuntando al mismo drive.
+
+        Args:
+            entry (dict): Entrada del indice
+
+        Returns:
+            bool: False si hubo hotplug, renombrado o cambio de namespaces
+        """
+        controller_path = entry['path']
+        name = os.path.basename(controller_path)
+        sysfs_serial = read_sysfs_attr(os.path.join(self.sysfs_root, name, "serial"))
+        if sysfs_serial is not None and sysfs_serial != entry['serial']:
+            return False
+        if device_fingerprint(controller_path) != entry.get('fingerprint'):
+            return False
+        for namespace in entry.get('namespaces', []):
+            if not os.path.exists(namespace):
+                return False
+        return True
+
+    def lookup(self, serial_number, refresh=True):
+        """
+        Busca un drive por numero de serie.
+
+        Args:
+            serial_number (str): Numero de serie
+            refresh (bool): Si la entrada falta o ya no es valida, reescanear una vez (un drive
+                            conectado en caliente aun no esta en el indice) antes de devolver None
+
+        Returns:
+            dict: Entrada del indice (mismas claves que DeviceDiscovery), None si no se encuentra
+        """
+        serial_number = serial_number.strip()
+        if self.devices is None:
+            self.load()
+        entry = self.devices.get(serial_number)
+        if entry is not None and self.is_valid(entry):
+            return entry
+        if not refresh:
+            return None
+
+        self._log(f"Device index miss or stale entry for SN {serial_number}; rescanning")
+        entry = self.refresh().get(serial_number)
+        if entry is None:
+            self._log(f"SN {serial_number} not found after rescan")
+        return entry
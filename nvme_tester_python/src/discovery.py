@@ -0,0 +1,196 @@
+"""
+Descubrimiento de dispositivos NVMe.
+
+Lee serial/modelo/firmware/namespaces de /sys/class/nvme/* (sin enviar comandos al drive) y
+solo recurre a `nvme id-ctrl`, en paralelo con un pool de hilos, para los controladores cuyos
+datos no estan disponibles en sysfs.
+"""
+import glob
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from .nvme_wrapper import NvmeCommands
+
+SYSFS_NVME_ROOT = "/sys/class/nvme"
+DEV_ROOT = "/dev"
+DEFAULT_MAX_WORKERS = 8
+
+CONTROLLER_RE = re.compile(r"^nvme\d+$")
+NAMESPACE_RE = re.compile(r"^nvme(\d+)(?:c\d+)?n(\d+)$")
+DEV_NAMESPACE_RE = re.compile(r"^(nvme\d+)n\d+$")
+
+
+def read_sysfs_attr(path, default=None):
+    """Lee un atributo de sysfs sin espacios de relleno; default si no existe."""
+    try:
+        with open(path, "r") as f:
+            return f.read().strip()
+    except OSError:
+        return default
+
+
+class DeviceDiscovery(object):
+    """
+    Servicio de descubrimiento de controladores NVMe.
+
+    Cada dispositivo se devuelve como un dict:
+        path        (str): Ruta del controlador (/dev/nvmeX)
+        serial      (str): Numero de serie
+        model       (str): Modelo
+        firmware    (str): Revision de firmware
+        namespaces  (list): Rutas de los namespaces (/dev/nvmeXnY)
+        pci_address (str): Direccion PCI (None si no aplica)
+        raw_data    (dict): Salida de id-ctrl si se tuvo que consultar, None si vino de sysfs
+    """
+    def __init__(self, logger=None, nvme_cli=None, sysfs_root=SYSFS_NVME_ROOT, dev_root=DEV_ROOT,
+                 max_workers=DEFAULT_MAX_WORKERS):
+        """
+        Args:
+            logger (TestLogger): Logger para los comandos id-ctrl de respaldo (se crea uno si hace falta)
+            nvme_cli (str): Binario de nvme-cli (None = NVME_CLI o "nvme")
+            sysfs_root (str): Raiz de la clase nvme en sysfs
+            dev_root (str): Directorio de nodos de dispositivo
+            max_workers (int): Hilos para las consultas id-ctrl de respaldo
+        """
+        self.logger = logger
+        self.nvme_cli = nvme_cli
+        self.sysfs_root = sysfs_root
+        self.dev_root = dev_root
+        self.max_workers = max_workers
+
+    def _get_logger(self):
+        if self.logger is None:
+            from .logger import TestLogger
+            self.logger = TestLogger("auto_detection")
+        return self.logger
+
+    def _read_sysfs_controller(self, name):
+        ctrl_dir = os.path.join(self.sysfs_root, name)
+        namespaces = []
+        try:
+            entries = sorted(os.listdir(ctrl_dir))
+        except OSError:
+            entries = []
+        for entry in entries:
+            match = NAMESPACE_RE.match(entry)
+            if match:
+                # Con multipath nativo el namespace aparece como nvmeXcYnZ; el nodo es nvmeXnZ
+                ns_path = os.path.join(self.dev_root, f"nvme{match.group(1)}n{match.group(2)}")
+                if ns_path not in namespaces:
+                    namespaces.append(ns_path)
+
+        return {
+            'path': os.path.join(self.dev_root, name),
+            'serial': read_sysfs_attr(os.path.join(ctrl_dir, "serial"), ""),
+            'model': read_sysfs_attr(os.path.join(ctrl_dir, "model"), ""),
+            'firmware': read_sysfs_attr(os.path.join(ctrl_dir, "firmware_rev"), ""),
+            'namespaces': namespaces,
+            'pci_address': read_sysfs_attr(os.path.join(ctrl_dir, "address")),
+            'raw_data': None,
+        }
+
+    def _sysfs_controllers(self):
+        try:
+            names = [name for name in os.listdir(self.sysfs_root) if CONTROLLER_RE.match(name)]
+        except OSError:
+            return []
+        return [self._read_sysfs_controller(name) for name in sorted(names, key=lambda n: int(n[4:]))]
+
+    def _dev_controllers(self):
+        """Respaldo sin sysfs: controladores a partir de los nodos de /dev."""
+        controllers = {}
+        for path in sorted(glob.glob(os.path.join(self.dev_root, "nvme[0-9]*"))):
+            name = os.path.basename(path)
+            if CONTROLLER_RE.match(name):
+                controllers.setdefault(name, [])
+            else:
+                match = DEV_NAMESPACE_RE.match(name)
+                if match:
+                    controllers.setdefault(match.group(1), []).append(path)
+
+        devices = []
+        for name, namespaces in sorted(controllers.items(), key=lambda item: int(item[0][4:])):
+            controller_path = os.path.join(self.dev_root, name)
+            devices.append({
+                # Si solo existe el namespace, id-ctrl se envia por el primer namespace
+                'path': controller_path if os.path.exists(controller_path) else namespaces[0],
+                'serial': "",
+                'model': "",
+                'firmware': "",
+                'namespaces': namespaces,
+                'pci_address': None,
+                'raw_data': None,
+            })
+        return devices
+
+    def _fill_from_id_ctrl(self, device):
+        # Sin cache de identify: un drive recien conectado (o cambiado) en el mismo nodo /dev/nvmeX
+        # devolveria el serial del anterior y el reescaneo del indice no lo encontraria
+        nvme = NvmeCommands(self._get_logger(), device=device['path'], nvme_cli=self.nvme_cli, identify_cache=False)
+        try:
+            id_ctrl = nvme.idctrol(json_output=True)
+        except Exception as e:
+            self._get_logger().warning(f"id-ctrl failed on {device['path']}: {e}")
+            return device
+        if id_ctrl and isinstance(id_ctrl, dict):
+            device['serial'] = device['serial'] or str(id_ctrl.get('sn', '')).strip()
+            device['model'] = device['model'] or str(id_ctrl.get('mn', 'Unknown')).strip()
+            device['firmware'] = device['firmware'] or str(id_ctrl.get('fr', 'Unknown')).strip()
+            device['raw_data'] = id_ctrl
+        return device
+
+    def discover(self, fallback=True):
+        """
+        Descubre los controladores NVMe del sistema.
+
+        Args:
+            fallback (bool): Consultar id-ctrl (y /dev si no hay sysfs) para los datos que falten
+
+        Returns:
+            list: Dispositivos con numero de serie valido, ordenados por instancia
+        """
+        devices = self._sysfs_controllers()
+        if not fallback:
+            return [device for device in devices if device['serial']]
+        if not devices:
+            devices = self._dev_controllers()
+
+        missing = [device for device in devices
+                   if not (device['serial'] and device['model'] and device['firmware'])]
+        if missing:
+            workers = max(1, min(self.max_workers, len(missing)))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(self._fill_from_id_ctrl, missing))
+
+        return [device for device in devices if device['serial']]
+
+    def find(self, serial_number, devices=None, fallback=True):
+        """
+        Busca un dispositivo por numero de serie.
+
+        Args:
+            serial_number (str): Numero de serie
+            devices (list): Resultado previo de discover(); si es None se hace un descubrimiento nuevo
+            fallback (bool): Ver discover()
+
+        Returns:
+            dict: Dispositivo encontrado, None si no existe
+        """
+        if devices is None:
+            devices = self.discover(fallback=fallback)
+        serial_number = serial_number.strip()
+        for device in devices:
+            if device['serial'] == serial_number:
+                return device
+        return None
+
+    @staticmethod
+    def preferred_path(device):
+        """
+        Ruta con la que se ejecutan las pruebas, equivalente al DevicePath de `nvme list`:
+        el primer namespace, o el controlador si no tiene namespaces.
+        """
+        if device['namespaces']:
+            return device['namespaces'][0]
+        return device['path']
@@ -0,0 +1,1364 @@
+"""
+Emulador de dispositivos NVMe para ejecutar y medir el framework sin hardware.
+
+NvmeEmulator guarda el estado de uno o varios controladores en un directorio (state.json) y cada
+namespace adjunto en un archivo disperso (<dir>/nvme0n1), que tambien sirve de nodo para el I/O
+directo. Implementa list, id-ctrl, id-ns, list-ns, smart-log, admin-passthru, io-passthru, read, write,
+create-ns, delete-ns, attach-ns, detach-ns, format y los logs de telemetria (Get Log Page con
+offset), con distribuciones de latencia configurables y fallos inyectables (timeouts, status
+codes, bits DNR/CRD).
+
+Formas de usarlo:
+    - Ejecutable: con NVME_CLI=utils/nvme_emulator.py y NVME_EMULATOR_DIR=<dir> (ver environment())
+      NvmeCommands, AdminPassthru y las pruebas de tests_pool lo invocan como si fuera nvme-cli.
+    - En proceso: EmulatedNvmeCommands y EmulatorTransport (o NVME_TRANSPORT=emulator) no crean
+      procesos, para medir el overhead propio del framework.
+    - Directo: NvmeEmulator.run(argv) devuelve (returncode, stdout, stderr).
+
+Las reglas de latencia y de fallos se indexan por subcomando ("read", "smart-log", ...) o por
+opcode con las claves de src/latency.py ("admin:0x02", "io:0x01"); "*" coincide con todo.
+
+Ejemplo:
+    emulator = NvmeEmulator("/tmp/nvme-emu", controllers=2, reset=True)
+    emulator.set_latency("admin:0x02", "lognormal", median_us=80, sigma=0.4)
+    emulator.inject_fault("read", sct=2, sc=0x81, dnr=True, count=1)
+    os.environ.update(emulator.environment())
+"""
+import errno
+import json
+import math
+import os
+import random
+import re
+import struct
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Plataformas sin flock (Windows): solo bloqueo entre hilos
+    fcntl = None
+
+from .admin_passthru_wrappper import CompletionQueueEntry, SECONDS_TO_MILISECONS, DW0, DW1, DW2, DW3, SC_BIT
+from .latency import default_recorder, opcode_key
+from .nvme_wrapper import NvmeCommands
+from .smart_log import SMART_LOG_LAYOUT, SMART_LOG_STRUCT, U128, SENSORS, TEMPERATURE_SENSORS
+from .transport import NvmeTransport
+from .identify_cache import invalidate_all as invalidate_identify_caches
+
+EMULATOR_DIR_ENV = "NVME_EMULATOR_DIR"
+DEFAULT_EMULATOR_DIR = os.path.join(tempfile.gettempdir(), "nvme-emulator")
+STATE_FILE = "state.json"
+LOCK_FILE = ".lock"
+STATE_VERSION = 1
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EMULATOR_SCRIPT = os.path.join(PROJECT_ROOT, "utils", "nvme_emulator.py")
+PROFILE_FILE = os.path.join(PROJECT_ROOT, "utils", "json", "idcontrol.json")
+
+DEVICE_RE = re.compile(r"^(nvme\d+)(?:n(\d+))?$")
+
+NSID_ALL = 0xFFFFFFFF
+DEFAULT_NAMESPACE_BLOCKS = 2 * 1024 * 1024      # 1 GiB con bloques de 512 bytes
+DEFAULT_CAPACITY = 16 * 1024 * 1024 * 1024      # bytes asignables por controlador
+DEFAULT_MAX_NAMESPACES = 32
+DEFAULT_TEMPERATURE_K = 313
+DEFAULT_TEMP_THRESHOLD_K = 343
+DATA_UNIT_BYTES = 512 * 1000
+IDENTIFY_DATA_LEN = 4096
+SECTOR_SIZE = 512
+
+# LBA formats soportados: (ms, lbads, rp)
+LBA_FORMATS = ((0, 9, 0), (0, 12, 0))
+
+# Opcodes
+OPC_FLUSH = 0x00
+OPC_WRITE = 0x01
+OPC_READ = 0x02
+OPC_GET_LOG_PAGE = 0x02
+OPC_IDENTIFY = 0x06
+OPC_SET_FEATURES = 0x09
+OPC_GET_FEATURES = 0x0A
+OPC_NS_MANAGEMENT = 0x0D
+OPC_NS_ATTACHMENT = 0x15
+OPC_FORMAT_NVM = 0x80
+
+ADMIN_OPCODE_NAMES = {
+    OPC_GET_LOG_PAGE: "Get Log Page",
+    OPC_IDENTIFY: "Identify",
+    OPC_SET_FEATURES: "Set Features",
+    OPC_GET_FEATURES: "Get Features",
+    OPC_NS_MANAGEMENT: "Namespace Management",
+    OPC_NS_ATTACHMENT: "Namespace Attachment",
+    OPC_FORMAT_NVM: "Format NVM",
+}
+IO_OPCODE_NAMES = {OPC_FLUSH: "Flush", OPC_WRITE: "Write", OPC_READ: "Read"}
+
+CNS_NAMESPACE = 0x00
+CNS_CONTROLLER = 0x01
+CNS_ACTIVE_NAMESPACES = 0x02
+LID_SMART = 0x02
+LID_TELEMETRY_HOST = 0x07
+LID_TELEMETRY_CONTROLLER = 0x08
+FID_TEMPERATURE_THRESHOLD = 0x04
+FID_NUMBER_OF_QUEUES = 0x07
+DEFAULT_FEATURES = {FID_TEMPERATURE_THRESHOLD: DEFAULT_TEMP_THRESHOLD_K, FID_NUMBER_OF_QUEUES: 0x003F003F}
+
+# Telemetry: bloques de 512 bytes; el bloque 0 es la cabecera. Ultimo bloque de las data areas 1-3
+TELEMETRY_BLOCK = 512
+DEFAULT_TELEMETRY_BLOCKS = (16, 512, 2048)
+TELEMETRY_HEADER = struct.Struct("<B4x3sHHH2xI")     # lid, ieee, da1lb, da2lb, da3lb, da4lb
+TELEMETRY_GENERATION_OFFSET = 381                    # host gen, ctrl available, ctrl gen
+TELEMETRY_IEEE = b"\x5c\xd2\xe4"
+TELEMETRY_PATTERN = struct.Struct("<BBHI")           # lid, generacion, 0, numero de bloque (x64)
+
+# Status Field (CQE DW3 bits 31:17): SC 7:0, SCT 10:8, CRD 12:11, More 13, DNR 14
+SCT_BIT = 8
+CRD_BIT = 11
+MORE_BIT = 13
+DNR_BIT = 14
+
+SCT_GENERIC = 0
+SCT_COMMAND_SPECIFIC = 1
+SCT_MEDIA = 2
+
+STATUS_NAMES = {
+    (SCT_GENERIC, 0x01): ("INVALID_OPCODE", "Invalid Command Opcode"),
+    (SCT_GENERIC, 0x02): ("INVALID_FIELD", "A reserved coded value or an unsupported value in a defined field"),
+    (SCT_GENERIC, 0x04): ("DATA_XFER_ERROR", "Data Transfer Error"),
+    (SCT_GENERIC, 0x06): ("INTERNAL", "Internal Error"),
+    (SCT_GENERIC, 0x0B): ("INVALID_NS", "The namespace or the format of that namespace is invalid"),
+    (SCT_GENERIC, 0x80): ("LBA_RANGE", "The command references a LBA that exceeds the size of the namespace"),
+    (SCT_COMMAND_SPECIFIC, 0x0A): ("INVALID_FORMAT", "The LBA Format specified is not supported"),
+    (SCT_COMMAND_SPECIFIC, 0x15): ("NS_INSUFFICIENT_CAPACITY", "Creating the namespace requires more free space"),
+    (SCT_COMMAND_SPECIFIC, 0x16): ("NS_ID_UNAVAILABLE", "The number of namespaces supported has been exceeded"),
+    (SCT_COMMAND_SPECIFIC, 0x18): ("NS_ALREADY_ATTACHED", "The namespace is already attached"),
+    (SCT_COMMAND_SPECIFIC, 0x1A): ("NS_NOT_ATTACHED", "The namespace is not attached"),
+    (SCT_MEDIA, 0x80): ("WRITE_FAULT", "The write data could not be committed to the media"),
+    (SCT_MEDIA, 0x81): ("UNRECOVERED_READ", "The read data could not be recovered from the media"),
+}
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal", "exponential")
+
+# Identify Controller: (campo, offset, formato struct); cadenas con ("s", longitud)
+ID_CTRL_LAYOUT = (
+    ("vid", 0, "H"), ("ssvid", 2, "H"), ("sn", 4, 20), ("mn", 24, 40), ("fr", 64, 8),
+    ("rab", 72, "B"), ("cmic", 76, "B"), ("mdts", 77, "B"), ("cntlid", 78, "H"), ("ver", 80, "I"),
+    ("rtd3r", 84, "I"), ("rtd3e", 88, "I"), ("oaes", 92, "I"), ("ctratt", 96, "I"), ("cntrltype", 111, "B"),
+    ("oacs", 256, "H"), ("acl", 258, "B"), ("aerl", 259, "B"), ("frmw", 260, "B"), ("lpa", 261, "B"),
+    ("elpe", 262, "B"), ("npss", 263, "B"), ("avscc", 264, "B"), ("apsta", 265, "B"), ("wctemp", 266, "H"),
+    ("cctemp", 268, "H"), ("mtfa", 270, "H"), ("tnvmcap", 280, "QQ"), ("unvmcap", 296, "QQ"),
+    ("sqes", 512, "B"), ("cqes", 513, "B"), ("maxcmd", 514, "H"), ("nn", 516, "I"), ("oncs", 520, "H"),
+    ("fuses", 522, "H"), ("fna", 524, "B"), ("vwc", 525, "B"), ("awun", 526, "H"), ("awupf", 528, "H"),
+    ("sgls", 536, "I"), ("subnqn", 768, 256),
+)
+
+# Identify Namespace
+ID_NS_HEADER = struct.Struct("<QQQBBBBBBB")     # nsze, ncap, nuse, nsfeat, nlbaf, flbas, mc, dpc, dps, nmic
+ID_NS_FPI_OFFSET = 32
+ID_NS_LBAF_OFFSET = 128
+LBAF_ENTRY = struct.Struct("<HBB")
+NS_MGMT_DATA = struct.Struct("<QQ10xBxxB")       # nsze, ncap, flbas (byte 26), dps (byte 29)
+
+# Opciones de linea de comandos por subcomando: alias -> (nombre canonico, es_flag)
+_LOG_OPTIONS = {
+    "-o": ("output-format", False), "--output-format": ("output-format", False),
+    "-v": ("verbose", True), "--verbose": ("verbose", True),
+    "-b": ("raw-binary", True), "--raw-binary": ("raw-binary", True),
+    "-H": ("human-readable", True), "--human-readable": ("human-readable", True),
+}
+_NAMESPACE_OPTIONS = {"-n": ("namespace-id", False), "--namespace-id": ("namespace-id", False)}
+_PASSTHRU_OPTIONS = {
+    "-O": ("opcode", False), "--opcode": ("opcode", False),
+    "-f": ("flags", False), "--flags": ("flags", False),
+    "-R": ("rsvd", False), "--rsvd": ("rsvd", False),
+    "-r": ("read", True), "--read": ("read", True),
+    "-w": ("write", True), "--write": ("write", True),
+    "-i": ("input-file", False), "--input-file": ("input-file", False),
+    "-l": ("data-len", False), "--data-len": ("data-len", False),
+    "-m": ("metadata-len", False), "--metadata-len": ("metadata-len", False),
+    "-s": ("show-command", True), "--show-command": ("show-command", True),
+    "-d": ("dry-run", True), "--dry-run": ("dry-run", True),
+    "-b": ("raw-binary", True), "--raw-binary": ("raw-binary", True),
+    "-p": ("prefill", False), "--prefill": ("prefill", False),
+    "-t": ("timeout", False), "--timeout": ("timeout", False),
+    "-T": ("latency", True), "--latency": ("latency", True),
+}
+_PASSTHRU_OPTIONS.update({f"--cdw{index}": (f"cdw{index}", False) for index in (2, 3, 10, 11, 12, 13, 14, 15)})
+_PASSTHRU_OPTIONS.update(_NAMESPACE_OPTIONS)
+_IO_OPTIONS = {
+    "-s": ("start-block", False), "--start-block": ("start-block", False),
+    "-c": ("block-count", False), "--block-count": ("block-count", False),
+    "-z": ("data-size", False), "--data-size": ("data-size", False),
+    "-d": ("data", False), "--data": ("data", False),
+}
+_IO_OPTIONS.update({f"--{name}": (name, False) for name in (
+    "metadata-size", "ref-tag", "metadata", "prinfo", "app-tag-mask", "app-tag", "dir-type", "dir-spec", "dsm",
+    "storage-tag", "timeout")})
+_IO_OPTIONS.update({f"--{name}": (name, True) for name in (
+    "limited-retry", "force-unit-access", "show-command", "dry-run", "latency", "storage-tag-check", "force")})
+_IO_OPTIONS.update(_NAMESPACE_OPTIONS)
+_CREATE_NS_OPTIONS = {
+    "-s": ("nsze", False), "-c": ("ncap", False), "-f": ("flbas", False), "-d": ("dps", False),
+    "-m": ("nmic", False), "-b": ("block-size", False), "-t": ("timeout", False),
+}
+_CREATE_NS_OPTIONS.update({f"--{name}": (name, False) for name in (
+    "nsze", "ncap", "flbas", "dps", "nmic", "anagrp-id", "nvmset-id", "endg-id", "csi", "lbstm", "nphndls",
+    "block-size", "timeout", "nsze-si", "ncap-si", "rar", "ror", "rnumzrwa", "phndls")})
+_CREATE_NS_OPTIONS["--azr"] = ("azr", True)
+_ATTACH_OPTIONS = {"-c": ("controllers", False), "--controllers": ("controllers", False)}
+_ATTACH_OPTIONS.update(_NAMESPACE_OPTIONS)
+_FORMAT_OPTIONS = {
+    "-l": ("lbaf", False), "--lbaf": ("lbaf", False),
+    "-b": ("block-size", False), "--block-size": ("block-size", False),
+    "-s": ("ses", False), "--ses": ("ses", False),
+    "-i": ("pi", False), "--pi": ("pi", False),
+    "-p": ("pil", False), "--pil": ("pil", False),
+    "-m": ("ms", False), "--ms": ("ms", False),
+    "-r": ("reset", True), "--reset": ("reset", True),
+    "-f": ("force", True), "--force": ("force", True),
+    "-t": ("timeout", False), "--timeout": ("timeout", False),
+}
+_FORMAT_OPTIONS.update(_NAMESPACE_OPTIONS)
+
+COMMAND_OPTIONS = {
+    "list": dict(_LOG_OPTIONS),
+    "id-ctrl": dict(_LOG_OPTIONS),
+    "id-ns": dict(_LOG_OPTIONS, **_NAMESPACE_OPTIONS),
+    "list-ns": dict(_LOG_OPTIONS, **_NAMESPACE_OPTIONS, **{"-a": ("all", True), "--all": ("all", True)}),
+    "smart-log": dict(_LOG_OPTIONS, **_NAMESPACE_OPTIONS),
+    "admin-passthru": _PASSTHRU_OPTIONS,
+    "io-passthru": _PASSTHRU_OPTIONS,
+    "read": _IO_OPTIONS,
+    "write": _IO_OPTIONS,
+    "create-ns": _CREATE_NS_OPTIONS,
+    "delete-ns": dict(_NAMESPACE_OPTIONS, **{"-t": ("timeout", False), "--timeout": ("timeout", False)}),
+    "attach-ns": _ATTACH_OPTIONS,
+    "detach-ns": _ATTACH_OPTIONS,
+    "format": _FORMAT_OPTIONS,
+    "version": {},
+}
+
+# Opcode equivalente de cada subcomando (para reglas de latencia/fallos por opcode)
+COMMAND_OPCODES = {
+    "id-ctrl": opcode_key(OPC_IDENTIFY),
+    "id-ns": opcode_key(OPC_IDENTIFY),
+    "list-ns": opcode_key(OPC_IDENTIFY),
+    "smart-log": opcode_key(OPC_GET_LOG_PAGE),
+    "read": opcode_key(OPC_READ, io=True),
+    "write": opcode_key(OPC_WRITE, io=True),
+    "create-ns": opcode_key(OPC_NS_MANAGEMENT),
+    "delete-ns": opcode_key(OPC_NS_MANAGEMENT),
+    "attach-ns": opcode_key(OPC_NS_ATTACHMENT),
+    "detach-ns": opcode_key(OPC_NS_ATTACHMENT),
+    "format": opcode_key(OPC_FORMAT_NVM),
+}
+
+
+def status_field(sct=SCT_GENERIC, sc=0, dnr=False, crd=0, more=False):
+    """Compone el Status Field del CQE (el valor que nvme-cli imprime entre parentesis)."""
+    return ((sc & 0xFF) | ((sct & 0x7) << SCT_BIT) | ((crd & 0x3) << CRD_BIT) | (int(bool(more)) << MORE_BIT)
+            | (int(bool(dnr)) << DNR_BIT))
+
+
+def status_text(status):
+    """Texto de error de nvme-cli: 'NVMe status: INVALID_FIELD: ...(0x4002)'."""
+    name, description = STATUS_NAMES.get(((status >> SCT_BIT) & 0x7, status & 0xFF), ("UNKNOWN", "Unknown status"))
+    return f"NVMe status: {name}: {description}(0x{status:x})"
+
+
+class NvmeStatusError(Exception):
+    """Comando completado con status distinto de cero."""
+    def __init__(self, status):
+        super().__init__(status_text(status))
+        self.status = status
+
+
+class CommandTimeout(Exception):
+    """Comando que no completa (fallo inyectado)."""
+
+
+class UsageError(Exception):
+    """Argumentos invalidos para un subcomando (nvme-cli termina con EINVAL)."""
+
+
+def _int(value, default=None):
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return int(value)
+    return int(str(value), 0)
+
+
+def _device_name(path):
+    """'/dev/nvme0n1' -> ('nvme0', 1); '/tmp/emu/nvme0' -> ('nvme0', None)"""
+    match = DEVICE_RE.match(os.path.basename(str(path)))
+    if match is None:
+        return None, None
+    return match.group(1), int(match.group(2)) if match.group(2) else None
+
+
+def emulator_root(path):
+    """Directorio del emulador al que pertenece un nodo (controlador o namespace); None si no es emulado."""
+    directory = os.path.dirname(os.path.abspath(str(path)))
+    if _device_name(path)[0] is None or not os.path.isfile(os.path.join(directory, STATE_FILE)):
+        return None
+    return directory
+
+
+def _load_profile():
+    try:
+        with open(PROFILE_FILE, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+class NvmeEmulator(object):
+    def __init__(self, root=None, controllers=1, namespaces=1, namespace_blocks=DEFAULT_NAMESPACE_BLOCKS,
+                 capacity=DEFAULT_CAPACITY, serial_prefix="EMU", seed=None, reset=False):
+        """
+        Abre (o crea) un emulador en `root`. Si ya existe un estado se reutiliza, de modo que el
+        ejecutable y las instancias en proceso comparten dispositivos, latencias y fallos.
+
+        Args:
+            root (str): Directorio del estado (por defecto NVME_EMULATOR_DIR o /tmp/nvme-emulator)
+            controllers (int): Controladores a crear (nvme0, nvme1, ...)
+            namespaces (int): Namespaces creados y adjuntos por controlador
+            namespace_blocks (int): Tamano de cada namespace en bloques de 512 bytes
+            capacity (int): Capacidad asignable por controlador en bytes
+            serial_prefix (str): Prefijo de los numeros de serie
+            seed (int): Semilla de latencias y probabilidades de fallo (None = aleatoria)
+            reset (bool): Descarta el estado existente
+        """
+        self.root = os.path.abspath(root or os.environ.get(EMULATOR_DIR_ENV, DEFAULT_EMULATOR_DIR))
+        os.makedirs(self.root, exist_ok=True)
+        self.state_path = os.path.join(self.root, STATE_FILE)
+        self._lock = threading.Lock()
+        self._state = None
+        self._state_stamp = None
+        self._rng = random.Random(seed)
+        if reset or not os.path.exists(self.state_path):
+            self.reset(controllers, namespaces, namespace_blocks, capacity, serial_prefix, seed)
+
+    # --- Estado persistente ---
+    @contextmanager
+    def _transaction(self, write=True):
+        """Estado bajo lock (hilos y procesos); se guarda al salir si write es True."""
+        with self._lock:
+            lock_file = open(os.path.join(self.root, LOCK_FILE), "a")
+            try:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                state = self._load()
+                yield state
+                if write:
+                    self._save(state)
+            finally:
+                lock_file.close()
+
+    def _load(self):
+        st = os.stat(self.state_path)
+        stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if self._state is None or stamp != self._state_stamp:
+            with open(self.state_path, "r") as f:
+                self._state = json.load(f)
+            self._state_stamp = stamp
+        return self._state
+
+    def _save(self, state):
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".state-")
+        with os.fdopen(fd, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+        st = os.stat(self.state_path)
+        self._state = state
+        self._state_stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def reset(self, controllers=1, namespaces=1, namespace_blocks=DEFAULT_NAMESPACE_BLOCKS,
+              capacity=DEFAULT_CAPACITY, serial_prefix="EMU", seed=None):
+        """Recrea el estado: controladores nuevos, namespaces vacios, sin fallos ni latencias."""
+        for name in os.listdir(self.root):
+            if DEVICE_RE.match(name):
+                os.unlink(os.path.join(self.root, name))
+        state = {
+            'version': STATE_VERSION,
+            'seed': seed,
+            'commands': 0,
+            'latency': {},
+            'faults': [],
+            'controllers': {},
+        }
+        for index in range(controllers):
+            name = f"nvme{index}"
+            state['controllers'][name] = {
+                'serial': f"{serial_prefix}{index:08d}",
+                'cntlid': index,
+                'capacity': capacity,
+                'namespaces': {},
+                'features': {str(fid): value for fid, value in DEFAULT_FEATURES.items()},
+                'smart': {'temperature': DEFAULT_TEMPERATURE_K, 'avail_spare': 100, 'spare_thresh': 10,
+                          'power_cycles': 1},
+                'id_ctrl': {},
+                'telemetry': self._default_telemetry(),
+            }
+            # Nodo del controlador: archivo vacio (el transporte ioctl cae a nvme-cli con ENOTTY)
+            open(os.path.join(self.root, name), "w").close()
+        with self._lock:
+            self._save(state)
+        for name in state['controllers']:
+            for _ in range(namespaces):
+                nsid = self._admin(name, lambda ctrl: self._create_namespace(ctrl, namespace_blocks,
+                                                                             namespace_blocks, 0, 0))
+                self._admin(name, lambda ctrl: self._attach(name, ctrl, nsid))
+        # Los identify cacheados en este proceso corresponden al estado anterior
+        invalidate_identify_caches()
+
+    def _admin(self, controller, operation):
+        with self._transaction() as state:
+            return operation(state['controllers'][controller])
+
+    # --- Configuracion ---
+    def controller_path(self, index=0):
+        """Ruta del nodo del controlador emulado (equivalente a /dev/nvmeX)."""
+        return os.path.join(self.root, f"nvme{index}")
+
+    def namespace_path(self, index=0, nsid=1):
+        """Archivo disperso del namespace (equivalente a /dev/nvmeXnY)."""
+        return os.path.join(self.root, f"nvme{index}n{nsid}")
+
+    def environment(self, transport="cli"):
+        """
+        Variables de entorno para que el framework (y los procesos que lance) use el emulador.
+
+        Returns:
+            dict: NVME_CLI, NVME_EMULATOR_DIR y NVME_TRANSPORT
+        """
+        return {"NVME_CLI": EMULATOR_SCRIPT, EMULATOR_DIR_ENV: self.root, "NVME_TRANSPORT": transport}
+
+    def set_latency(self, command="default", dist="fixed", **params):
+        """
+        Configura la distribucion de latencia (microsegundos) de un comando.
+
+        Args:
+            command (str): Subcomando, clave de opcode ("admin:0x02") o "default"
+            dist (str): fixed (us), uniform (min_us, max_us), normal (mean_us, stddev_us),
+                        lognormal (median_us, sigma) o exponential (mean_us)
+        """
+        if dist not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {dist}")
+        with self._transaction() as state:
+            state['latency'][command] = dict(params, dist=dist)
+
+    def inject_fault(self, command="*", status=None, sct=SCT_GENERIC, sc=None, dnr=False, crd=0, more=False,
+                     timeout=None, probability=1.0, count=None, skip=0, device=None):
+        """
+        Anade una regla de fallo.
+
+        Args:
+            command (str): Subcomando, clave de opcode o "*"
+            status (int): Status Field completo; si es None se compone con sct/sc/dnr/crd/more
+            timeout (float): En lugar de un status, el comando no completa y falla tras `timeout`
+                segundos (o el --timeout del comando, si es menor)
+            probability (float): Probabilidad de fallo por comando que coincide
+            count (int): Fallos a inyectar antes de desactivar la regla (None = ilimitado)
+            skip (int): Comandos que coinciden y se dejan pasar antes de empezar a fallar
+            device (str): Limitar a un controlador ("nvme1")
+        """
+        if status is None and sc is None and timeout is None:
+            raise ValueError("inject_fault requires status, sc or timeout")
+        if status is None and sc is not None:
+            status = status_field(sct, sc, dnr, crd, more)
+        rule = {'command': command, 'status': status, 'timeout': timeout, 'probability': probability,
+                'count': count, 'skip': skip, 'device': device}
+        with self._transaction() as state:
+            state['faults'].append(rule)
+        return rule
+
+    def clear_faults(self):
+        with self._transaction() as state:
+            state['faults'] = []
+
+    def set_smart(self, controller="nvme0", **values):
+        """Fija valores del log SMART (temperature, critical_warning, percent_used, media_errors...)."""
+        with self._transaction() as state:
+            state['controllers'][controller]['smart'].update(values)
+
+    @staticmethod
+    def _default_telemetry():
+        return {'blocks': list(DEFAULT_TELEMETRY_BLOCKS), 'host_generation': 0, 'controller_generation': 0,
+                'controller_available': 0}
+
+    def set_telemetry(self, controller="nvme0", blocks=None, controller_data=False):
+        """
+        Configura los logs de telemetria.
+
+        Args:
+            blocks (tuple): Ultimo bloque de las data areas 1, 2 y 3 (cada bloque son 512 bytes)
+            controller_data (bool): Simula una captura iniciada por el controlador (nueva generacion)
+        """
+        with self._transaction() as state:
+            telemetry = state['controllers'][controller].setdefault('telemetry', self._default_telemetry())
+            if blocks is not None:
+                telemetry['blocks'] = [int(block) for block in blocks]
+            if controller_data:
+                telemetry['controller_generation'] = (telemetry['controller_generation'] + 1) & 0xFF
+                telemetry['controller_available'] = 1
+
+    # --- Latencias y fallos ---
+    def _keys(self, command, opcode):
+        keys = [command]
+        if opcode is not None and opcode != command:
+            keys.append(opcode)
+        return keys
+
+    def _sample_latency(self, state, keys):
+        config = None
+        for key in keys + ["default"]:
+            config = state['latency'].get(key)
+            if config is not None:
+                break
+        if config is None:
+            return 0.0
+        rng = self._rng
+        dist = config['dist']
+        if dist == "fixed":
+            value = config.get('us', 0)
+        elif dist == "uniform":
+            value = rng.uniform(config.get('min_us', 0), config.get('max_us', 0))
+        elif dist == "normal":
+            value = rng.gauss(config.get('mean_us', 0), config.get('stddev_us', 0))
+        elif dist == "lognormal":
+            value = rng.lognormvariate(math.log(max(config.get('median_us', 1), 1e-3)), config.get('sigma', 0))
+        else:
+            value = rng.expovariate(1.0 / max(config.get('mean_us', 1), 1e-3))
+        return max(0.0, value)
+
+    def _match_fault(self, state, keys, controller):
+        """Devuelve la regla que dispara para este comando (actualizando skip/count), o None."""
+        for rule in list(state['faults']):
+            if rule['command'] != "*" and rule['command'] not in keys:
+                continue
+            if rule.get('device') and rule['device'] != controller:
+                continue
+            if rule.get('skip'):
+                rule['skip'] -= 1
+                continue
+            if rule.get('probability', 1.0) < 1.0 and self._rng.random() >= rule['probability']:
+                continue
+            if rule.get('count') is not None:
+                rule['count'] -= 1
+                if rule['count'] <= 0:
+                    state['faults'].remove(rule)
+            return rule
+        return None
+
+    def _begin(self, state, command, opcode, controller):
+        """
+        Contabiliza el comando y aplica fallos.
+
+        Returns:
+            tuple: (latencia simulada en us, regla de fallo disparada o None)
+        """
+        state['commands'] += 1
+        if state.get('seed') is not None:
+            # Ejecutable: cada proceso continua la secuencia determinista del anterior
+            self._rng.seed(state['seed'] + state['commands'])
+        keys = self._keys(command, opcode)
+        latency_us = self._sample_latency(state, keys)
+        rule = self._match_fault(state, keys, controller)
+        if rule is not None and rule.get('status') is not None and controller in state['controllers']:
+            smart = state['controllers'][controller]['smart']
+            smart['num_err_log_entries'] = smart.get('num_err_log_entries', 0) + 1
+            if (rule['status'] >> SCT_BIT) & 0x7 == SCT_MEDIA:
+                smart['media_errors'] = smart.get('media_errors', 0) + 1
+        return latency_us, rule
+
+    @staticmethod
+    def _wait(latency_us, rule, timeout_s=None):
+        """Duerme la latencia simulada; con una regla de timeout espera y lanza CommandTimeout."""
+        if rule is not None and rule.get('timeout') is not None:
+            hang = rule['timeout'] if timeout_s is None else min(rule['timeout'], timeout_s)
+            time.sleep(hang)
+            raise CommandTimeout()
+        if latency_us:
+            time.sleep(latency_us / 1e6)
+        if rule is not None and rule.get('status'):
+            raise NvmeStatusError(rule['status'])
+
+    # --- Modelo de namespaces ---
+    def _ns_file(self, controller, nsid):
+        return os.path.join(self.root, f"{controller}n{nsid}")
+
+    @staticmethod
+    def _block_size(namespace):
+        return 1 << LBA_FORMATS[namespace['flbas'] & 0xF][1]
+
+    @staticmethod
+    def _namespace(ctrl, nsid, attached=True):
+        namespace = ctrl['namespaces'].get(str(nsid))
+        if namespace is None or (attached and not namespace['attached']):
+            raise NvmeStatusError(status_field(SCT_GENERIC, 0x0B, dnr=True))
+        return namespace
+
+    def _create_namespace(self, ctrl, nsze, ncap, flbas, dps):
+        if (flbas & 0xF) >= len(LBA_FORMATS):
+            raise NvmeStatusError(status_field(SCT_COMMAND_SPECIFIC, 0x0A, dnr=True))
+        block_size = 1 << LBA_FORMATS[flbas & 0xF][1]
+        allocated = sum(ns['nsze'] * self._block_size(ns) for ns in ctrl['namespaces'].values())
+        if not nsze or allocated + nsze * block_size > ctrl['capacity']:
+            raise NvmeStatusError(status_field(SCT_COMMAND_SPECIFIC, 0x15, dnr=True))
+        max_namespaces = _int(ctrl['id_ctrl'].get('nn'), DEFAULT_MAX_NAMESPACES)
+        for nsid in range(1, max_namespaces + 1):
+            if str(nsid) not in ctrl['namespaces']:
+                ctrl['namespaces'][str(nsid)] = {'nsze': nsze, 'ncap': ncap or nsze, 'flbas': flbas & 0xF,
+                                                 'dps': dps, 'attached': False}
+                return nsid
+        raise NvmeStatusError(status_field(SCT_COMMAND_SPECIFIC, 0x16, dnr=True))
+
+    def _delete_namespace(self, controller, ctrl, nsid):
+        nsids = list(ctrl['namespaces']) if nsid == NSID_ALL else [str(nsid)]
+        for key in nsids:
+            if key not in ctrl['namespaces']:
+                raise NvmeStatusError(status_field(SCT_GENERIC, 0x0B, dnr=True))
+            del ctrl['namespaces'][key]
+            try:
+                os.unlink(self._ns_file(controller, key))
+            except OSError:
+                pass
+
+    def _attach(self, controller, ctrl, nsid):
+        namespace = self._namespace(ctrl, nsid, attached=False)
+        if namespace['attached']:
+            raise NvmeStatusError(status_field(SCT_COMMAND_SPECIFIC, 0x18, dnr=True))
+        namespace['attached'] = True
+        with open(self._ns_file(controller, nsid), "wb") as f:
+            f.truncate(namespace['nsze'] * self._block_size(namespace))
+
+    def _detach(self, controller, ctrl, nsid):
+        namespace = self._namespace(ctrl, nsid, attached=False)
+        if not namespace['attached']:
+            raise NvmeStatusError(status_field(SCT_COMMAND_SPECIFIC, 0x1A, dnr=True))
+        namespace['attached'] = False
+        try:
+            os.unlink(self._ns_file(controller, nsid))
+        except OSError:
+            pass
+
+    def _format(self, controller, ctrl, nsid, lbaf):
+        if lbaf >= len(LBA_FORMATS):
+            raise NvmeStatusError(status_field(SCT_COMMAND_SPECIFIC, 0x0A, dnr=True))
+        nsids = [key for key, ns in ctrl['namespaces'].items() if ns['attached']] if nsid == NSID_ALL \
+            else [str(nsid)]
+        for key in nsids:
+            namespace = self._namespace(ctrl, key)
+            size = namespace['nsze'] * self._block_size(namespace)
+            namespace['flbas'] = lbaf
+            namespace['nsze'] = size // self._block_size(namespace)
+            namespace['ncap'] = namespace['nsze']
+            # truncate a 0 y de vuelta: datos en cero sin ocupar espacio
+            with open(self._ns_file(controller, key), "wb") as f:
+                f.truncate(size)
+
+    def _io(self, controller, ctrl, nsid, write, slba, blocks, data=b""):
+        namespace = self._namespace(ctrl, nsid)
+        block_size = self._block_size(namespace)
+        if slba + blocks > namespace['nsze']:
+            raise NvmeStatusError(status_field(SCT_GENERIC, 0x80, dnr=True))
+        length = blocks * block_size
+        smart = ctrl['smart']
+        fd = os.open(self._ns_file(controller, nsid), os.O_RDWR)
+        try:
+            if write:
+                os.pwrite(fd, bytes(data[:length]).ljust(length, b"\0"), slba * block_size)
+                smart['bytes_written'] = smart.get('bytes_written', 0) + length
+                smart['host_write_commands'] = smart.get('host_write_commands', 0) + 1
+                return b""
+            payload = os.pread(fd, length, slba * block_size)
+            smart['bytes_read'] = smart.get('bytes_read', 0) + length
+            smart['host_read_commands'] = smart.get('host_read_commands', 0) + 1
+            return payload
+        finally:
+            os.close(fd)
+
+    def _nuse(self, controller, nsid, namespace):
+        try:
+            used = os.stat(self._ns_file(controller, nsid)).st_blocks * SECTOR_SIZE
+        except OSError:
+            return 0
+        return min(namespace['nsze'], used // self._block_size(namespace))
+
+    # --- Estructuras de datos ---
+    def _id_ctrl(self, controller, ctrl):
+        identify = _load_profile()
+        identify.update(ctrl['id_ctrl'])
+        identify['sn'] = ctrl['serial']
+        identify['cntlid'] = ctrl['cntlid']
+        identify.setdefault('nn', DEFAULT_MAX_NAMESPACES)
+        return identify
+
+    def _id_ctrl_data(self, controller, ctrl):
+        identify = self._id_ctrl(controller, ctrl)
+        data = bytearray(IDENTIFY_DATA_LEN)
+        for name, offset, fmt in ID_CTRL_LAYOUT:
+            value = identify.get(name)
+            if value is None:
+                continue
+            if isinstance(fmt, int):
+                data[offset:offset + fmt] = str(value).encode("ascii", "replace")[:fmt].ljust(fmt, b" ")
+            elif fmt == "QQ":
+                value = _int(value, 0)
+                struct.pack_into("<QQ", data, offset, value & 0xFFFFFFFFFFFFFFFF, value >> 64)
+            else:
+                struct.pack_into("<" + fmt, data, offset, _int(value, 0))
+        return data
+
+    def _id_ns(self, controller, ctrl, nsid):
+        namespace = ctrl['namespaces'].get(str(nsid))
+        if namespace is None or not namespace['attached']:
+            return None
+        return {
+            'nsze': namespace['nsze'],
+            'ncap': namespace['ncap'],
+            'nuse': self._nuse(controller, nsid, namespace),
+            'nsfeat': 0,
+            'nlbaf': len(LBA_FORMATS) - 1,
+            'flbas': namespace['flbas'],
+            'mc': 0,
+            'dpc': 0,
+            'dps': namespace['dps'],
+            'nmic': 0,
+            'fpi': 0,
+            'nvmcap': namespace['nsze'] * self._block_size(namespace),
+            'lbafs': [{'ms': ms, 'ds': ds, 'rp': rp} for ms, ds, rp in LBA_FORMATS],
+        }
+
+    def _id_ns_data(self, controller, ctrl, nsid):
+        data = bytearray(IDENTIFY_DATA_LEN)
+        identify = self._id_ns(controller, ctrl, nsid)
+        if identify is None:
+            # NSID inactivo: estructura en cero
+            return data
+        ID_NS_HEADER.pack_into(data, 0, identify['nsze'], identify['ncap'], identify['nuse'], identify['nsfeat'],
+                               identify['nlbaf'], identify['flbas'], identify['mc'], identify['dpc'],
+                               identify['dps'], identify['nmic'])
+        data[ID_NS_FPI_OFFSET] = identify['fpi']
+        for index, (ms, ds, rp) in enumerate(LBA_FORMATS):
+            LBAF_ENTRY.pack_into(data, ID_NS_LBAF_OFFSET + index * LBAF_ENTRY.size, ms, ds, rp)
+        return data
+
+    @staticmethod
+    def _smart(ctrl):
+        smart = dict(ctrl['smart'])
+        smart['data_units_read'] = -(-smart.pop('bytes_read', 0) // DATA_UNIT_BYTES)
+        smart['data_units_written'] = -(-smart.pop('bytes_written', 0) // DATA_UNIT_BYTES)
+        return {name: smart.get(name, 0) for name, _, fmt in SMART_LOG_LAYOUT if fmt != SENSORS}
+
+    def _smart_data(self, ctrl):
+        smart = self._smart(ctrl)
+        values = []
+        for name, _, fmt in SMART_LOG_LAYOUT:
+            if fmt == SENSORS:
+                values.extend([0] * TEMPERATURE_SENSORS)
+            elif fmt == U128:
+                values.extend((smart[name] & 0xFFFFFFFFFFFFFFFF, smart[name] >> 64))
+            else:
+                values.append(smart[name])
+        return SMART_LOG_STRUCT.pack(*values)
+
+    def _telemetry_data(self, ctrl, lid, create, offset, length):
+        """Tramo [offset, offset + length) del log de telemetria; los datos se generan por bloque."""
+        telemetry = ctrl.setdefault('telemetry', self._default_telemetry())
+        host = lid == LID_TELEMETRY_HOST
+        if host and create:
+            telemetry['host_generation'] = (telemetry['host_generation'] + 1) & 0xFF
+        blocks = telemetry['blocks']
+        size = (blocks[-1] + 1) * TELEMETRY_BLOCK
+        if offset % TELEMETRY_BLOCK or offset >= size:
+            raise NvmeStatusError(status_field(SCT_GENERIC, 0x02, dnr=True))
+        generation = telemetry['host_generation' if host else 'controller_generation']
+        data = bytearray(min(length, size - offset))
+        first = offset // TELEMETRY_BLOCK
+        for block in range(first, first + -(-len(data) // TELEMETRY_BLOCK)):
+            start = (block - first) * TELEMETRY_BLOCK
+            if block == 0:
+                header = bytearray(TELEMETRY_BLOCK)
+                TELEMETRY_HEADER.pack_into(header, 0, lid, TELEMETRY_IEEE, blocks[0], blocks[1], blocks[2], 0)
+                header[TELEMETRY_GENERATION_OFFSET:TELEMETRY_GENERATION_OFFSET + 3] = bytes((
+                    telemetry['host_generation'], telemetry['controller_available'],
+                    telemetry['controller_generation']))
+                chunk = header
+            else:
+                chunk = TELEMETRY_PATTERN.pack(lid, generation, 0, block) * (TELEMETRY_BLOCK // TELEMETRY_PATTERN.size)
+            data[start:start + TELEMETRY_BLOCK] = chunk[:len(data) - start]
+        return data
+
+    # --- Passthru (SQE) ---
+    def _resolve(self, state, device_path):
+        controller, nsid = _device_name(device_path)
+        if controller is None or controller not in state['controllers']:
+            raise OSError(errno.ENOENT, f"Failed to open {device_path}", str(device_path))
+        return controller, nsid
+
+    def _execute_sqe(self, controller, ctrl, path_nsid, opcode, io, nsid, dwords, data_len, data_in):
+        """
+        Ejecuta un comando NVMe.
+
+        Returns:
+            tuple: (dw0, datos devueltos)
+        """
+        cdw10, cdw11, cdw12 = dwords.get(10, 0), dwords.get(11, 0), dwords.get(12, 0)
+        if io:
+            nsid = nsid or path_nsid or 1
+            if opcode in (OPC_READ, OPC_WRITE):
+                slba = cdw10 | (cdw11 << 32)
+                blocks = (cdw12 & 0xFFFF) + 1
+                payload = self._io(controller, ctrl, nsid, opcode == OPC_WRITE, slba, blocks, data_in)
+                return 0, payload
+            if opcode == OPC_FLUSH:
+                self._namespace(ctrl, nsid)
+                return 0, b""
+        elif opcode == OPC_IDENTIFY:
+            cns = cdw10 & 0xFF
+            if cns == CNS_CONTROLLER:
+                return 0, self._id_ctrl_data(controller, ctrl)
+            if cns == CNS_NAMESPACE:
+                if nsid == 0 or (nsid != NSID_ALL and nsid > _int(self._id_ctrl(controller, ctrl)['nn'])):
+                    raise NvmeStatusError(status_field(SCT_GENERIC, 0x0B, dnr=True))
+                return 0, self._id_ns_data(controller, ctrl, nsid)
+            if cns == CNS_ACTIVE_NAMESPACES:
+                active = sorted(int(key) for key, ns in ctrl['namespaces'].items() if ns['attached'] and int(key) > nsid)
+                data = bytearray(IDENTIFY_DATA_LEN)
+                struct.pack_into(f"<{len(active)}I", data, 0, *active[:IDENTIFY_DATA_LEN // 4])
+                return 0, data
+            raise NvmeStatusError(status_field(SCT_GENERIC, 0x02, dnr=True))
+        elif opcode == OPC_GET_LOG_PAGE:
+            lid = cdw10 & 0xFF
+            numd = ((cdw10 >> 16) | ((cdw11 & 0xFFFF) << 16)) + 1
+            # Log Page Offset (bytes, CDW12/CDW13)
+            offset = cdw12 | (dwords.get(13, 0) << 32)
+            length = min(data_len or numd * 4, numd * 4)
+            if lid in (LID_TELEMETRY_HOST, LID_TELEMETRY_CONTROLLER):
+                create = bool((cdw10 >> 8) & 0x1)
+                return 0, bytes(self._telemetry_data(ctrl, lid, create, offset, length)).ljust(length, b"\0")
+            page = self._smart_data(ctrl) if lid == LID_SMART else b""
+            return 0, bytes(page[offset:offset + numd * 4]).ljust(length, b"\0")
+        elif opcode == OPC_GET_FEATURES:
+            return ctrl['features'].get(str(cdw10 & 0xFF), 0), b""
+        elif opcode == OPC_SET_FEATURES:
+            fid = cdw10 & 0xFF
+            ctrl['features'][str(fid)] = cdw11
+            return (cdw11 if fid == FID_NUMBER_OF_QUEUES else 0), b""
+        elif opcode == OPC_NS_MANAGEMENT:
+            if cdw10 & 0xF == 0:
+                data = bytes(data_in).ljust(NS_MGMT_DATA.size, b"\0")
+                nsze, ncap, flbas, dps = NS_MGMT_DATA.unpack_from(data)
+                return self._create_namespace(ctrl, nsze, ncap, flbas, dps), b""
+            self._delete_namespace(controller, ctrl, nsid)
+            return 0, b""
+        elif opcode == OPC_NS_ATTACHMENT:
+            if cdw10 & 0xF == 0:
+                self._attach(controller, ctrl, nsid)
+            else:
+                self._detach(controller, ctrl, nsid)
+            return 0, b""
+        elif opcode == OPC_FORMAT_NVM:
+            self._format(controller, ctrl, nsid or path_nsid or NSID_ALL, (cdw10 & 0xF) | (((cdw10 >> 12) & 0x3) << 4))
+            return 0, b""
+        raise NvmeStatusError(status_field(SCT_GENERIC, 0x01, dnr=True))
+
+    def submit(self, device_path, opcode, nsid=0, dwords=None, data_len=0, data=b"", io=False, timeout_s=None,
+               command=None):
+        """
+        Ejecuta un comando passthru.
+
+        Args:
+            device_path (str): Controlador o namespace emulado
+            opcode (int): Opcode NVMe
+            nsid (int): Namespace ID
+            dwords (dict): {10: cdw10, 11: cdw11, ...}
+            data_len (int): Tamano del buffer de datos
+            data (bytes): Datos de escritura
+            io (bool): Comando de I/O
+            timeout_s (float): Timeout del comando (limita la espera de un fallo de timeout)
+            command (str): Subcomando de origen (para reglas por subcomando)
+
+        Returns:
+            tuple: (status, dw0, datos, latencia simulada en us); status 0 = exito
+
+        Raises:
+            CommandTimeout: Fallo de timeout inyectado
+            OSError: Dispositivo inexistente
+        """
+        key = opcode_key(opcode, io)
+        with self._transaction() as state:
+            controller, path_nsid = self._resolve(state, device_path)
+            latency_us, rule = self._begin(state, command or key, key, controller)
+            dw0, payload, status = 0, b"", 0
+            if rule is None:
+                try:
+                    dw0, payload = self._execute_sqe(controller, state['controllers'][controller], path_nsid,
+                                                     opcode, io, nsid, dwords or {}, data_len, data)
+                except NvmeStatusError as e:
+                    status = e.status
+        try:
+            self._wait(latency_us, rule, timeout_s)
+        except NvmeStatusError as e:
+            status = e.status
+        if data_len and len(payload) < data_len:
+            payload = bytes(payload).ljust(data_len, b"\0")
+        return status, dw0, payload, latency_us
+
+    # --- Interfaz de linea de comandos ---
+    @staticmethod
+    def _parse(command, argv):
+        specs = COMMAND_OPTIONS[command]
+        options = {}
+        positional = []
+        index = 0
+        while index < len(argv):
+            token = str(argv[index])
+            index += 1
+            if not token.startswith("-") or token == "-":
+                positional.append(token)
+                continue
+            name, sep, value = token.partition("=")
+            if name not in specs:
+                raise UsageError(f"unrecognized option '{name}'")
+            canonical, is_flag = specs[name]
+            if is_flag:
+                # AdminPassthru pasa los flags como "-r True"
+                if not sep and index < len(argv) and str(argv[index]) in ("True", "False"):
+                    value = str(argv[index])
+                    index += 1
+                options[canonical] = value != "False"
+                continue
+            if not sep:
+                if index >= len(argv):
+                    raise UsageError(f"option '{name}' requires an argument")
+                value = str(argv[index])
+                index += 1
+            options[canonical] = value
+        return options, positional
+
+    def run(self, argv):
+        """
+        Ejecuta un comando con la sintaxis de nvme-cli (sin el nombre del binario).
+
+        Returns:
+            tuple: (returncode, stdout bytes, stderr bytes)
+        """
+        argv = [str(arg) for arg in argv]
+        if not argv:
+            return errno.EINVAL, b"", b"usage: nvme <command> [<device>] [<args>]\n"
+        command = argv[0]
+        if command not in COMMAND_OPTIONS:
+            return errno.EINVAL, b"", f"ERROR: Invalid sub-command '{command}' for plugin nvme\n".encode()
+        try:
+            options, positional = self._parse(command, argv[1:])
+        except UsageError as e:
+            return errno.EINVAL, b"", f"{command}: {e}\n".encode()
+        if command == "version":
+            return 0, b"nvme version 2.0 (emulator)\n", b""
+        handler = getattr(self, "_cli_" + command.replace("-", "_"))
+        try:
+            return handler(options, positional)
+        except OSError as e:
+            return e.errno or 1, b"", f"{e.strerror or e}: {os.strerror(e.errno or errno.EIO)}\n".encode()
+        except CommandTimeout:
+            return errno.EINTR, b"", f"{command}: {os.strerror(errno.EINTR)}\n".encode()
+        except NvmeStatusError as e:
+            return (e.status & 0xFF) or 1, b"", f"{e}\n".encode()
+        except UsageError as e:
+            return errno.EINVAL, b"", f"{command}: {e}\n".encode()
+
+    def _cli_command(self, command, options, positional, operation):
+        """
+        Ejecuta operation(controller, ctrl, path_nsid) bajo la transaccion, aplicando latencia y
+        fallos del subcomando.
+        """
+        if not positional:
+            raise UsageError("device path required")
+        timeout_ms = _int(options.get('timeout'))
+        with self._transaction() as state:
+            controller, path_nsid = self._resolve(state, positional[0])
+            latency_us, rule = self._begin(state, command, COMMAND_OPCODES.get(command), controller)
+            result, error = None, None
+            if rule is None:
+                try:
+                    result = operation(controller, state['controllers'][controller], path_nsid)
+                except NvmeStatusError as e:
+                    error = e
+        self._wait(latency_us, rule, timeout_ms / SECONDS_TO_MILISECONS if timeout_ms else None)
+        if error is not None:
+            raise error
+        return result, latency_us
+
+    @staticmethod
+    def _json_requested(options):
+        return options.get('output-format') == "json"
+
+    @staticmethod
+    def _text(fields, title):
+        lines = [title]
+        for key, value in fields.items():
+            if isinstance(value, int) and not isinstance(value, bool):
+                value = f"{value:#x}" if key not in ("nsze", "ncap", "nuse") else value
+            lines.append(f"{key:<10}: {value}")
+        return "\n".join(lines) + "\n"
+
+    def _cli_list(self, options, positional):
+        devices = []
+        with self._transaction(write=False) as state:
+            for controller, ctrl in sorted(state['controllers'].items(), key=lambda item: int(item[0][4:])):
+                identify = self._id_ctrl(controller, ctrl)
+                for key, namespace in sorted(ctrl['namespaces'].items(), key=lambda item: int(item[0])):
+                    if not namespace['attached']:
+                        continue
+                    block_size = self._block_size(namespace)
+                    devices.append({
+                        'NameSpace': int(key),
+                        'DevicePath': self._ns_file(controller, key),
+                        'Firmware': str(identify.get('fr', '')).strip(),
+                        'Index': int(controller[4:]),
+                        'ModelNumber': str(identify.get('mn', '')).strip(),
+                        'SerialNumber': ctrl['serial'],
+                        'UsedBytes': self._nuse(controller, key, namespace) * block_size,
+                        'MaximumLBA': namespace['nsze'],
+                        'PhysicalSize': namespace['nsze'] * block_size,
+                        'SectorSize': block_size,
+                    })
+        if self._json_requested(options):
+            return 0, json.dumps({'Devices': devices}, indent=2).encode() + b"\n", b""
+        lines = [f"{'Node':<40} {'SN':<20} {'Model':<40} {'Namespace':<9} {'Usage':<20} {'FW Rev':<8}",
+                 f"{'-' * 40} {'-' * 20} {'-' * 40} {'-' * 9} {'-' * 20} {'-' * 8}"]
+        for device in devices:
+            usage = f"{device['UsedBytes']} / {device['PhysicalSize']} B"
+            lines.append(f"{device['DevicePath']:<40} {device['SerialNumber']:<20} {device['ModelNumber']:<40} "
+                         f"{device['NameSpace']:<9} {usage:<20} {device['Firmware']:<8}")
+        return 0, ("\n".join(lines) + "\n").encode(), b""
+
+    def _cli_id_ctrl(self, options, positional):
+        def operation(controller, ctrl, path_nsid):
+            if options.get('raw-binary'):
+                return self._id_ctrl_data(controller, ctrl)
+            return self._id_ctrl(controller, ctrl)
+        identify, _ = self._cli_command("id-ctrl", options, positional, operation)
+        if options.get('raw-binary'):
+            return 0, bytes(identify), b""
+        if self._json_requested(options):
+            return 0, json.dumps(identify, indent=2).encode() + b"\n", b""
+        return 0, self._text(identify, "NVME Identify Controller:").encode(), b""
+
+    def _cli_id_ns(self, options, positional):
+        def operation(controller, ctrl, path_nsid):
+            nsid = _int(options.get('namespace-id')) or path_nsid
+            if not nsid:
+                # nvme-cli pide el NSID al kernel; un nodo de controlador no lo tiene
+                raise OSError(errno.ENOTTY, "get-namespace-id")
+            if options.get('raw-binary'):
+                return nsid, self._id_ns_data(controller, ctrl, nsid)
+            return nsid, self._id_ns(controller, ctrl, nsid) or self._id_ns_zero()
+        (nsid, identify), _ = self._cli_command("id-ns", options, positional, operation)
+        if options.get('raw-binary'):
+            return 0, bytes(identify), b""
+        if self._json_requested(options):
+            return 0, json.dumps(identify, indent=2).encode() + b"\n", b""
+        return 0, self._text(identify, f"NVME Identify Namespace {nsid}:").encode(), b""
+
+    def _cli_list_ns(self, options, positional):
+        def operation(controller, ctrl, path_nsid):
+            start = _int(options.get('namespace-id')) or 0
+            return [int(key) for key, namespace in ctrl['namespaces'].items()
+                    if int(key) > start and (namespace['attached'] or options.get('all'))]
+        nsids, _ = self._cli_command("list-ns", options, positional, operation)
+        nsids.sort()
+        if self._json_requested(options):
+            return 0, json.dumps({'nsid_list': [{'nsid': nsid} for nsid in nsids]}, indent=2).encode() + b"\n", b""
+        return 0, "".join(f"[{index:4d}]:{nsid:#x}\n" for index, nsid in enumerate(nsids)).encode(), b""
+
+    @staticmethod
+    def _id_ns_zero():
+        return {'nsze': 0, 'ncap': 0, 'nuse': 0, 'nsfeat': 0, 'nlbaf': 0, 'flbas': 0, 'mc': 0, 'dpc': 0,
+                'dps': 0, 'nmic': 0, 'fpi': 0, 'nvmcap': 0, 'lbafs': []}
+
+    def _cli_smart_log(self, options, positional):
+        def operation(controller, ctrl, path_nsid):
+            return controller, (self._smart_data(ctrl) if options.get('raw-binary') else self._smart(ctrl))
+        (controller, smart), _ = self._cli_command("smart-log", options, positional, operation)
+        if options.get('raw-binary'):
+            return 0, bytes(smart), b""
+        if self._json_requested(options):
+            return 0, json.dumps(smart, indent=2).encode() + b"\n", b""
+        nsid = _int(options.get('namespace-id'), NSID_ALL)
+        lines = [f"Smart Log for NVME device:{controller} namespace-id:{nsid:x}"]
+        lines.extend(f"{name:<40}: {value}" for name, value in smart.items())
+        return 0, ("\n".join(lines) + "\n").encode(), b""
+
+    def _cli_passthru(self, options, positional, io):
+        if not positional:
+            raise UsageError("device path required")
+        if 'opcode' not in options:
+            raise UsageError("opcode required")
+        opcode = _int(options['opcode'])
+        data_len = _int(options.get('data-len'), 0)
+        data = b""
+        if options.get('write'):
+            source = options.get('input-file')
+            if source:
+                with open(source, "rb") as f:
+                    data = f.read(data_len or -1)
+            else:
+                data = sys.stdin.buffer.read(data_len or -1)
+        dwords = {index: _int(options.get(f"cdw{index}"), 0) for index in (2, 3, 10, 11, 12, 13, 14, 15)}
+        timeout_ms = _int(options.get('timeout'))
+        status, dw0, payload, latency_us = self.submit(
+            positional[0], opcode, nsid=_int(options.get('namespace-id'), 0), dwords=dwords, data_len=data_len,
+            data=data, io=io, timeout_s=timeout_ms / SECONDS_TO_MILISECONS if timeout_ms else None,
+            command="io-passthru" if io else "admin-passthru")
+        kind = "IO" if io else "Admin"
+        name = (IO_OPCODE_NAMES if io else ADMIN_OPCODE_NAMES).get(opcode, "Vendor Specific")
+        stdout = b""
+        if options.get('latency'):
+            stdout += f"{kind} Command {name} latency: {int(latency_us)} us\n".encode()
+        if status:
+            return (status & 0xFF) or 1, stdout, f"{status_text(status)}\n".encode()
+        if options.get('read') and data_len:
+            if options.get('raw-binary'):
+                stdout += bytes(payload[:data_len])
+            else:
+                stdout += f"NVMe command result:{dw0:08x}\n".encode() + _hexdump(payload[:data_len]).encode()
+        return 0, stdout, f"{kind} Command {name} is Success and result: 0x{dw0:08x}\n".encode()
+
+    def _cli_admin_passthru(self, options, positional):
+        return self._cli_passthru(options, positional, io=False)
+
+    def _cli_io_passthru(self, options, positional):
+        return self._cli_passthru(options, positional, io=True)
+
+    def _cli_io(self, command, options, positional):
+        write = command == "write"
+        data_path = options.get('data')
+        data = b""
+        if write:
+            if data_path:
+                with open(data_path, "rb") as f:
+                    data = f.read()
+            else:
+                data = sys.stdin.buffer.read()
+
+        def operation(controller, ctrl, path_nsid):
+            nsid = _int(options.get('namespace-id')) or path_nsid or 1
+            namespace = self._namespace(ctrl, nsid)
+            blocks = _int(options.get('block-count'), 0) + 1
+            # nvme-cli redondea data-size al numero de bloques pedido
+            blocks = max(blocks, -(-_int(options.get('data-size'), 0) // self._block_size(namespace)))
+            return self._io(controller, ctrl, nsid, write, _int(options.get('start-block'), 0), blocks, data)
+        payload, latency_us = self._cli_command(command, options, positional, operation)
+        stdout = b""
+        if options.get('latency'):
+            stdout += f"{command} latency: {int(latency_us)} us\n".encode()
+        if not write:
+            if data_path:
+                with open(data_path, "wb") as f:
+                    f.write(payload)
+            else:
+                stdout += payload
+        return 0, stdout, f"{command}: Success\n".encode()
+
+    def _cli_read(self, options, positional):
+        return self._cli_io("read", options, positional)
+
+    def _cli_write(self, options, positional):
+        return self._cli_io("write", options, positional)
+
+    def _cli_create_ns(self, options, positional):
+        def operation(controller, ctrl, path_nsid):
+            flbas = _int(options.get('flbas'), 0)
+            if options.get('block-size') is not None:
+                block_size = _int(options['block-size'])
+                matches = [index for index, (_, ds, _) in enumerate(LBA_FORMATS) if 1 << ds == block_size]
+                if not matches:
+                    raise UsageError(f"Please correct block size {block_size}, or specify FLBAS directly")
+                flbas = matches[0]
+            nsze = _int(options.get('nsze'), 0)
+            return self._create_namespace(ctrl, nsze, _int(options.get('ncap'), nsze), flbas,
+                                          _int(options.get('dps'), 0))
+        nsid, _ = self._cli_command("create-ns", options, positional, operation)
+        return 0, f"create-ns: Success, created nsid:{nsid}\n".encode(), b""
+
+    def _cli_delete_ns(self, options, positional):
+        nsid = _int(options.get('namespace-id'))
+        if nsid is None:
+            raise UsageError("namespace-id required")
+        self._cli_command("delete-ns", options, positional,
+                          lambda controller, ctrl, path_nsid: self._delete_namespace(controller, ctrl, nsid))
+        return 0, f"delete-ns: Success, deleted nsid:{nsid}\n".encode(), b""
+
+    def _cli_attachment(self, command, options, positional):
+        nsid = _int(options.get('namespace-id'))
+        if nsid is None:
+            raise UsageError("namespace-id required")
+        operation = self._attach if command == "attach-ns" else self._detach
+        self._cli_command(command, options, positional,
+                          lambda controller, ctrl, path_nsid: operation(controller, ctrl, nsid))
+        return 0, f"{command}: Success, nsid:{nsid}\n".encode(), b""
+
+    def _cli_attach_ns(self, options, positional):
+        return self._cli_attachment("attach-ns", options, positional)
+
+    def _cli_detach_ns(self, options, positional):
+        return self._cli_attachment("detach-ns", options, positional)
+
+    def _cli_format(self, options, positional):
+        def operation(controller, ctrl, path_nsid):
+            nsid = _int(options.get('namespace-id')) or path_nsid or NSID_ALL
+            lbaf = _int(options.get('lbaf'))
+            if options.get('block-size') is not None:
+                block_size = _int(options['block-size'])
+                matches = [index for index, (_, ds, _) in enumerate(LBA_FORMATS) if 1 << ds == block_size]
+                if not matches:
+                    raise UsageError(f"LBAF corresponding to given block size {block_size} not found")
+                lbaf = matches[0]
+            self._format(controller, ctrl, nsid, lbaf or 0)
+            return nsid
+        nsid, _ = self._cli_command("format", options, positional, operation)
+        return 0, f"Success formatting namespace:{nsid:x}\n".encode(), b""
+
+
+def _hexdump(data):
+    """Volcado hexadecimal con el formato de nvme-cli."""
+    lines = ["     0  1  2  3  4  5  6  7  8  9  a  b  c  d  e  f"]
+    for offset in range(0, len(data), 16):
+        chunk = bytes(data[offset:offset + 16])
+        text = "".join(chr(byte) if 32 <= byte < 127 else "." for byte in chunk)
+        lines.append(f"{offset:04x}: {' '.join(f'{byte:02x}' for byte in chunk):<47} \"{text}\"")
+    return "\n".join(lines) + "\n"
+
+
+class EmulatorTransport(NvmeTransport):
+    """Transporte en proceso: los SQE se ejecutan en el emulador sin crear procesos."""
+    name = "emulator"
+
+    def __init__(self, emulator=None, recorder=None):
+        self.emulator = emulator if emulator is not None else NvmeEmulator()
+        self.recorder = recorder if recorder is not None else default_recorder()
+
+    def submit(self, device_path, sqe, data_len=None, read=False, write=False, io=False):
+        dwords = {index: _int(getattr(sqe, f"DW{index}"), 0) & 0xFFFFFFFF for index in (2, 3, 10, 11, 12, 13, 14, 15)}
+        opcode = _int(sqe.OPC, 0) & 0xFF
+        start = time.perf_counter()
+        try:
+            status, dw0, payload, latency_us = self.emulator.submit(
+                device_path, opcode, nsid=_int(sqe.NSID, 0), dwords=dwords, data_len=data_len or 0,
+                data=bytes(sqe.data_buffer) if write else b"", io=io)
+        except CommandTimeout:
+            raise OSError(errno.EINTR, os.strerror(errno.EINTR))
+        elapsed_ms = (time.perf_counter() - start) * SECONDS_TO_MILISECONS
+        self.recorder.record(device_path, opcode_key(opcode, io), host_us=elapsed_ms * 1000)
+
+        cqe = CompletionQueueEntry()
+        cqe.populate_cqe({DW0: dw0, DW1: 0, DW2: 0, DW3: status << SC_BIT}, bytearray(payload if read else b""))
+        cqe.latency = latency_us / 1000
+        cqe.elapsed_time = elapsed_ms
+        return cqe
+
+
+class EmulatorIOEngine(object):
+    """
+    Motor de I/O directo sobre un namespace emulado (misma interfaz que DirectIOEngine para
+    NvmeCommands._direct_io). Cada operacion es un comando Read/Write del emulador, asi cuenta en
+    el log SMART (host read/write commands, data units) y respeta latencias y fallos; un
+    pread/pwrite sobre el archivo disperso pasaria por alto al emulador.
+    """
+    MAX_BLOCKS = 0x10000                  # NLB de 16 bits por comando
+
+    def __init__(self, path, emulator=None):
+        self.path = path
+        self.emulator = emulator if emulator is not None else NvmeEmulator(emulator_root(path))
+        with self.emulator._transaction(write=False) as state:
+            controller, nsid = self.emulator._resolve(state, path)
+            try:
+                namespace = self.emulator._namespace(state['controllers'][controller], nsid or 1)
+            except NvmeStatusError as e:
+                raise OSError(errno.ENODEV, f"{path}: {e}")
+            self.lba_size = self.emulator._block_size(namespace)
+
+    def _submit(self, opcode, offset, length, data=b""):
+        if offset % self.lba_size or length % self.lba_size:
+            raise ValueError(f"I/O requires offset/length multiple of {self.lba_size} "
+                             f"(offset={offset}, length={length})")
+        payload = []
+        slba = offset // self.lba_size
+        remaining = length // self.lba_size
+        while remaining:
+            blocks = min(remaining, self.MAX_BLOCKS)
+            size = blocks * self.lba_size
+            dwords = {10: slba & 0xFFFFFFFF, 11: slba >> 32, 12: blocks - 1}
+            chunk = data[:size] if opcode == OPC_WRITE else b""
+            try:
+                status, _, returned, _ = self.emulator.submit(self.path, opcode, dwords=dwords,
+                                                              data_len=size if opcode == OPC_READ else 0,
+                                                              data=chunk, io=True)
+            except CommandTimeout:
+                raise OSError(errno.ETIMEDOUT, os.strerror(errno.ETIMEDOUT), self.path)
+            if status:
+                raise OSError(errno.EIO, f"{IO_OPCODE_NAMES[opcode]}: {status_text(status)}", self.path)
+            payload.append(returned[:size])
+            data = data[size:]
+            slba += blocks
+            remaining -= blocks
+        return b"".join(payload)
+
+    def read(self, offset, length):
+        return self._submit(OPC_READ, offset, length)
+
+    def write(self, offset, data):
+        data = bytes(data)
+        self._submit(OPC_WRITE, offset, len(data), data)
+        return len(data)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class EmulatedNvmeCommands(NvmeCommands):
+    """NvmeCommands que ejecuta los comandos nvme-cli dentro del proceso, sobre el emulador."""
+    def __init__(self, logger, emulator=None, device=None, transport=None):
+        self.emulator = emulator if emulator is not None else NvmeEmulator()
+        super().__init__(logger, device=device or self.emulator.controller_path(),
+                         transport=transport or EmulatorTransport(self.emulator))
+
+    def run_command(self, cmd):
+        parts = [str(part) for part in (cmd if isinstance(cmd, (list, tuple)) else str(cmd).split())]
+        command = " ".join(parts)
+        self.logger.info("Executing command: %s", command)
+        start = time.perf_counter()
+        returncode, stdout, stderr = self.emulator.run(parts[1:])
+        stdout = stdout.decode(errors="replace")
+        stderr = stderr.decode(errors="replace")
+        if returncode:
+            self._log_command_failure(parts, command, returncode, stdout, stderr)
+            return None
+        self._record_latency(parts, time.perf_counter() - start, stdout, stderr)
+        return stdout
+
+
+def main(argv=None):
+    """Punto de entrada del ejecutable (utils/nvme_emulator.py)."""
+    argv = sys.argv[1:] if argv is None else argv
+    returncode, stdout, stderr = NvmeEmulator().run(argv)
+    sys.stdout.buffer.write(stdout)
+    sys.stderr.buffer.write(stderr)
+    sys.stdout.flush()
+    sys.stderr.flush()
+    return returncode
@@ -0,0 +1,192 @@
+"""
+Ejecucion de una prueba en varios drives a la vez.
+
+FleetRunner resuelve los numeros de serie una sola vez (indice persistente / descubrimiento) y
+lanza un proceso worker por dispositivo, con un limite configurable de procesos simultaneos. Cada
+worker crea su propio TestManager (logger, wrapper y prueba independientes), de modo que validar
+un rack completo tarda lo que el drive mas lento y no la suma de todos.
+
+Ejemplo:
+    runner = FleetRunner("test_smart_log", max_workers=8)
+    summary = runner.run(serials=None, on_result=print)   # None = todos los descubiertos
+"""
+import multiprocessing
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .device_index import DeviceIndex
+from .discovery import DeviceDiscovery
+from .results_db import default_database, new_session
+
+DEFAULT_MAX_WORKERS = 8
+
+STATUS_PASS = "PASS"
+STATUS_FAIL = "FAIL"
+STATUS_ERROR = "ERROR"
+
+
+def is_passing_result(result):
+    """Las pruebas devuelven None o False al fallar y un valor (True, CQE, dict...) al pasar."""
+    return result is not None and result is not False
+
+
+def run_device_test(serial_number, testname, device_path=None, session=None):
+    """
+    Worker: ejecuta una prueba sobre un dispositivo en el proceso actual.
+
+    Returns:
+        dict: serial, device, test, status, duration, error (solo tipos serializables)
+    """
+    from .test_manager import TestManager
+
+    start = time.time()
+    report = {
+        'serial': serial_number,
+        'device': device_path,
+        'test': testname,
+        'status': STATUS_ERROR,
+        'duration': 0.0,
+        'error': None,
+    }
+    manager = None
+    try:
+        manager = TestManager(serial_number, testname, device_path=device_path, session=session)
+        report['device'] = manager.physical_path
+        if manager.test is None:
+            report['error'] = "Unable to initialize test"
+        else:
+            result = manager.run()
+            report['status'] = STATUS_PASS if is_passing_result(result) else STATUS_FAIL
+    except Exception as e:
+        report['error'] = f"{e}\n{traceback.format_exc()}"
+    finally:
+        # Los workers terminan con os._exit (sin atexit): vaciar el log en modo cola y las
+        # escrituras pendientes de la base de resultados antes de salir
+        if manager is not None:
+            manager.logger.close()
+        database = default_database()
+        if database is not None:
+            database.flush()
+    report['duration'] = time.time() - start
+    return report
+
+
+class FleetRunner(object):
+    def __init__(self, testname, max_workers=DEFAULT_MAX_WORKERS, logger=None, index=None):
+        """
+        Args:
+            testname (str): Nombre de la prueba en tests_pool
+            max_workers (int): Procesos (dispositivos) simultaneos
+            logger (TestLogger): Logger del runner (se crea uno si es None)
+            index (DeviceIndex): Indice SN -> dispositivo a reutilizar
+        """
+        if logger is None:
+            from .logger import TestLogger
+            logger = TestLogger(f"fleet_{testname}")
+        self.testname = testname
+        self.max_workers = max_workers
+        self.logger = logger
+        self.index = index or DeviceIndex(logger)
+        self.session = None
+
+    def resolve(self, serials=None):
+        """
+        Resuelve los numeros de serie a rutas de dispositivo.
+
+        Args:
+            serials (list): Numeros de serie; None = todos los dispositivos descubiertos
+
+        Returns:
+            dict: {serial: ruta o None si no se encontro}
+        """
+        if serials is None:
+            devices = self.index.refresh()
+            return {serial: DeviceDiscovery.preferred_path(device) for serial, device in devices.items()}
+
+        targets = {}
+        for serial in serials:
+            device = self.index.lookup(serial)
+            targets[serial.strip()] = DeviceDiscovery.preferred_path(device) if device else None
+        return targets
+
+    def run(self, serials=None, on_result=None):
+        """
+        Ejecuta la prueba en todos los dispositivos.
+
+        Args:
+            serials (list): Numeros de serie; None = todos los descubiertos
+            on_result (callable): on_result(report) por cada dispositivo en cuanto termina
+
+        Returns:
+            dict: Resumen agregado (ver summarize)
+        """
+        start = time.time()
+        # Todas las ejecuciones de esta flota comparten sesion en la base de resultados
+        self.session = new_session()
+        targets = self.resolve(serials)
+        reports = []
+        pending = {}
+
+        for serial, device_path in targets.items():
+            if device_path is None:
+                report = {'serial': serial, 'device': None, 'test': self.testname, 'status': STATUS_ERROR,
+                          'duration': 0.0, 'error': f"Device with serial number {serial} not found"}
+                self._collect(report, reports, on_result)
+            else:
+                pending[serial] = device_path
+
+        self.logger.info(f"Fleet run {self.testname}: {len(pending)} device(s), max_workers={self.max_workers}")
+        if pending:
+            workers = max(1, min(self.max_workers, len(pending)))
+            # Un proceso nuevo por dispositivo: ningun estado (fds, loggers) se comparte entre drives
+            with ProcessPoolExecutor(max_workers=workers, max_tasks_per_child=1,
+                                     mp_context=multiprocessing.get_context("spawn")) as pool:
+                futures = {pool.submit(run_device_test, serial, self.testname, device_path, self.session): serial
+                           for serial, device_path in pending.items()}
+                for future in as_completed(futures):
+                    serial = futures[future]
+                    try:
+                        report = future.result()
+                    except Exception as e:
+                        report = {'serial': serial, 'device': pending[serial], 'test': self.testname,
+                                  'status': STATUS_ERROR, 'duration': 0.0, 'error': f"Worker failed: {e}"}
+                    self._collect(report, reports, on_result)
+
+        summary = self.summarize(reports, time.time() - start)
+        self.logger.info(f"Fleet run {self.testname} finished: {summary['passed']} passed, "
+                         f"{summary['failed']} failed, {summary['errors']} error(s) "
+                         f"in {summary['wall_time']:.2f}s")
+        return summary
+
+    def _collect(self, report, reports, on_result):
+        reports.append(report)
+        log = self.logger.info if report['status'] == STATUS_PASS else self.logger.error
+        log(f"[{report['serial']}] {report['device']}: {report['status']} ({report['duration']:.2f}s)"
+            + (f" - {report['error']}" if report['error'] else ""))
+        if on_result is not None:
+            try:
+                on_result(report)
+            except Exception as e:
+                self.logger.error(f"Fleet result callback failed: {e}")
+
+    def summarize(self, reports, wall_time):
+        """
+        Returns:
+            dict: test, session, total, passed, failed, errors, wall_time, device_time (suma), slowest, reports
+        """
+        passed = sum(1 for report in reports if report['status'] == STATUS_PASS)
+        failed = sum(1 for report in reports if report['status'] == STATUS_FAIL)
+        slowest = max(reports, key=lambda report: report['duration'], default=None)
+        return {
+            'test': self.testname,
+            'session': self.session,
+            'total': len(reports),
+            'passed': passed,
+            'failed': failed,
+            'errors': len(reports) - passed - failed,
+            'wall_time': wall_time,
+            'device_time': sum(report['duration'] for report in reports),
+            'slowest': slowest['serial'] if slowest else None,
+            'reports': sorted(reports, key=lambda report: report['serial']),
+        }
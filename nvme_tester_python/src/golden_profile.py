@@ -0,0 +1,251 @@
+"""
+Perfiles de referencia (golden) de id-ctrl indexados por (modelo, firmware).
+
+Cada archivo JSON de utils/json es un perfil: la salida de `nvme id-ctrl -o json` de un drive de
+referencia, o un envoltorio con reglas propias:
+
+    {"model": "...", "firmware": "6CV10100",      # "*" = cualquier firmware del modelo
+     "ignore": ["sn", "psds.*.idle_power"],       # patrones fnmatch sobre rutas con puntos
+     "tolerances": {"wctemp": 2, "psds.*.max_power": {"rel": 0.05}},
+     "id_ctrl": {...}}
+
+El almacen se carga una sola vez por proceso (default_store()) y cada perfil precompila su
+comparador: rutas de acceso a los campos, conjunto ignorado, tolerancias y el hash de los campos
+exactos. Comparar un drive conforme es un hash de sus valores normalizados; el diff campo a campo
+solo se calcula cuando el hash no coincide.
+
+Ejemplo:
+    profile = default_store().lookup(output['mn'], output['fr'])
+    result = profile.compare(output)
+    result['match'], result['mismatches']
+"""
+import fnmatch
+import hashlib
+import json
+import os
+import re
+import threading
+
+PROFILE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "utils", "json")
+# Campos propios de cada unidad (o del espacio libre) que nunca coinciden con la referencia
+DEFAULT_IGNORE = ("sn", "fguid", "unvmcap", "subnqn")
+ANY_FIRMWARE = "*"
+LENGTH_KEY = "#"
+_MISSING = object()
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def normalize(value):
+    """Valor comparable: cadenas sin el relleno de espacios de los campos ASCII de identify."""
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def _compile_patterns(patterns):
+    if not patterns:
+        return None
+    return re.compile("|".join(fnmatch.translate(pattern) for pattern in patterns))
+
+
+def _compile_tolerances(tolerances):
+    compiled = []
+    for pattern, tolerance in (tolerances or {}).items():
+        if isinstance(tolerance, dict):
+            absolute, relative = tolerance.get('abs', 0), tolerance.get('rel', 0)
+        else:
+            absolute, relative = tolerance, 0
+        compiled.append((re.compile(fnmatch.translate(pattern)), absolute, relative))
+    return compiled
+
+
+def _flatten(value, path, ignore, fields):
+    """Recorre el payload de referencia: (ruta con puntos, claves de acceso, valor) por hoja."""
+    dotted = ".".join(str(key) for key in path)
+    if path and ignore is not None and ignore.match(dotted):
+        return
+    if isinstance(value, dict):
+        for key, item in value.items():
+            _flatten(item, path + (key,), ignore, fields)
+    elif isinstance(value, list):
+        # La longitud tambien se compara: un psds con entradas de mas o de menos es un error
+        fields.append((f"{dotted}.{LENGTH_KEY}", path + (LENGTH_KEY,), len(value)))
+        for index, item in enumerate(value):
+            _flatten(item, path + (index,), ignore, fields)
+    else:
+        fields.append((dotted, path, normalize(value)))
+
+
+def _extract(payload, keys):
+    value = payload
+    for key in keys:
+        if key == LENGTH_KEY:
+            return len(value) if isinstance(value, list) else _MISSING
+        try:
+            value = value[key]
+        except (KeyError, IndexError, TypeError):
+            return _MISSING
+    return normalize(value)
+
+
+def _digest(values):
+    return hashlib.blake2b(json.dumps(values, separators=(",", ":"), default=repr).encode(),
+                           digest_size=16).digest()
+
+
+class GoldenProfile(object):
+    def __init__(self, payload, model=None, firmware=None, ignore=DEFAULT_IGNORE, tolerances=None, source=None):
+        """
+        Args:
+            payload (dict): Salida id-ctrl de referencia
+            model (str): Modelo (por defecto payload['mn'])
+            firmware (str): Firmware (por defecto payload['fr']; "*" para cualquiera)
+            ignore (iterable): Patrones de rutas ignoradas ("sn", "psds.*.idle_power")
+            tolerances (dict): Patron -> tolerancia absoluta o {"abs": x, "rel": y}
+            source (str): Archivo de origen (para los mensajes)
+        """
+        self.model = normalize(model if model is not None else payload.get('mn', ""))
+        self.firmware = normalize(firmware if firmware is not None else payload.get('fr', ""))
+        self.ignore = tuple(ignore or ())
+        self.source = source
+        ignore_pattern = _compile_patterns(self.ignore)
+        tolerance_rules = _compile_tolerances(tolerances)
+
+        fields = []
+        _flatten(payload, (), ignore_pattern, fields)
+        self.exact = []
+        self.tolerant = []
+        for dotted, keys, expected in fields:
+            rule = next((rule for rule in tolerance_rules if rule[0].match(dotted)), None)
+            if rule is None:
+                self.exact.append((dotted, keys, expected))
+            else:
+                self.tolerant.append((dotted, keys, expected, rule[1], rule[2]))
+        self.field_count = len(fields)
+        self.digest = _digest([expected for _, _, expected in self.exact])
+
+    @property
+    def key(self):
+        return (self.model, self.firmware)
+
+    @staticmethod
+    def _within(expected, actual, absolute, relative):
+        if not isinstance(expected, (int, float)) or not isinstance(actual, (int, float)):
+            return expected == actual
+        return abs(actual - expected) <= max(absolute, relative * abs(expected))
+
+    def compare(self, output):
+        """
+        Compara una salida id-ctrl con el perfil.
+
+        Returns:
+            dict: match, fast_path (el hash de los campos exactos coincidio), compared,
+                  mismatches (lista de (ruta, esperado, encontrado); None si falta el campo)
+        """
+        actual = [_extract(output, keys) for _, keys, _ in self.exact]
+        fast_path = _MISSING not in actual and _digest(actual) == self.digest
+        mismatches = []
+        if not fast_path:
+            for (dotted, _, expected), value in zip(self.exact, actual):
+                if value is _MISSING or value != expected:
+                    mismatches.append((dotted, expected, None if value is _MISSING else value))
+        for dotted, keys, expected, absolute, relative in self.tolerant:
+            value = _extract(output, keys)
+            if value is _MISSING or not self._within(expected, value, absolute, relative):
+                mismatches.append((dotted, expected, None if value is _MISSING else value))
+        return {
+            'match': not mismatches,
+            'fast_path': fast_path,
+            'compared': self.field_count,
+            'mismatches': mismatches,
+        }
+
+    @classmethod
+    def from_document(cls, document, source=None):
+        """Perfil desde un JSON de utils/json (salida id-ctrl directa o envoltorio con reglas)."""
+        if 'id_ctrl' not in document:
+            return cls(document, source=source)
+        return cls(document['id_ctrl'], model=document.get('model'), firmware=document.get('firmware'),
+                   ignore=document.get('ignore', DEFAULT_IGNORE), tolerances=document.get('tolerances'),
+                   source=source)
+
+
+class GoldenProfileStore(object):
+    def __init__(self, directory=PROFILE_DIR):
+        """
+        Args:
+            directory (str): Directorio con los perfiles (*.json)
+        """
+        self.directory = directory
+        self.profiles = {}
+        self.errors = []
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Lee e indexa todos los perfiles del directorio (se llama una vez, de forma perezosa)."""
+        profiles = {}
+        errors = []
+        try:
+            names = sorted(name for name in os.listdir(self.directory) if name.endswith(".json"))
+        except OSError as e:
+            names = []
+            errors.append(f"{self.directory}: {e}")
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path, "r") as f:
+                    profile = GoldenProfile.from_document(json.load(f), source=path)
+            except (OSError, ValueError, AttributeError) as e:
+                errors.append(f"{path}: {e}")
+                continue
+            if profile.key in profiles:
+                errors.append(f"{path}: duplicate profile for {profile.key} "
+                              f"(already defined in {profiles[profile.key].source})")
+                continue
+            profiles[profile.key] = profile
+        self.profiles = profiles
+        self.errors = errors
+        self._loaded = True
+        return self
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self.load()
+
+    def reload(self):
+        with self._lock:
+            return self.load()
+
+    def lookup(self, model, firmware):
+        """
+        Perfil de (modelo, firmware); si no hay uno exacto, el del modelo con firmware "*".
+
+        Returns:
+            GoldenProfile: Perfil, None si el modelo/firmware no tiene referencia
+        """
+        self._ensure_loaded()
+        model, firmware = normalize(model), normalize(firmware)
+        profile = self.profiles.get((model, firmware))
+        if profile is None:
+            profile = self.profiles.get((model, ANY_FIRMWARE))
+        return profile
+
+    def firmwares(self, model):
+        """Firmwares con perfil para un modelo (para explicar un lookup fallido)."""
+        self._ensure_loaded()
+        model = normalize(model)
+        return sorted(firmware for profile_model, firmware in self.profiles if profile_model == model)
+
+
+def default_store():
+    """Almacen compartido del proceso sobre utils/json (se carga en el primer lookup)."""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = GoldenProfileStore()
+        return _default_store
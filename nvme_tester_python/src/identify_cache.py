@@ -0,0 +1,103 @@
+"""
+Cache por controlador de los comandos de identificacion (id-ctrl, id-ns, list-ns).
+
+Los datos de identify solo cambian cuando se crea, borra, asocia, desasocia o formatea un
+namespace, o al activar un firmware. NvmeCommands guarda la salida de esos comandos en el cache
+del controlador (compartido por todas las instancias del proceso: descubrimiento, TestManager y
+pruebas) y lo invalida al ejecutar un comando que modifica el estado, por nvme-cli o passthru.
+
+Un contador de generacion evita guardar una respuesta que estaba en vuelo mientras se ejecutaba
+un comando que invalida (p.ej. un id-ns asincrono concurrente con un format).
+
+Ejemplo:
+    cache = controller_cache("/dev/nvme0n1")      # mismo cache que /dev/nvme0
+    cache.stats()   # {'hits': 3, 'misses': 1, 'invalidations': 0, 'entries': 1}
+"""
+import os
+import re
+import threading
+import time
+
+# Subcomandos de nvme-cli cuyo resultado se cachea
+CACHEABLE_COMMANDS = frozenset({"id-ctrl", "id-ns", "list-ns"})
+# Subcomandos que cambian namespaces, formatos o firmware: vacian el cache del controlador
+INVALIDATING_COMMANDS = frozenset({"create-ns", "delete-ns", "attach-ns", "detach-ns", "format",
+                                   "fw-commit", "fw-activate", "sanitize"})
+# Opcodes admin equivalentes (Namespace Management, Namespace Attachment, Firmware Commit,
+# Format NVM, Sanitize)
+INVALIDATING_OPCODES = frozenset({0x0D, 0x15, 0x10, 0x80, 0x84})
+
+_NAMESPACE_NODE = re.compile(r"^(.*nvme\d+)n\d+$")
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def controller_key(device):
+    """Ruta del controlador de un nodo de namespace (/dev/nvme0n1 -> /dev/nvme0)."""
+    device = os.path.normpath(str(device))
+    match = _NAMESPACE_NODE.match(device)
+    return match.group(1) if match else device
+
+
+class IdentifyCache(object):
+    def __init__(self, controller):
+        """
+        Args:
+            controller (str): Ruta del controlador
+        """
+        self.controller = controller
+        self.entries = {}
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, ttl=None):
+        """
+        Returns:
+            tuple: (salida cacheada o None, generacion a pasar a put())
+        """
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and (ttl is None or time.monotonic() - entry[1] <= ttl):
+                self.hits += 1
+                return entry[0], self.generation
+            self.misses += 1
+            return None, self.generation
+
+    def put(self, key, output, generation):
+        """Guarda una salida salvo que el cache se haya invalidado desde el get() correspondiente."""
+        with self._lock:
+            if generation == self.generation:
+                self.entries[key] = (output, time.monotonic())
+
+    def invalidate(self):
+        with self._lock:
+            self.entries.clear()
+            self.generation += 1
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'invalidations': self.invalidations,
+                    'entries': len(self.entries)}
+
+
+def controller_cache(device):
+    """Cache compartido del controlador de `device` (se crea en el primer uso)."""
+    key = controller_key(device)
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = IdentifyCache(key)
+        return cache
+
+
+def invalidate_all():
+    """Vacia todos los caches (p.ej. tras un reset de subsistema o un hotplug)."""
+    with _caches_lock:
+        caches = list(_caches.values())
+    for cache in caches:
+        cache.invalidate()
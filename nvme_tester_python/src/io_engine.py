@@ -0,0 +1,293 @@
+"""
+Motor de I/O directo para cargas de lectura/escritura.
+
+DirectIOEngine abre el nodo de bloque del namespace (o cualquier archivo, para pruebas) con
+O_DIRECT y ejecuta las operaciones con os.preadv / os.pwritev desde un pool de hilos. Cada
+worker usa su propio buffer alineado preasignado (mmap anonimo, alineado a pagina), de modo que
+no hay procesos nvme-cli ni archivos temporales en el camino de datos.
+
+Ejemplo:
+    with DirectIOEngine("/dev/nvme0n1", workers=8) as engine:
+        stats = engine.run(op="read", pattern="random", block_size=4096, total_bytes=1 << 30)
+        stats['iops'], stats['bandwidth_mbps']
+"""
+import errno
+import mmap
+import os
+import random
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import fcntl
+except ImportError:  # Plataformas sin ioctl (Windows)
+    fcntl = None
+
+from .latency import default_recorder, LatencyHistogram, NANOSECONDS_PER_MICROSECOND
+
+OP_READ = "read"
+OP_WRITE = "write"
+PATTERN_SEQUENTIAL = "seq"
+PATTERN_RANDOM = "random"
+
+DEFAULT_BLOCK_SIZE = 4096
+DEFAULT_WORKERS = 4
+MAX_THREAD_WORKERS = 64
+DEFAULT_LOGICAL_BLOCK_SIZE = 512
+ALIGNMENT = mmap.PAGESIZE
+BYTES_PER_MB = 1024 * 1024
+
+# linux/fs.h: _IO(0x12, 104) tamano de sector logico del dispositivo de bloque
+BLKSSZGET = 0x1268
+
+O_DIRECT = getattr(os, "O_DIRECT", 0)
+
+ENGINE_AUTO = "auto"
+ENGINE_IO_URING = "io_uring"
+ENGINE_THREADS = "threads"
+
+
+def aligned_buffer(size, alignment=ALIGNMENT):
+    """
+    Buffer de `size` bytes alineado a pagina (requisito de O_DIRECT).
+
+    Returns:
+        mmap.mmap: Mapeo anonimo (usar memoryview() para accederlo sin copias)
+    """
+    size = max(alignment, (size + alignment - 1) // alignment * alignment)
+    return mmap.mmap(-1, size)
+
+
+def logical_block_size(fd, default=DEFAULT_LOGICAL_BLOCK_SIZE):
+    """Tamano de bloque logico de un dispositivo de bloque; default para archivos regulares."""
+    if fcntl is None:
+        return default
+    try:
+        value = fcntl.ioctl(fd, BLKSSZGET, struct.pack("i", 0))
+    except OSError:
+        return default
+    return struct.unpack("i", value)[0] or default
+
+
+def workload_offsets(pattern, block_size, count, start, span, seed=None, first=0, step=1):
+    """
+    Genera los offsets en bytes de las operaciones first, first+step, ... (< count), secuenciales o
+    aleatorias dentro de [start, start+span). Es un generador: no se arma la lista completa, que en
+    un dispositivo de varios TB tendria miles de millones de entradas. Con step > 1 cada worker
+    recorre su propia parte; el patron aleatorio usa una semilla derivada por parte.
+    """
+    if pattern == PATTERN_SEQUENTIAL:
+        return (start + (index * block_size) % span for index in range(first, count, step))
+    if pattern == PATTERN_RANDOM:
+        blocks = span // block_size
+        rng = random.Random(seed if step == 1 or seed is None else f"{seed}:{first}")
+        return (start + rng.randrange(blocks) * block_size for _ in range(first, count, step))
+    raise ValueError(f"Unknown I/O pattern: {pattern}")
+
+
+class DirectIOEngine(object):
+    def __init__(self, path, direct=True, workers=DEFAULT_WORKERS, writable=True, logger=None):
+        """
+        Args:
+            path (str): Nodo de bloque del namespace o archivo
+            direct (bool): Abrir con O_DIRECT (se desactiva si el sistema de archivos no lo soporta)
+            workers (int): Hilos del pool (operaciones simultaneas)
+            writable (bool): Abrir en lectura/escritura
+            logger (TestLogger): Logger opcional
+        """
+        self.path = path
+        self.workers = max(1, workers)
+        self.logger = logger
+        flags = os.O_RDWR if writable else os.O_RDONLY
+        self.direct = bool(direct and O_DIRECT)
+        try:
+            self.fd = os.open(path, flags | (O_DIRECT if self.direct else 0))
+        except OSError as e:
+            if not self.direct or e.errno != errno.EINVAL:
+                raise
+            # tmpfs y otros sistemas de archivos no aceptan O_DIRECT
+            self.fd = os.open(path, flags)
+            self.direct = False
+            self._log(f"O_DIRECT not supported on {path}; using buffered I/O")
+        self.lba_size = logical_block_size(self.fd)
+        # Histograma de latencias por I/O de la ultima carga (memoria fija, ver src/latency.py)
+        self.histogram = LatencyHistogram()
+        self._local = threading.local()
+        self._pool = None
+
+    def _log(self, message):
+        if self.logger is not None:
+            self.logger.info(message)
+
+    @property
+    def size(self):
+        """Tamano del dispositivo/archivo en bytes."""
+        return os.lseek(self.fd, 0, os.SEEK_END)
+
+    def _buffer(self, length):
+        """Buffer alineado del hilo actual (se reutiliza mientras alcance)."""
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None or len(buffer) < length:
+            buffer = aligned_buffer(length)
+            self._local.buffer = buffer
+        return buffer
+
+    def _check_alignment(self, offset, length):
+        if self.direct and (offset % self.lba_size or length % self.lba_size):
+            raise ValueError(f"O_DIRECT requires offset/length multiple of {self.lba_size} "
+                             f"(offset={offset}, length={length})")
+
+    def read(self, offset, length):
+        """
+        Lee `length` bytes en `offset`.
+
+        Returns:
+            bytes: Datos leidos (puede ser menos que length al final del archivo)
+        """
+        self._check_alignment(offset, length)
+        view = memoryview(self._buffer(length))[:length]
+        count = os.preadv(self.fd, [view], offset)
+        return bytes(view[:count])
+
+    def write(self, offset, data):
+        """
+        Escribe `data` en `offset` (se copia a un buffer alineado).
+
+        Returns:
+            int: Bytes escritos
+        """
+        data = memoryview(data).cast("B")
+        length = data.nbytes
+        self._check_alignment(offset, length)
+        view = memoryview(self._buffer(length))[:length]
+        view[:] = data
+        return os.pwritev(self.fd, [view], offset)
+
+    def _worker(self, op, offsets, block_size, fill):
+        buffer = self._buffer(block_size)
+        view = memoryview(buffer)[:block_size]
+        if op == OP_WRITE:
+            view[:] = bytes([fill]) * block_size
+        operation = os.pwritev if op == OP_WRITE else os.preadv
+        # Un histograma por worker: memoria fija aunque la carga recorra todo el dispositivo
+        histogram = LatencyHistogram()
+        record = histogram.record
+        perf_counter = time.perf_counter
+        transferred = 0
+        fd = self.fd
+        for offset in offsets:
+            begin = perf_counter()
+            transferred += operation(fd, [view], offset)
+            record((perf_counter() - begin) * 1e6)
+        return transferred, histogram
+
+    def run(self, op=OP_READ, pattern=PATTERN_SEQUENTIAL, block_size=DEFAULT_BLOCK_SIZE, total_bytes=None,
+            offset=0, span=None, seed=None, fill=0x00):
+        """
+        Ejecuta una carga de trabajo repartida entre los workers.
+
+        Args:
+            op (str): "read" o "write"
+            pattern (str): "seq" o "random"
+            block_size (int): Bytes por operacion
+            total_bytes (int): Volumen total (por defecto el rango completo)
+            offset (int): Inicio del rango en bytes
+            span (int): Longitud del rango en bytes (por defecto hasta el final)
+            seed (int): Semilla del patron aleatorio
+            fill (int): Byte de relleno para escrituras
+
+        Returns:
+            dict: op, pattern, block_size, queue_depth, ops, bytes, elapsed, iops, bandwidth_mbps,
+                  latency_mean_us, latency_p99_us, latency_max_us (histograma por I/O en self.histogram)
+        """
+        if op not in (OP_READ, OP_WRITE):
+            raise ValueError(f"Unknown I/O operation: {op}")
+        self._check_alignment(offset, block_size)
+        if span is None:
+            span = self.size - offset
+        span -= span % block_size
+        if span < block_size:
+            raise ValueError(f"I/O range of {span} bytes is smaller than block size {block_size}")
+        if total_bytes is None:
+            total_bytes = span
+        count = max(1, total_bytes // block_size)
+
+        chunks = [workload_offsets(pattern, block_size, count, offset, span, seed, first=index, step=self.workers)
+                  for index in range(min(self.workers, count))]
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="direct-io")
+
+        start = time.perf_counter()
+        futures = [self._pool.submit(self._worker, op, chunk, block_size, fill) for chunk in chunks]
+        results = [future.result() for future in futures]
+        elapsed = time.perf_counter() - start
+
+        transferred = sum(result[0] for result in results)
+        histogram = LatencyHistogram()
+        for _, worker_histogram in results:
+            histogram.merge(worker_histogram)
+        self.histogram = histogram
+        default_recorder().histogram(self.path, f"io:{op}").merge(histogram)
+        ops = histogram.count
+        stats = {
+            'op': op,
+            'pattern': pattern,
+            'block_size': block_size,
+            'queue_depth': self.workers,
+            'ops': ops,
+            'bytes': transferred,
+            'elapsed': elapsed,
+            'iops': ops / elapsed if elapsed else 0.0,
+            'bandwidth_mbps': transferred / BYTES_PER_MB / elapsed if elapsed else 0.0,
+            'latency_mean_us': histogram.total_ns / ops / NANOSECONDS_PER_MICROSECOND if ops else 0.0,
+            'latency_p99_us': histogram.percentile(99),
+            'latency_max_us': histogram.max_ns / NANOSECONDS_PER_MICROSECOND,
+        }
+        self._log(f"{op} {pattern} bs={block_size} on {self.path}: {stats['ops']} ops, "
+                  f"{stats['iops']:.0f} IOPS, {stats['bandwidth_mbps']:.1f} MB/s")
+        return stats
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def create_io_engine(path, queue_depth=DEFAULT_WORKERS, engine=ENGINE_AUTO, direct=True, writable=True,
+                     logger=None):
+    """
+    Crea el motor de I/O mas eficiente disponible.
+
+    Args:
+        path (str): Nodo de bloque del namespace o archivo
+        queue_depth (int): Operaciones en vuelo (io_uring) o hilos del pool (respaldo)
+        engine (str): "auto" (io_uring con respaldo a hilos), "io_uring" o "threads"
+        direct, writable, logger: Ver DirectIOEngine
+
+    Returns:
+        IoUringEngine/DirectIOEngine: Motor abierto (usar como context manager o llamar close())
+    """
+    if engine in (ENGINE_AUTO, ENGINE_IO_URING):
+        try:
+            from .io_uring_engine import IoUringEngine
+            return IoUringEngine(path, queue_depth=queue_depth, direct=direct, writable=writable, logger=logger)
+        except OSError as e:
+            if engine == ENGINE_IO_URING:
+                raise
+            if logger is not None:
+                logger.info(f"io_uring unavailable ({e}); using thread-pool engine for {path}")
+    elif engine != ENGINE_THREADS:
+        raise ValueError(f"Unknown I/O engine: {engine}")
+    return DirectIOEngine(path, direct=direct, workers=min(queue_depth, MAX_THREAD_WORKERS),
+                          writable=writable, logger=logger)
@@ -0,0 +1,347 @@
+"""
+Motor de I/O asincrono sobre io_uring (syscalls directas via ctypes, sin liburing).
+
+IoUringEngine mantiene hasta `queue_depth` lecturas/escrituras en vuelo contra el nodo de bloque
+del namespace (o un archivo), las envia en lotes con un solo io_uring_enter y recoge las
+completions en bloque. Tiene la misma interfaz que DirectIOEngine (read, write, run); usar
+create_io_engine() en src/io_engine.py para obtener este motor con respaldo automatico al pool
+de hilos cuando io_uring no esta disponible (kernel < 5.1, seccomp, sysctl io_uring_disabled).
+"""
+import ctypes
+import errno
+import mmap
+import os
+import struct
+import time
+
+from .io_engine import (aligned_buffer, logical_block_size, workload_offsets, O_DIRECT, OP_READ, OP_WRITE,
+                        PATTERN_SEQUENTIAL, DEFAULT_BLOCK_SIZE, BYTES_PER_MB)
+from .latency import default_recorder, LatencyHistogram, NANOSECONDS_PER_MICROSECOND
+
+# Numeros de syscall comunes a todas las arquitecturas (tabla unificada)
+SYS_IO_URING_SETUP = 425
+SYS_IO_URING_ENTER = 426
+
+IORING_OFF_SQ_RING = 0
+IORING_OFF_CQ_RING = 0x8000000
+IORING_OFF_SQES = 0x10000000
+IORING_ENTER_GETEVENTS = 1 << 0
+IORING_OP_READV = 1
+IORING_OP_WRITEV = 2
+
+MIN_QUEUE_DEPTH = 1
+MAX_QUEUE_DEPTH = 1024
+DEFAULT_QUEUE_DEPTH = 32
+
+# struct io_uring_params: 7 u32 + resv[3], luego io_sqring_offsets e io_cqring_offsets
+PARAMS = struct.Struct("<10I" + "8IQ" + "8IQ")
+SQ_OFF_FIELDS = ("head", "tail", "ring_mask", "ring_entries", "flags", "dropped", "array")
+CQ_OFF_FIELDS = ("head", "tail", "ring_mask", "ring_entries", "overflow", "cqes", "flags")
+
+# struct io_uring_sqe (64 bytes): opcode, flags, ioprio, fd, off, addr, len, rw_flags, user_data
+SQE = struct.Struct("<BBHiQQIIQ24x")
+# struct io_uring_cqe (16 bytes): user_data, res, flags
+CQE = struct.Struct("<QiI")
+U32 = struct.Struct("<I")
+IOVEC = struct.Struct("<QQ")
+
+_libc = ctypes.CDLL(None, use_errno=True)
+_syscall = _libc.syscall
+_syscall.restype = ctypes.c_long
+
+
+def _check(result):
+    if result < 0:
+        error = ctypes.get_errno()
+        raise OSError(error, os.strerror(error))
+    return result
+
+
+def io_uring_available():
+    """True si el kernel permite crear un io_uring (prueba real, no solo version)."""
+    try:
+        IoUring(MIN_QUEUE_DEPTH).close()
+    except OSError:
+        return False
+    return True
+
+
+class IoUring(object):
+    """Anillos SQ/CQ mapeados en memoria de una instancia io_uring."""
+    def __init__(self, entries):
+        params = bytearray(PARAMS.size)
+        params_buffer = (ctypes.c_char * len(params)).from_buffer(params)
+        self.fd = _check(_syscall(SYS_IO_URING_SETUP, ctypes.c_uint(entries), params_buffer))
+        del params_buffer
+        values = PARAMS.unpack(params)
+        self.sq_entries, self.cq_entries = values[0], values[1]
+        sq_off = dict(zip(SQ_OFF_FIELDS, values[10:17]))
+        cq_off = dict(zip(CQ_OFF_FIELDS, values[19:26]))
+
+        self._maps = []
+        try:
+            self.sq_ring = self._map(sq_off['array'] + self.sq_entries * U32.size, IORING_OFF_SQ_RING)
+            self.cq_ring = self._map(cq_off['cqes'] + self.cq_entries * CQE.size, IORING_OFF_CQ_RING)
+            self.sqes = self._map(self.sq_entries * SQE.size, IORING_OFF_SQES)
+        except OSError:
+            self.close()
+            raise
+        self.sq_head = sq_off['head']
+        self.sq_tail = sq_off['tail']
+        self.sq_mask = U32.unpack_from(self.sq_ring, sq_off['ring_mask'])[0]
+        self.sq_array = sq_off['array']
+        self.cq_head = cq_off['head']
+        self.cq_tail = cq_off['tail']
+        self.cq_mask = U32.unpack_from(self.cq_ring, cq_off['ring_mask'])[0]
+        self.cqes = cq_off['cqes']
+        self.pending = 0  # SQEs en el anillo aun no enviadas al kernel
+
+    def _map(self, length, offset):
+        ring = mmap.mmap(self.fd, length, flags=mmap.MAP_SHARED | getattr(mmap, "MAP_POPULATE", 0),
+                         prot=mmap.PROT_READ | mmap.PROT_WRITE, offset=offset)
+        self._maps.append(ring)
+        return ring
+
+    def space(self):
+        head = U32.unpack_from(self.sq_ring, self.sq_head)[0]
+        tail = U32.unpack_from(self.sq_ring, self.sq_tail)[0]
+        return self.sq_entries - ((tail - head) & 0xFFFFFFFF)
+
+    def prepare(self, opcode, fd, offset, iovec_addr, user_data):
+        """Escribe un SQE readv/writev (un iovec) en la siguiente posicion libre."""
+        tail = U32.unpack_from(self.sq_ring, self.sq_tail)[0]
+        index = tail & self.sq_mask
+        SQE.pack_into(self.sqes, index * SQE.size, opcode, 0, 0, fd, offset, iovec_addr, 1, 0, user_data)
+        U32.pack_into(self.sq_ring, self.sq_array + index * U32.size, index)
+        U32.pack_into(self.sq_ring, self.sq_tail, (tail + 1) & 0xFFFFFFFF)
+        self.pending += 1
+
+    def enter(self, min_complete=0):
+        """Envia las SQEs pendientes y espera al menos min_complete completions."""
+        while True:
+            result = _syscall(SYS_IO_URING_ENTER, self.fd, self.pending, min_complete,
+                              IORING_ENTER_GETEVENTS if min_complete else 0, None, 0)
+            if result >= 0:
+                self.pending -= result
+                return result
+            error = ctypes.get_errno()
+            if error not in (errno.EINTR, errno.EAGAIN, errno.EBUSY):
+                raise OSError(error, os.strerror(error))
+
+    def reap(self):
+        """
+        Recoge todas las completions disponibles.
+
+        Returns:
+            list: [(user_data, res), ...]
+        """
+        head = U32.unpack_from(self.cq_ring, self.cq_head)[0]
+        tail = U32.unpack_from(self.cq_ring, self.cq_tail)[0]
+        completions = []
+        while head != tail:
+            user_data, res, _ = CQE.unpack_from(self.cq_ring, self.cqes + (head & self.cq_mask) * CQE.size)
+            completions.append((user_data, res))
+            head = (head + 1) & 0xFFFFFFFF
+        U32.pack_into(self.cq_ring, self.cq_head, head)
+        return completions
+
+    def close(self):
+        for ring in self._maps:
+            ring.close()
+        self._maps = []
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+class IoUringEngine(object):
+    def __init__(self, path, queue_depth=DEFAULT_QUEUE_DEPTH, direct=True, writable=True, logger=None):
+        """
+        Args:
+            path (str): Nodo de bloque del namespace o archivo
+            queue_depth (int): Operaciones en vuelo (1-1024)
+            direct (bool): Abrir con O_DIRECT (se desactiva si el sistema de archivos no lo soporta)
+            writable (bool): Abrir en lectura/escritura
+            logger (TestLogger): Logger opcional
+        """
+        if not MIN_QUEUE_DEPTH <= queue_depth <= MAX_QUEUE_DEPTH:
+            raise ValueError(f"queue_depth must be between {MIN_QUEUE_DEPTH} and {MAX_QUEUE_DEPTH}")
+        self.path = path
+        self.queue_depth = queue_depth
+        self.logger = logger
+        # Histograma de latencias por I/O del ultimo envio (memoria fija, ver src/latency.py)
+        self.histogram = LatencyHistogram()
+        self.ring = IoUring(queue_depth)
+        flags = os.O_RDWR if writable else os.O_RDONLY
+        self.direct = bool(direct and O_DIRECT)
+        try:
+            try:
+                self.fd = os.open(path, flags | (O_DIRECT if self.direct else 0))
+            except OSError as e:
+                if not self.direct or e.errno != errno.EINVAL:
+                    raise
+                self.fd = os.open(path, flags)
+                self.direct = False
+                self._log(f"O_DIRECT not supported on {path}; using buffered I/O")
+        except OSError:
+            self.ring.close()
+            raise
+        self.lba_size = logical_block_size(self.fd)
+        self._buffers = None
+        self._block_size = None
+
+    def _log(self, message):
+        if self.logger is not None:
+            self.logger.info(message)
+
+    @property
+    def size(self):
+        return os.lseek(self.fd, 0, os.SEEK_END)
+
+    def _prepare_slots(self, block_size):
+        """Un buffer alineado y un iovec por slot de la cola (se reutilizan entre ejecuciones)."""
+        if self._block_size == block_size:
+            return
+        self._release_slots()
+        buffers = aligned_buffer(block_size * self.queue_depth)
+        iovecs = bytearray(IOVEC.size * self.queue_depth)
+        self._buffer_ref = (ctypes.c_char * len(buffers)).from_buffer(buffers)
+        self._iovec_ref = (ctypes.c_char * len(iovecs)).from_buffer(iovecs)
+        base = ctypes.addressof(self._buffer_ref)
+        for slot in range(self.queue_depth):
+            IOVEC.pack_into(iovecs, slot * IOVEC.size, base + slot * block_size, block_size)
+        self._iovec_base = ctypes.addressof(self._iovec_ref)
+        self._buffers = buffers
+        self._iovecs = iovecs
+        self._block_size = block_size
+
+    def _release_slots(self):
+        if self._buffers is not None:
+            self._buffer_ref = None
+            self._iovec_ref = None
+            self._buffers.close()
+            self._buffers = None
+            self._block_size = None
+
+    def _check_alignment(self, offset, length):
+        if self.direct and (offset % self.lba_size or length % self.lba_size):
+            raise ValueError(f"O_DIRECT requires offset/length multiple of {self.lba_size} "
+                             f"(offset={offset}, length={length})")
+
+    def _submit_all(self, opcode, offsets, block_size):
+        """Mantiene la cola llena hasta agotar los offsets (cualquier iterable); devuelve bytes transferidos."""
+        ring = self.ring
+        iovec_base = self._iovec_base
+        free = list(range(self.queue_depth))
+        submitted_at = [0.0] * self.queue_depth
+        histogram = LatencyHistogram()
+        record = histogram.record
+        transferred = 0
+        in_flight = 0
+        pending = iter(offsets)
+        exhausted = False
+        perf_counter = time.perf_counter
+
+        while True:
+            while free and not exhausted:
+                offset = next(pending, None)
+                if offset is None:
+                    exhausted = True
+                    break
+                slot = free.pop()
+                ring.prepare(opcode, self.fd, offset, iovec_base + slot * IOVEC.size, slot)
+                submitted_at[slot] = perf_counter()
+                in_flight += 1
+            if not in_flight:
+                break
+            ring.enter(min_complete=1)
+            now = perf_counter()
+            for slot, res in ring.reap():
+                if res < 0:
+                    raise OSError(-res, f"io_uring I/O failed: {os.strerror(-res)}")
+                record((now - submitted_at[slot]) * 1e6)
+                transferred += res
+                free.append(slot)
+                in_flight -= 1
+        self.histogram = histogram
+        return transferred
+
+    def read(self, offset, length):
+        """Lee `length` bytes en `offset` (QD1)."""
+        self._check_alignment(offset, length)
+        self._prepare_slots(length)
+        count = self._submit_all(IORING_OP_READV, [offset], length)
+        return bytes(self._buffers[:count])
+
+    def write(self, offset, data):
+        """Escribe `data` en `offset` (QD1). Returns: bytes escritos."""
+        data = memoryview(data).cast("B")
+        self._check_alignment(offset, data.nbytes)
+        self._prepare_slots(data.nbytes)
+        self._buffers[:data.nbytes] = data
+        return self._submit_all(IORING_OP_WRITEV, [offset], data.nbytes)
+
+    def run(self, op=OP_READ, pattern=PATTERN_SEQUENTIAL, block_size=DEFAULT_BLOCK_SIZE, total_bytes=None,
+            offset=0, span=None, seed=None, fill=0x00):
+        """
+        Ejecuta una carga de trabajo con queue_depth operaciones en vuelo. Mismos argumentos y
+        resultado que DirectIOEngine.run, mas 'queue_depth'; el histograma de latencias por I/O
+        queda en self.histogram.
+        """
+        if op not in (OP_READ, OP_WRITE):
+            raise ValueError(f"Unknown I/O operation: {op}")
+        self._check_alignment(offset, block_size)
+        if span is None:
+            span = self.size - offset
+        span -= span % block_size
+        if span < block_size:
+            raise ValueError(f"I/O range of {span} bytes is smaller than block size {block_size}")
+        if total_bytes is None:
+            total_bytes = span
+        count = max(1, total_bytes // block_size)
+
+        offsets = workload_offsets(pattern, block_size, count, offset, span, seed)
+
+        self._prepare_slots(block_size)
+        if op == OP_WRITE:
+            self._buffers[:block_size * self.queue_depth] = bytes([fill]) * (block_size * self.queue_depth)
+
+        start = time.perf_counter()
+        transferred = self._submit_all(IORING_OP_WRITEV if op == OP_WRITE else IORING_OP_READV,
+                                       offsets, block_size)
+        elapsed = time.perf_counter() - start
+        histogram = self.histogram
+        default_recorder().histogram(self.path, f"io:{op}").merge(histogram)
+        ops = histogram.count
+        stats = {
+            'op': op,
+            'pattern': pattern,
+            'block_size': block_size,
+            'queue_depth': self.queue_depth,
+            'ops': ops,
+            'bytes': transferred,
+            'elapsed': elapsed,
+            'iops': ops / elapsed if elapsed else 0.0,
+            'bandwidth_mbps': transferred / BYTES_PER_MB / elapsed if elapsed else 0.0,
+            'latency_mean_us': histogram.total_ns / ops / NANOSECONDS_PER_MICROSECOND if ops else 0.0,
+            'latency_p99_us': histogram.percentile(99),
+            'latency_max_us': histogram.max_ns / NANOSECONDS_PER_MICROSECOND,
+        }
+        self._log(f"io_uring {op} {pattern} bs={block_size} qd={self.queue_depth} on {self.path}: "
+                  f"{stats['ops']} ops, {stats['iops']:.0f} IOPS, {stats['bandwidth_mbps']:.1f} MB/s")
+        return stats
+
+    def close(self):
+        self._release_slots()
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
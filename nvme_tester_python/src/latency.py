@@ -0,0 +1,357 @@
+"""
+Histogramas de latencia por comando (estilo HDR, buckets logaritmicos).
+
+LatencyHistogram usa memoria fija (un contador por bucket, ~1% de error relativo) y se puede
+combinar entre hilos o procesos (to_dict/from_dict + merge). LatencyRecorder agrupa un
+histograma por (dispositivo, opcode, origen), donde el origen es la latencia medida por el host
+("host") o la reportada por nvme-cli con --latency ("cli").
+
+Los transportes y NvmeCommands registran cada comando en default_recorder(); las pruebas pueden
+consultar percentiles o validar SLOs:
+
+    recorder = default_recorder()
+    recorder.check_slo(99, 5000, device="/dev/nvme0", opcode="admin:0x02", logger=logger)
+
+Para validar solo los comandos de una prueba se toma una linea base al inicio:
+
+    baseline = default_recorder().to_dict()
+    ...
+    default_recorder().since(baseline).check_slo(99, 5000, opcode="admin:0x02", logger=logger)
+"""
+import json
+import threading
+from array import array
+
+SOURCE_HOST = "host"
+SOURCE_CLI = "cli"
+
+# 2^SUB_BUCKET_BITS sub-buckets por potencia de dos -> error relativo < 1/128
+SUB_BUCKET_BITS = 7
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+MAX_VALUE_BITS = 42            # ~73 minutos en nanosegundos
+BUCKET_COUNT = (MAX_VALUE_BITS - SUB_BUCKET_BITS + 1) * SUB_BUCKET_COUNT
+NANOSECONDS_PER_MICROSECOND = 1000
+
+REPORT_PERCENTILES = (50, 90, 99, 99.9)
+
+
+def opcode_key(opcode, io=False):
+    """Clave de opcode: 'admin:0x06', 'io:0x02' o el nombre de subcomando nvme-cli ('cli:read')."""
+    if isinstance(opcode, str):
+        return opcode
+    return f"{'io' if io else 'admin'}:0x{int(opcode) & 0xFF:02x}"
+
+
+def _bucket_index(value):
+    if value < SUB_BUCKET_COUNT:
+        return value
+    shift = value.bit_length() - 1 - SUB_BUCKET_BITS
+    index = (shift + 1) * SUB_BUCKET_COUNT + ((value >> shift) - SUB_BUCKET_COUNT)
+    return min(index, BUCKET_COUNT - 1)
+
+
+def _bucket_lower(index):
+    """Menor valor (ns) equivalente al bucket."""
+    if index < SUB_BUCKET_COUNT:
+        return index
+    shift = index // SUB_BUCKET_COUNT - 1
+    return (SUB_BUCKET_COUNT + index % SUB_BUCKET_COUNT) << shift
+
+
+def _bucket_upper(index):
+    """Mayor valor (ns) equivalente al bucket."""
+    if index < SUB_BUCKET_COUNT:
+        return index
+    shift = index // SUB_BUCKET_COUNT - 1
+    return _bucket_lower(index) + (1 << shift) - 1
+
+
+class LatencyHistogram(object):
+    def __init__(self):
+        self.counts = array("Q", bytes(8 * BUCKET_COUNT))
+        self.count = 0
+        self.total_ns = 0
+        self.min_ns = None
+        self.max_ns = 0
+        self._lock = threading.Lock()
+
+    def record(self, latency_us):
+        """Registra una latencia en microsegundos."""
+        value = max(0, int(latency_us * NANOSECONDS_PER_MICROSECOND))
+        index = _bucket_index(value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total_ns += value
+            if self.min_ns is None or value < self.min_ns:
+                self.min_ns = value
+            if value > self.max_ns:
+                self.max_ns = value
+
+    def record_many(self, latencies_us):
+        """Registra un lote de latencias (microsegundos) tomando el lock una sola vez."""
+        values = [max(0, int(latency * NANOSECONDS_PER_MICROSECOND)) for latency in latencies_us]
+        if not values:
+            return
+        with self._lock:
+            for value in values:
+                self.counts[_bucket_index(value)] += 1
+            self.count += len(values)
+            self.total_ns += sum(values)
+            low = min(values)
+            if self.min_ns is None or low < self.min_ns:
+                self.min_ns = low
+            self.max_ns = max(self.max_ns, max(values))
+
+    def merge(self, other):
+        """Suma otro histograma (de otro hilo o proceso) en este."""
+        with self._lock:
+            for index, count in enumerate(other.counts):
+                if count:
+                    self.counts[index] += count
+            self.count += other.count
+            self.total_ns += other.total_ns
+            if other.min_ns is not None and (self.min_ns is None or other.min_ns < self.min_ns):
+                self.min_ns = other.min_ns
+            self.max_ns = max(self.max_ns, other.max_ns)
+        return self
+
+    def percentile(self, percentile):
+        """
+        Args:
+            percentile (float): 0-100
+
+        Returns:
+            float: Latencia en microsegundos (limite superior del bucket), None si esta vacio
+        """
+        if not self.count:
+            return None
+        if percentile >= 100:
+            return self.max_ns / NANOSECONDS_PER_MICROSECOND
+        target = max(1, -(-self.count * percentile // 100))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(_bucket_upper(index), self.max_ns) / NANOSECONDS_PER_MICROSECOND
+        return self.max_ns / NANOSECONDS_PER_MICROSECOND
+
+    def summary(self):
+        """
+        Returns:
+            dict: count, min, mean, p50, p90, p99, p99.9, max (microsegundos)
+        """
+        if not self.count:
+            return {'count': 0}
+        summary = {
+            'count': self.count,
+            'min': self.min_ns / NANOSECONDS_PER_MICROSECOND,
+            'mean': self.total_ns / self.count / NANOSECONDS_PER_MICROSECOND,
+        }
+        for percentile in REPORT_PERCENTILES:
+            summary[f"p{percentile:g}"] = self.percentile(percentile)
+        summary['max'] = self.max_ns / NANOSECONDS_PER_MICROSECOND
+        return summary
+
+    def to_dict(self):
+        """Representacion serializable (solo buckets no vacios)."""
+        return {
+            'count': self.count,
+            'total_ns': self.total_ns,
+            'min_ns': self.min_ns,
+            'max_ns': self.max_ns,
+            'buckets': {str(index): count for index, count in enumerate(self.counts) if count},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls()
+        for index, count in data.get('buckets', {}).items():
+            histogram.counts[int(index)] = count
+        histogram.count = data.get('count', 0)
+        histogram.total_ns = data.get('total_ns', 0)
+        histogram.min_ns = data.get('min_ns')
+        histogram.max_ns = data.get('max_ns', 0)
+        return histogram
+
+
+def histogram_delta(after, before):
+    """
+    Diferencia de dos LatencyHistogram.to_dict(): las muestras registradas entre ambos.
+    min/max no se pueden restar: se acotan con los limites del bucket no vacio mas bajo y
+    mas alto que quedan (error relativo < 1/128) y con los valores exactos de `after`.
+    """
+    if not before or not before.get('count'):
+        return after
+    buckets = {}
+    for index, count in after.get('buckets', {}).items():
+        remaining = count - before.get('buckets', {}).get(index, 0)
+        if remaining > 0:
+            buckets[index] = remaining
+    min_ns = None
+    max_ns = 0
+    if buckets:
+        indexes = [int(index) for index in buckets]
+        min_ns = max(_bucket_lower(min(indexes)), after.get('min_ns') or 0)
+        max_ns = min(_bucket_upper(max(indexes)), after.get('max_ns', 0))
+    return {
+        'count': after.get('count', 0) - before.get('count', 0),
+        'total_ns': after.get('total_ns', 0) - before.get('total_ns', 0),
+        'min_ns': min_ns,
+        'max_ns': max_ns,
+        'buckets': buckets,
+    }
+
+
+class LatencyRecorder(object):
+    """Histogramas por (dispositivo, opcode, origen)."""
+    def __init__(self):
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, device, opcode, source=SOURCE_HOST):
+        key = (device, opcode, source)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(key, LatencyHistogram())
+        return histogram
+
+    def record(self, device, opcode, host_us=None, cli_us=None):
+        """
+        Registra un comando.
+
+        Args:
+            device (str): Ruta del dispositivo
+            opcode (str): Clave de opcode (ver opcode_key)
+            host_us (float): Latencia medida por el host en microsegundos
+            cli_us (float): Latencia reportada por nvme-cli en microsegundos
+        """
+        if host_us is not None:
+            self.histogram(device, opcode, SOURCE_HOST).record(host_us)
+        if cli_us is not None:
+            self.histogram(device, opcode, SOURCE_CLI).record(cli_us)
+
+    def record_many(self, device, opcode, latencies_us, source=SOURCE_HOST):
+        """Registra un lote de latencias (p.ej. las de una carga de src/io_engine.py)."""
+        self.histogram(device, opcode, source).record_many(latencies_us)
+
+    def select(self, device=None, opcode=None, source=SOURCE_HOST):
+        """Histograma combinado de las claves que coinciden (None = cualquiera)."""
+        merged = LatencyHistogram()
+        for (key_device, key_opcode, key_source), histogram in list(self.histograms.items()):
+            if device is not None and key_device != device:
+                continue
+            if opcode is not None and key_opcode != opcode:
+                continue
+            if source is not None and key_source != source:
+                continue
+            merged.merge(histogram)
+        return merged
+
+    def check_slo(self, percentile, limit_us, device=None, opcode=None, source=SOURCE_HOST, logger=None):
+        """
+        Valida un SLO de latencia.
+
+        Args:
+            percentile (float): Percentil (p.ej. 99 o 99.9; 100 = maximo)
+            limit_us (float): Latencia maxima permitida en microsegundos
+            device, opcode, source: Filtro de histogramas (None = todos)
+            logger (TestLogger): Registra el resultado si se indica
+
+        Returns:
+            bool: True si se cumple (o no hay muestras)
+        """
+        value = self.select(device, opcode, source).percentile(percentile)
+        passed = value is None or value <= limit_us
+        if logger is not None:
+            scope = f"device={device or '*'} opcode={opcode or '*'} source={source or '*'}"
+            if value is None:
+                logger.warning(f"Latency SLO p{percentile:g} <= {limit_us}us: no samples ({scope})")
+            elif passed:
+                logger.info(f"Latency SLO p{percentile:g} <= {limit_us}us passed: {value:.1f}us ({scope})")
+            else:
+                logger.error(f"Latency SLO p{percentile:g} <= {limit_us}us FAILED: {value:.1f}us ({scope})")
+        return passed
+
+    def assert_slo(self, percentile, limit_us, device=None, opcode=None, source=SOURCE_HOST):
+        """Como check_slo pero lanza AssertionError si no se cumple (tambien con python -O)."""
+        value = self.select(device, opcode, source).percentile(percentile)
+        if value is not None and value > limit_us:
+            raise AssertionError(f"p{percentile:g} latency {value:.1f}us exceeds SLO {limit_us}us "
+                                 f"(device={device}, opcode={opcode})")
+
+    def since(self, baseline):
+        """
+        Recorder con solo las muestras registradas despues de `baseline`.
+
+        Args:
+            baseline (dict): to_dict() tomado antes (p.ej. al inicio de una prueba)
+
+        Returns:
+            LatencyRecorder: Diferencia por (dispositivo, opcode, origen)
+        """
+        before = {(entry['device'], entry['opcode'], entry['source']): entry['histogram']
+                  for entry in (baseline or {}).get('histograms', [])}
+        recorder = LatencyRecorder()
+        for key, histogram in list(self.histograms.items()):
+            data = histogram_delta(histogram.to_dict(), before.get(key))
+            if data['count'] > 0:
+                recorder.histograms[key] = LatencyHistogram.from_dict(data)
+        return recorder
+
+    def merge(self, other):
+        for (device, opcode, source), histogram in list(other.histograms.items()):
+            self.histogram(device, opcode, source).merge(histogram)
+        return self
+
+    def report(self):
+        """
+        Returns:
+            dict: {device: {opcode: {source: summary}}}
+        """
+        report = {}
+        for (device, opcode, source), histogram in sorted(self.histograms.items()):
+            report.setdefault(device, {}).setdefault(opcode, {})[source] = histogram.summary()
+        return report
+
+    def to_dict(self):
+        return {'histograms': [{'device': device, 'opcode': opcode, 'source': source,
+                                'histogram': histogram.to_dict()}
+                               for (device, opcode, source), histogram in self.histograms.items()]}
+
+    @classmethod
+    def from_dict(cls, data):
+        recorder = cls()
+        for entry in data.get('histograms', []):
+            recorder.histogram(entry['device'], entry['opcode'], entry['source']).merge(
+                LatencyHistogram.from_dict(entry['histogram']))
+        return recorder
+
+    def to_json(self, path=None, include_buckets=False):
+        """
+        Exporta el reporte de percentiles (y opcionalmente los buckets para combinar despues).
+
+        Returns:
+            str: JSON generado (tambien se escribe en path si se indica)
+        """
+        data = {'report': self.report()}
+        if include_buckets:
+            data.update(self.to_dict())
+        text = json.dumps(data, indent=2)
+        if path is not None:
+            with open(path, "w") as f:
+                f.write(text)
+        return text
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+
+
+_default_recorder = LatencyRecorder()
+
+
+def default_recorder():
+    """Recorder compartido del proceso, usado por los transportes y NvmeCommands."""
+    return _default_recorder
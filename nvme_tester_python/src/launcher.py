@@ -0,0 +1,225 @@
+"""
+Lanzador de procesos de bajo costo para el backend nvme-cli.
+
+subprocess.run resuelve el binario en PATH, copia el entorno y recorre los descriptores abiertos
+del proceso (close_fds) en cada llamada; en procesos de prueba grandes y de larga duracion ese
+costo se suma a cada comando. ProcessLauncher:
+- resuelve cada binario una sola vez (se vuelve a resolver si cambia PATH),
+- arma el entorno una vez (os.environ se pasa por referencia; los cambios posteriores se ven),
+- crea el proceso con os.posix_spawn (glibc usa semantica vfork: no se copia la imagen de
+  Python) redirigiendo stdout/stderr a pipes sin herencia de otros descriptores,
+- lee ambas salidas con un unico lazo de selectors,
+- devuelve los tiempos de cada fase (spawn, read, wait) junto con la salida.
+
+En plataformas sin posix_spawn se usa subprocess.run con la misma interfaz.
+
+Ejemplo:
+    result = default_launcher().run(["nvme", "id-ctrl", "/dev/nvme0", "--output-format=json"])
+    result.returncode, result.stdout, result.spawn_time, result.read_time, result.wait_time
+"""
+import os
+import selectors
+import shutil
+import signal
+import subprocess
+import threading
+import time
+
+READ_CHUNK = 64 * 1024
+# Senales que Python ignora y que el hijo debe recibir con su accion por defecto (igual que
+# restore_signals de subprocess)
+RESTORED_SIGNALS = tuple(getattr(signal, name) for name in ("SIGPIPE", "SIGXFSZ") if hasattr(signal, name))
+_SELECTOR = getattr(selectors, "PollSelector", selectors.DefaultSelector)
+
+_default_launcher = None
+_default_launcher_lock = threading.Lock()
+
+
+class LaunchResult(object):
+    __slots__ = ("argv", "returncode", "stdout", "stderr", "spawn_time", "read_time", "wait_time")
+
+    def __init__(self, argv, returncode, stdout, stderr, spawn_time=0.0, read_time=0.0, wait_time=0.0):
+        """
+        Args:
+            argv (list): Comando ejecutado (con el binario resuelto)
+            returncode (int): Codigo de salida (negativo si termino por una senal)
+            stdout, stderr (bytes): Salida del proceso
+            spawn_time (float): Segundos en crear el proceso
+            read_time (float): Segundos leyendo stdout/stderr hasta EOF
+            wait_time (float): Segundos en recoger el codigo de salida
+        """
+        self.argv = argv
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.spawn_time = spawn_time
+        self.read_time = read_time
+        self.wait_time = wait_time
+
+    @property
+    def total_time(self):
+        return self.spawn_time + self.read_time + self.wait_time
+
+    def timing(self):
+        """
+        Returns:
+            dict: spawn_us, read_us, wait_us, total_us
+        """
+        return {
+            'spawn_us': self.spawn_time * 1e6,
+            'read_us': self.read_time * 1e6,
+            'wait_us': self.wait_time * 1e6,
+            'total_us': self.total_time * 1e6,
+        }
+
+
+class ProcessLauncher(object):
+    def __init__(self, env=None, use_posix_spawn=None):
+        """
+        Args:
+            env (dict): Variables que se agregan/sustituyen al entorno del proceso (se combinan una
+                        vez); None hereda os.environ tal como este en cada lanzamiento
+            use_posix_spawn (bool): None = usar posix_spawn si la plataforma lo tiene
+        """
+        self.env = os.environ if env is None else {**os.environ, **env}
+        if use_posix_spawn is None:
+            use_posix_spawn = hasattr(os, "posix_spawn")
+        self.use_posix_spawn = use_posix_spawn
+        self._executables = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, program):
+        """
+        Ruta absoluta de un binario (cacheada por PATH).
+
+        Raises:
+            FileNotFoundError: Si no existe o no es ejecutable
+        """
+        program = os.fspath(program)
+        search_path = self.env.get("PATH", os.defpath)
+        key = (program, search_path)
+        executable = self._executables.get(key)
+        if executable is None:
+            if os.path.dirname(program):
+                executable = os.path.abspath(program) if os.access(program, os.X_OK) else None
+            else:
+                executable = shutil.which(program, path=search_path)
+            if executable is None:
+                raise FileNotFoundError(f"Executable not found: {program}")
+            with self._lock:
+                self._executables[key] = executable
+        return executable
+
+    def forget(self, program=None):
+        """Descarta la resolucion cacheada de un binario (o de todos), p.ej. tras reinstalar nvme-cli."""
+        with self._lock:
+            if program is None:
+                self._executables.clear()
+            else:
+                for key in [key for key in self._executables if key[0] == os.fspath(program)]:
+                    del self._executables[key]
+
+    def run(self, cmd, timeout=None):
+        """
+        Ejecuta un comando y espera su salida.
+
+        Args:
+            cmd (list): Comando (binario y argumentos; cualquier valor se convierte a str)
+            timeout (float): Segundos maximos; al vencer se mata el proceso
+
+        Returns:
+            LaunchResult: Codigo de salida, stdout/stderr en bytes y tiempos de cada fase
+
+        Raises:
+            FileNotFoundError: Si el binario no existe
+            subprocess.TimeoutExpired: Si vence el timeout
+        """
+        argv = [str(part) for part in cmd]
+        argv[0] = self.resolve(argv[0])
+        if not self.use_posix_spawn:
+            return self._run_subprocess(argv, timeout)
+
+        start = time.perf_counter()
+        stdout_read, stdout_write = os.pipe()
+        stderr_read, stderr_write = os.pipe()
+        try:
+            # Los pipes no son heredables (PEP 446); dup2 sobre 1 y 2 limpia O_CLOEXEC solo en ellos
+            pid = os.posix_spawn(argv[0], argv, self.env, file_actions=[
+                (os.POSIX_SPAWN_OPEN, 0, os.devnull, os.O_RDONLY, 0),
+                (os.POSIX_SPAWN_DUP2, stdout_write, 1),
+                (os.POSIX_SPAWN_DUP2, stderr_write, 2),
+            ], setsigdef=RESTORED_SIGNALS)
+        except BaseException:
+            os.close(stdout_read)
+            os.close(stderr_read)
+            raise
+        finally:
+            os.close(stdout_write)
+            os.close(stderr_write)
+        spawned = time.perf_counter()
+
+        try:
+            stdout, stderr = self._read(stdout_read, stderr_read, None if timeout is None else spawned + timeout)
+        except subprocess.TimeoutExpired as e:
+            self._kill(pid)
+            raise subprocess.TimeoutExpired(argv, timeout, e.output, e.stderr) from None
+        except BaseException:
+            self._kill(pid)
+            raise
+        finally:
+            os.close(stdout_read)
+            os.close(stderr_read)
+        read_done = time.perf_counter()
+
+        _, status = os.waitpid(pid, 0)
+        waited = time.perf_counter()
+        return LaunchResult(argv, os.waitstatus_to_exitcode(status), stdout, stderr,
+                            spawned - start, read_done - spawned, waited - read_done)
+
+    @staticmethod
+    def _read(stdout_fd, stderr_fd, deadline):
+        """Lee ambos pipes hasta EOF con un solo selector; TimeoutExpired si se alcanza el deadline."""
+        chunks = {stdout_fd: [], stderr_fd: []}
+        with _SELECTOR() as selector:
+            selector.register(stdout_fd, selectors.EVENT_READ)
+            selector.register(stderr_fd, selectors.EVENT_READ)
+            open_fds = 2
+            while open_fds:
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        raise subprocess.TimeoutExpired(None, None, b"".join(chunks[stdout_fd]),
+                                                        b"".join(chunks[stderr_fd]))
+                for key, _ in selector.select(remaining):
+                    data = os.read(key.fd, READ_CHUNK)
+                    if data:
+                        chunks[key.fd].append(data)
+                    else:
+                        selector.unregister(key.fd)
+                        open_fds -= 1
+        return b"".join(chunks[stdout_fd]), b"".join(chunks[stderr_fd])
+
+    @staticmethod
+    def _kill(pid):
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        os.waitpid(pid, 0)
+
+    @staticmethod
+    def _run_subprocess(argv, timeout):
+        start = time.perf_counter()
+        completed = subprocess.run(argv, capture_output=True, stdin=subprocess.DEVNULL, timeout=timeout)
+        return LaunchResult(argv, completed.returncode, completed.stdout, completed.stderr,
+                            read_time=time.perf_counter() - start)
+
+
+def default_launcher():
+    """Lanzador compartido del proceso (hereda os.environ)."""
+    global _default_launcher
+    with _default_launcher_lock:
+        if _default_launcher is None:
+            _default_launcher = ProcessLauncher()
+        return _default_launcher
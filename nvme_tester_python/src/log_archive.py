@@ -0,0 +1,250 @@
+"""
+Archivo de logs: creacion exclusiva, compresion en segundo plano y retencion por directorio.
+
+TestLogger crea cada archivo con O_CREAT | O_EXCL (sin sondear nombres con os.path.exists) y
+mantiene un flock compartido mientras lo usa. Las tareas de mantenimiento (comprimir logs
+cerrados a .gz / .zst y borrar los mas antiguos segun cantidad, edad o bytes totales) corren en
+un hilo de fondo y nunca tocan un archivo con flock activo, asi que varios procesos pueden
+escribir en el mismo directorio de prueba.
+
+Ejemplo:
+    path, fd = create_exclusive("logs/test_smart_log", "test_smart_log_20250101_120000")
+    submit(maintain_directory, "logs/test_smart_log", compress=COMPRESS_GZIP, max_files=100)
+"""
+import gzip
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Plataformas sin flock (Windows): se usa solo el margen por antiguedad
+    fcntl = None
+
+try:
+    import zstandard
+except ImportError:  # zstd es opcional; sin el modulo se comprime con gzip
+    zstandard = None
+
+LOG_SUFFIX = ".log"
+COMPRESS_GZIP = "gzip"
+COMPRESS_ZSTD = "zstd"
+COMPRESS_NONE = "none"
+COMPRESSED_SUFFIXES = {COMPRESS_GZIP: ".gz", COMPRESS_ZSTD: ".zst"}
+ARCHIVE_SUFFIXES = (LOG_SUFFIX, LOG_SUFFIX + ".gz", LOG_SUFFIX + ".zst")
+PARTIAL_SUFFIX = ".part"
+
+MAX_NAME_ATTEMPTS = 1000
+# Un archivo modificado hace menos de esto se considera en uso si no hay flock para comprobarlo
+ACTIVE_GRACE_SECONDS = 300
+SECONDS_PER_DAY = 24 * 3600
+COPY_CHUNK = 1024 * 1024
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def create_exclusive(directory, stem, suffix=LOG_SUFFIX):
+    """
+    Crea un archivo nuevo de forma atomica: stem.log, stem_001.log, ... (O_EXCL).
+
+    Returns:
+        tuple: (ruta, fd abierto en modo append con flock compartido)
+    """
+    flags = os.O_WRONLY | os.O_APPEND | os.O_CREAT | os.O_EXCL
+    for counter in range(MAX_NAME_ATTEMPTS):
+        name = f"{stem}{suffix}" if counter == 0 else f"{stem}_{counter:03d}{suffix}"
+        path = os.path.join(directory, name)
+        if _archived(path):
+            continue
+        try:
+            fd = os.open(path, flags, 0o644)
+        except FileExistsError:
+            continue
+        if _archived(path):
+            # Se comprimio un log con este nombre mientras lo creabamos: no reutilizarlo
+            os.close(fd)
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            continue
+        lock_shared(fd)
+        return path, fd
+    # Demasiadas colisiones en el mismo segundo: microsegundos y PID
+    path = os.path.join(directory, f"{stem}_{datetime.now().strftime('%f')}_{os.getpid()}{suffix}")
+    fd = os.open(path, flags, 0o644)
+    lock_shared(fd)
+    return path, fd
+
+
+def _archived(path):
+    return any(os.path.exists(path + suffix) or os.path.exists(path + suffix + PARTIAL_SUFFIX)
+               for suffix in COMPRESSED_SUFFIXES.values())
+
+
+def lock_shared(fd):
+    """Marca el archivo como en uso (el mantenimiento no lo comprime ni lo borra)."""
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_SH)
+
+
+def _claim(path, inode, mtime, now):
+    """
+    Reserva un log cerrado para el mantenimiento: flock exclusivo sin espera, de modo que ni un
+    escritor activo ni el mantenimiento de otro proceso lo estan usando.
+
+    Returns:
+        int: fd con el lock (-1 sin flock), None si esta en uso o ya no existe
+    """
+    if fcntl is None:
+        return None if now - mtime < ACTIVE_GRACE_SECONDS else -1
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return None
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        # Debe ser el mismo archivo que se listo (no uno nuevo con el nombre reutilizado) y seguir
+        # en el directorio (otro proceso pudo comprimirlo y borrarlo)
+        if os.fstat(fd).st_ino != inode or os.stat(path).st_ino != inode:
+            raise FileNotFoundError(path)
+    except OSError:
+        os.close(fd)
+        return None
+    return fd
+
+
+def _release(fd):
+    if fd >= 0:
+        os.close(fd)
+
+
+def compress_file(path, method=COMPRESS_GZIP):
+    """
+    Comprime un log cerrado (path -> path.gz / path.zst) conservando su fecha de modificacion.
+
+    Returns:
+        str: Ruta del archivo comprimido, None si no se comprimio
+    """
+    if method in (None, COMPRESS_NONE):
+        return None
+    if method == COMPRESS_ZSTD and zstandard is None:
+        method = COMPRESS_GZIP
+    target = path + COMPRESSED_SUFFIXES[method]
+    partial = target + PARTIAL_SUFFIX
+    try:
+        stat = os.stat(path)
+        with open(path, "rb") as source, open(partial, "wb") as destination:
+            if method == COMPRESS_ZSTD:
+                zstandard.ZstdCompressor().copy_stream(source, destination)
+            else:
+                with gzip.GzipFile(filename=os.path.basename(path), mode="wb", fileobj=destination,
+                                   mtime=int(stat.st_mtime)) as compressed:
+                    shutil.copyfileobj(source, compressed, COPY_CHUNK)
+        os.utime(partial, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        target = _link_unique(partial, target)
+        os.unlink(partial)
+        os.unlink(path)
+    except OSError:
+        try:
+            os.unlink(partial)
+        except OSError:
+            pass
+        return None
+    return target
+
+
+def _link_unique(source, target):
+    """Publica source como target sin sobrescribir nunca un archivo existente (os.link falla si existe)."""
+    root, suffix = target.split(LOG_SUFFIX, 1) if LOG_SUFFIX in target else (target, "")
+    candidate = target
+    for counter in range(1, MAX_NAME_ATTEMPTS + 1):
+        try:
+            os.link(source, candidate)
+            return candidate
+        except FileExistsError:
+            candidate = f"{root}.dup{counter}{LOG_SUFFIX}{suffix}"
+    raise FileExistsError(target)
+
+
+def _archive_entries(directory):
+    entries = []
+    try:
+        with os.scandir(directory) as iterator:
+            for entry in iterator:
+                if entry.is_file() and entry.name.endswith(ARCHIVE_SUFFIXES + (PARTIAL_SUFFIX,)):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path, stat.st_ino))
+    except OSError:
+        pass
+    entries.sort(reverse=True)
+    return entries
+
+
+def maintain_directory(directory, compress=COMPRESS_GZIP, max_files=None, max_age_days=None, max_bytes=None):
+    """
+    Comprime los logs cerrados y aplica la politica de retencion de un directorio de prueba.
+    Los archivos en uso (flock activo) no se tocan ni cuentan para los limites.
+
+    Args:
+        directory (str): Directorio de la prueba (logs/<test>)
+        compress (str): "gzip", "zstd" o "none"
+        max_files (int): Archivos a conservar (los mas recientes)
+        max_age_days (float): Antiguedad maxima
+        max_bytes (int): Bytes totales maximos
+
+    Returns:
+        dict: compressed, removed (listas de rutas)
+    """
+    now = time.time()
+    result = {'compressed': [], 'removed': []}
+    kept = []
+    for mtime, size, path, inode in _archive_entries(directory):
+        if path.endswith(PARTIAL_SUFFIX):
+            # Compresion interrumpida (proceso terminado con os._exit): el original sigue intacto
+            if now - mtime >= ACTIVE_GRACE_SECONDS:
+                _remove(path, result)
+            continue
+        if path.endswith(LOG_SUFFIX):
+            # Vacio: recien creado y quiza aun sin flock (TestLogger escribe la cabecera despues)
+            claim = None if not size else _claim(path, inode, mtime, now)
+            if claim is None:
+                continue
+            try:
+                compressed = compress_file(path, compress)
+            finally:
+                _release(claim)
+            if compressed is not None:
+                result['compressed'].append(compressed)
+                path, size = compressed, os.path.getsize(compressed)
+        kept.append((mtime, size, path))
+
+    total = 0
+    for index, (mtime, size, path) in enumerate(kept):
+        total += size
+        if ((max_files is not None and index >= max_files)
+                or (max_age_days is not None and now - mtime > max_age_days * SECONDS_PER_DAY)
+                or (max_bytes is not None and total > max_bytes)):
+            _remove(path, result)
+    return result
+
+
+def _remove(path, result):
+    try:
+        os.unlink(path)
+        result['removed'].append(path)
+    except OSError:
+        pass
+
+
+def submit(function, *args, **kwargs):
+    """Ejecuta una tarea de archivo en el hilo de fondo compartido (una a la vez)."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="log-archive")
+        return _executor.submit(function, *args, **kwargs)
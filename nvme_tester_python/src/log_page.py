@@ -0,0 +1,304 @@
+"""
+Lectura generica de log pages (Get Log Page) de cualquier tamano.
+
+LogPageReader calcula NUMD a partir del tamano pedido y, si supera MDTS, divide la lectura en
+tramos direccionados por Log Page Offset (CDW12/CDW13, requiere LPA bit 2). Los tramos se
+copian a un unico buffer preasignado (o a uno del llamador, p.ej. un mmap) por posicion, sin
+concatenar, y se pueden pedir en paralelo cuando el log lo admite (LOG_PAGES[...].concurrent):
+los logs cuyo contenido cambia o se consume al leerse se leen en orden.
+
+Es la base de los logs de NvmeCommands (fw_log, effects_log, error_log, persistent_event_log,
+vendor_log...) y de la captura de telemetria (src/telemetry.py).
+
+Ejemplo:
+    reader = LogPageReader(nvme)
+    page = reader.read(LID_FIRMWARE_SLOT, 512)
+    blob = reader.read(0xC2, 2 * 1024 * 1024)          # log de fabricante en tramos de MDTS
+"""
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .admin_passthru_wrappper import SubmissionQueueEntry
+
+OPC_GET_LOG_PAGE = 0x02
+NSID_ALL = 0xFFFFFFFF
+
+# Get Log Page CDW10 / CDW11 / CDW14
+NUMDL_BIT = 16
+NUMDL_MASK = 0xFFFF
+RAE_BIT = 15
+LSP_BIT = 8
+LSP_MASK = 0x7F
+NUMDU_MASK = 0xFFFF
+LSI_BIT = 16
+LSI_MASK = 0xFFFF
+CSI_BIT = 24
+OT_BIT = 23
+UIDX_MASK = 0x7F
+
+# Identify Controller LPA: bit 2 = datos extendidos (Log Page Offset y NUMD de 32 bits)
+LPA_EXTENDED_DATA = 1 << 2
+DEFAULT_PAGE_SIZE = 4096                  # CAP.MPSMIN = 0
+UNLIMITED_TRANSFER = 1024 * 1024          # tramo usado cuando MDTS = 0 (sin limite)
+DWORD = 4
+
+DEFAULT_WORKERS = 4
+DEFAULT_RETRIES = 0
+DEFAULT_RETRY_DELAY = 0.1                 # segundos; se duplica en cada reintento
+
+LID_ERROR = 0x01
+LID_SMART = 0x02
+LID_FIRMWARE_SLOT = 0x03
+LID_CHANGED_NS = 0x04
+LID_EFFECTS = 0x05
+LID_TELEMETRY_HOST = 0x07
+LID_TELEMETRY_CONTROLLER = 0x08
+LID_ENDURANCE_GROUP = 0x09
+LID_PREDICTABLE_LATENCY = 0x0A
+LID_PERSISTENT_EVENT = 0x0D
+LID_SANITIZE = 0x81
+LID_VENDOR_FIRST = 0xC0
+
+ERROR_ENTRY_SIZE = 64
+
+# Persistent Event Log: LSP (accion) y Total Log Length en la cabecera
+PEL_READ = 0x0
+PEL_ESTABLISH = 0x1
+PEL_RELEASE = 0x2
+PEL_HEADER_SIZE = 512
+PEL_TOTAL_LENGTH = struct.Struct("<Q")
+PEL_TOTAL_LENGTH_OFFSET = 8
+
+
+class LogPage(object):
+    __slots__ = ("lid", "name", "size", "concurrent")
+
+    def __init__(self, lid, name, size=None, concurrent=False):
+        """
+        Args:
+            lid (int): Log Identifier
+            name (str): Nombre (clave de LOG_PAGES)
+            size (int): Tamano fijo en bytes; None si depende del controlador o de la cabecera
+            concurrent (bool): Los tramos se pueden leer en paralelo (contenido estable)
+        """
+        self.lid = lid
+        self.name = name
+        self.size = size
+        self.concurrent = concurrent
+
+
+LOG_PAGES = {page.name: page for page in (
+    LogPage(LID_ERROR, "error"),
+    LogPage(LID_SMART, "smart", 512),
+    LogPage(LID_FIRMWARE_SLOT, "firmware-slot", 512),
+    # Leer la lista de namespaces cambiados la consume
+    LogPage(LID_CHANGED_NS, "changed-ns", 4096),
+    LogPage(LID_EFFECTS, "effects", 4096, concurrent=True),
+    LogPage(LID_TELEMETRY_HOST, "telemetry-host", concurrent=True),
+    LogPage(LID_TELEMETRY_CONTROLLER, "telemetry-controller", concurrent=True),
+    LogPage(LID_ENDURANCE_GROUP, "endurance-group", 512),
+    LogPage(LID_PREDICTABLE_LATENCY, "predictable-latency", 512),
+    # Con el contexto establecido el contenido queda fijo hasta liberarlo
+    LogPage(LID_PERSISTENT_EVENT, "persistent-event", concurrent=True),
+    LogPage(LID_SANITIZE, "sanitize", 512),
+)}
+_PAGES_BY_LID = {page.lid: page for page in LOG_PAGES.values()}
+
+
+def get_log_page_sqe(lid, length, offset=0, lsp=0, rae=False, nsid=NSID_ALL, lsi=0, csi=0, ot=False,
+                     uuid_index=0):
+    """SQE de Get Log Page para `length` bytes (multiplo de 4) desde `offset`."""
+    numd = length // DWORD - 1
+    sqe = SubmissionQueueEntry()
+    sqe.OPC = OPC_GET_LOG_PAGE
+    sqe.NSID = nsid
+    sqe.DW10 = (((numd & NUMDL_MASK) << NUMDL_BIT) | (int(rae) << RAE_BIT) | ((lsp & LSP_MASK) << LSP_BIT)
+                | (lid & 0xFF))
+    sqe.DW11 = ((lsi & LSI_MASK) << LSI_BIT) | ((numd >> 16) & NUMDU_MASK)
+    sqe.DW12 = offset & 0xFFFFFFFF
+    sqe.DW13 = offset >> 32
+    sqe.DW14 = ((csi & 0xFF) << CSI_BIT) | (int(ot) << OT_BIT) | (uuid_index & UIDX_MASK)
+    return sqe
+
+
+def log_page(lid):
+    """Descripcion registrada de un LID; los desconocidos (fabricante) se leen en orden."""
+    page = _PAGES_BY_LID.get(lid)
+    if page is None:
+        page = LogPage(lid, f"vendor-0x{lid:02x}" if lid >= LID_VENDOR_FIRST else f"lid-0x{lid:02x}")
+    return page
+
+
+class LogPageReader(object):
+    def __init__(self, nvme, max_workers=DEFAULT_WORKERS, chunk_size=None, retries=DEFAULT_RETRIES,
+                 retry_delay=DEFAULT_RETRY_DELAY):
+        """
+        Args:
+            nvme (NvmeCommands): Wrapper del dispositivo (passthru, idctrol y logger)
+            max_workers (int): Tramos simultaneos en los logs que lo admiten (1 = siempre en orden)
+            chunk_size (int): Bytes por comando; None = maximo permitido por MDTS
+            retries (int): Reintentos de un tramo fallido (desde el mismo offset)
+            retry_delay (float): Espera antes del primer reintento en segundos
+        """
+        self.nvme = nvme
+        self.logger = nvme.logger
+        self.max_workers = max(1, max_workers)
+        self.chunk_size = chunk_size
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self._controller = None
+
+    def controller(self):
+        """
+        Limites de Get Log Page del controlador (se consultan una vez con id-ctrl, que esta cacheado).
+
+        Returns:
+            dict: lpa, max_transfer (bytes por comando), offsets (admite Log Page Offset);
+                  None si id-ctrl falla
+        """
+        if self._controller is None:
+            identify = self.nvme.idctrol(json_output=True)
+            if not isinstance(identify, dict):
+                self.logger.error("Get Log Page: id-ctrl failed, transfer limits unknown")
+                return None
+            lpa = int(identify.get('lpa', 0))
+            mdts = int(identify.get('mdts', 0))
+            max_transfer = DEFAULT_PAGE_SIZE << mdts if mdts else UNLIMITED_TRANSFER
+            if self.chunk_size:
+                max_transfer = min(max_transfer, self.chunk_size)
+            self._controller = {'lpa': lpa, 'max_transfer': max(DWORD, max_transfer - max_transfer % DWORD),
+                                'offsets': bool(lpa & LPA_EXTENDED_DATA)}
+        return self._controller
+
+    def _submit(self, lid, offset, length, fields, cancel=None):
+        """Un comando Get Log Page con reintentos; devuelve el buffer de datos o None (tambien si se cancela)."""
+        sqe = get_log_page_sqe(lid, length, offset, **fields)
+        delay = self.retry_delay
+        for attempt in range(self.retries + 1):
+            if cancel is not None and cancel.is_set():
+                return None
+            cqe = self.nvme.passthru(sqe, data_len=length, read=True)
+            if cqe is not None and not cqe.status_code_type and not cqe.status_code \
+                    and len(cqe.data_buffer) >= length:
+                return cqe.data_buffer
+            status = "transport error" if cqe is None else \
+                f"sct=0x{cqe.status_code_type:x} sc=0x{cqe.status_code:x}"
+            if attempt < self.retries:
+                self.logger.warning(f"Get Log Page 0x{lid:02x} at offset {offset} failed ({status}), "
+                                    f"retrying in {delay:.2f}s")
+                time.sleep(delay)
+                delay *= 2
+            else:
+                self.logger.error(f"Get Log Page 0x{lid:02x} at offset {offset} failed ({status})")
+        return None
+
+    def read(self, lid, size, offset=0, nsid=NSID_ALL, lsp=0, lsi=0, rae=False, csi=0, ot=False, uuid_index=0,
+             concurrent=None, out=None, on_chunk=None):
+        """
+        Lee `size` bytes de un log page desde `offset`.
+
+        Args:
+            lid (int): Log Identifier
+            size (int): Bytes a leer (NUMD se calcula redondeando a dwords)
+            offset (int): Log Page Offset inicial en bytes (multiplo de 4)
+            nsid, lsp, lsi, rae, csi, ot, uuid_index: Campos del comando
+            concurrent (bool): Tramos en paralelo; None = segun LOG_PAGES
+            out (buffer): Destino escribible de al menos `size` bytes (p.ej. un mmap); None = bytearray nuevo
+            on_chunk (callable): on_chunk(posicion, longitud) por cada tramo copiado (desde los hilos
+                                 de lectura); permite registrar el avance aunque la lectura falle
+
+        Returns:
+            bytearray/buffer: `out` o un bytearray con el log; None si falla algun tramo
+        """
+        if size <= 0 or offset % DWORD:
+            self.logger.error(f"Get Log Page 0x{lid:02x}: invalid size {size} / offset {offset}")
+            return None
+        limits = self.controller()
+        if limits is None:
+            return None
+        chunk = limits['max_transfer']
+        if size > chunk and not limits['offsets']:
+            self.logger.error(f"Get Log Page 0x{lid:02x}: {size} bytes exceed the transfer limit ({chunk}) and the "
+                              f"controller does not support log page offsets")
+            return None
+        if offset and not limits['offsets']:
+            self.logger.error(f"Get Log Page 0x{lid:02x}: controller does not support log page offsets")
+            return None
+
+        buffer = bytearray(size) if out is None else out
+        fields = {'nsid': nsid, 'lsp': lsp, 'lsi': lsi, 'rae': rae, 'csi': csi, 'ot': ot, 'uuid_index': uuid_index}
+        # Posiciones relativas al inicio del buffer; NUMD siempre en dwords completos
+        chunks = [(position, min(chunk, size - position)) for position in range(0, size, chunk)]
+        if concurrent is None:
+            concurrent = log_page(lid).concurrent
+
+        # Un tramo fallido (tras sus reintentos) cancela los demas: no se piden tramos nuevos
+        cancel = threading.Event()
+        with memoryview(buffer) as view:
+            def fetch(item):
+                if cancel.is_set():
+                    return
+                position, length = item
+                data = self._submit(lid, offset + position, -(-length // DWORD) * DWORD, fields, cancel)
+                if data is None:
+                    cancel.set()
+                    return
+                view[position:position + length] = memoryview(data)[:length]
+                if on_chunk is not None:
+                    on_chunk(position, length)
+
+            workers = min(self.max_workers, len(chunks)) if concurrent else 1
+            if workers > 1:
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="get-log") as pool:
+                    # Como maximo `workers` tramos en vuelo
+                    pending = set()
+                    for item in chunks:
+                        if len(pending) >= workers:
+                            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                            for future in done:
+                                future.result()
+                        if cancel.is_set():
+                            break
+                        pending.add(pool.submit(fetch, item))
+                    if cancel.is_set():
+                        for future in pending:
+                            future.cancel()
+                    for future in pending:
+                        if not future.cancelled():
+                            future.result()
+            else:
+                for item in chunks:
+                    fetch(item)
+                    if cancel.is_set():
+                        break
+            ok = not cancel.is_set()
+        return buffer if ok else None
+
+    def read_persistent_event(self, size=None, **fields):
+        """
+        Persistent Event Log completo: establece el contexto, lee Total Log Length bytes y lo libera.
+
+        Args:
+            size (int): Limite de bytes a leer (None = todo el log)
+
+        Returns:
+            bytearray: Log (cabecera incluida), None si falla
+        """
+        header = self.read(LID_PERSISTENT_EVENT, PEL_HEADER_SIZE, lsp=PEL_ESTABLISH, **fields)
+        if header is None:
+            return None
+        try:
+            total = PEL_TOTAL_LENGTH.unpack_from(header, PEL_TOTAL_LENGTH_OFFSET)[0]
+            if size is not None:
+                total = min(total, size)
+            if total <= PEL_HEADER_SIZE:
+                return header
+            data = bytearray(total)
+            data[:PEL_HEADER_SIZE] = header
+            rest = self.read(LID_PERSISTENT_EVENT, total - PEL_HEADER_SIZE, offset=PEL_HEADER_SIZE,
+                             lsp=PEL_READ, out=memoryview(data)[PEL_HEADER_SIZE:], **fields)
+            return data if rest is not None else None
+        finally:
+            self.read(LID_PERSISTENT_EVENT, PEL_HEADER_SIZE, lsp=PEL_RELEASE, **fields)
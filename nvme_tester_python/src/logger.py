@@ -1,15 +1,363 @@
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
+import threading
+import time
+import weakref
 from datetime import datetime
 
+from . import log_archive
+
+# Modo cola: NVME_LOG_QUEUED=1 activa QueueHandler + escritor en segundo plano para todos los TestLogger
+LOG_QUEUED_ENV = "NVME_LOG_QUEUED"
+DEFAULT_BUFFER_SIZE = 1024 * 1024      # bytes acumulados antes de escribir
+DEFAULT_FLUSH_INTERVAL = 1.0           # segundos maximos que un mensaje espera en el buffer
+FLUSH_TIMEOUT = 30.0
+# Modo limitado: NVME_LOG_RATE_LIMIT=1 limita los mensajes repetitivos por linea de codigo y resume las operaciones
+LOG_RATE_LIMIT_ENV = "NVME_LOG_RATE_LIMIT"
+DEFAULT_RATE_LIMIT_BURST = 10          # mensajes INFO/DEBUG por linea de codigo y ventana
+DEFAULT_RATE_LIMIT_WINDOW = 60.0       # segundos
+DEFAULT_SUMMARY_INTERVAL = 60.0        # segundos entre resumenes de operaciones
+SUMMARY_PERCENTILE = 99
+RATE_LIMIT_EXEMPT = {'rate_limit_exempt': True}   # extra= de los mensajes que nunca se limitan
+# Rotacion y retencion por directorio de prueba (ver src/log_archive.py)
+LOG_COMPRESS_ENV = "NVME_LOG_COMPRESS"           # gzip (por defecto), zstd o none
+DEFAULT_MAX_LOG_BYTES = 64 * 1024 * 1024        # rotar al superar este tamano
+DEFAULT_RETENTION_FILES = 200                   # archivos conservados por prueba
+DEFAULT_RETENTION_BYTES = 2 * 1024 * 1024 * 1024
+LOG_FORMAT = '%(asctime)s | %(name)s | %(levelname)-8s | %(funcName)s:%(lineno)d | %(message)s'
+
+
+class BufferedAppendHandler(logging.Handler):
+    """
+    Handler de archivo con buffer propio. Acumula lineas formateadas y las escribe con un solo
+    os.write sobre un descriptor O_APPEND cuando el buffer supera buffer_size, llega un mensaje de
+    nivel >= flush_level o se llama a flush(). Cada escritura contiene solo lineas completas, asi
+    que varios procesos pueden anexar al mismo archivo sin mezclar lineas.
+
+    Con max_bytes / rotate_seconds el archivo rota: el segmento cerrado se renombra a
+    <nombre>.001.log, .002.log... (se entrega a on_rotate para comprimirlo) y se sigue escribiendo
+    en un archivo nuevo con el nombre original.
+    """
+    def __init__(self, filename, buffer_size=DEFAULT_BUFFER_SIZE, flush_level=logging.ERROR, fd=None,
+                 max_bytes=None, rotate_seconds=None, on_rotate=None):
+        super().__init__()
+        self.baseFilename = os.path.abspath(filename)
+        self.buffer_size = buffer_size
+        self.flush_level = flush_level
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.on_rotate = on_rotate
+        self.fd = fd if fd is not None else self._open(os.O_CREAT)
+        self.segments = 0
+        self._written = os.fstat(self.fd).st_size
+        self._opened = time.monotonic()
+        self._buffer = []
+        self._buffered = 0
+        self._pid = os.getpid()
+
+    def _open(self, extra_flags):
+        fd = os.open(self.baseFilename, os.O_WRONLY | os.O_APPEND | extra_flags, 0o644)
+        log_archive.lock_shared(fd)
+        return fd
+
+    def emit(self, record):
+        try:
+            data = (self.format(record) + "\n").encode("utf-8", errors="replace")
+        except Exception:
+            self.handleError(record)
+            return
+        self._buffer.append(data)
+        self._buffered += len(data)
+        if self._buffered >= self.buffer_size or record.levelno >= self.flush_level:
+            try:
+                self.flush()
+            except Exception:
+                self.handleError(record)
+
+    def _should_rotate(self, length):
+        if not self._written:
+            return False
+        if self.max_bytes and self._written + length > self.max_bytes:
+            return True
+        return bool(self.rotate_seconds) and time.monotonic() - self._opened >= self.rotate_seconds
+
+    def _rotate(self):
+        # El rename se hace con el descriptor (y su flock compartido) todavia abierto: si se cerrara
+        # antes, maintain_directory podria tomar y borrar el archivo entre el cierre y el rename
+        root = self.baseFilename[:-len(log_archive.LOG_SUFFIX)] if \
+            self.baseFilename.endswith(log_archive.LOG_SUFFIX) else self.baseFilename
+        segment = f"{root}.{self.segments + 1:03d}{log_archive.LOG_SUFFIX}"
+        try:
+            os.replace(self.baseFilename, segment)
+        except FileNotFoundError:
+            segment = None          # El archivo ya no existe: se sigue en uno nuevo, sin segmento
+        except OSError:
+            # Se sigue anexando al archivo actual y se reintenta tras otro max_bytes / rotate_seconds
+            self._written = 0
+            self._opened = time.monotonic()
+            self.handleError(logging.makeLogRecord({'msg': f"Log rotation of {self.baseFilename} failed"}))
+            return
+        if segment is not None:
+            self.segments += 1
+        fd = self._open(os.O_CREAT | os.O_EXCL)
+        os.close(self.fd)
+        self.fd = fd
+        self._written = 0
+        self._opened = time.monotonic()
+        if segment is not None and self.on_rotate is not None:
+            self.on_rotate(segment)
+
+    def flush(self):
+        self.acquire()
+        try:
+            if not self._buffer or self.fd is None:
+                return
+            data = b"".join(self._buffer)
+            self._buffer = []
+            self._buffered = 0
+            if self._should_rotate(len(data)):
+                self._rotate()
+            view = memoryview(data)
+            while view:
+                view = view[os.write(self.fd, view):]
+            self._written += len(data)
+        finally:
+            self.release()
+
+    def reset_after_fork(self):
+        """Descarta el buffer heredado del proceso padre (ya lo escribira el padre)."""
+        self._buffer = []
+        self._buffered = 0
+        self._pid = os.getpid()
+
+    def close(self):
+        self.acquire()
+        try:
+            try:
+                self.flush()
+            finally:
+                if self.fd is not None:
+                    os.close(self.fd)
+                    self.fd = None
+        finally:
+            self.release()
+        super().close()
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler que encola el LogRecord sin formatear: el mensaje (msg % args) se construye en el
+    hilo escritor, no en el hilo que ejecuta la prueba.
+    """
+    def prepare(self, record):
+        return record
+
+
+class _LogWriter(threading.Thread):
+    """Hilo escritor: vacia la cola hacia el handler de archivo y lo hace flush periodicamente."""
+    STOP = None
+
+    def __init__(self, log_queue, handler, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        super().__init__(name="testlogger-writer", daemon=True)
+        self.queue = log_queue
+        self.handler = handler
+        self.flush_interval = flush_interval
+
+    def _flush(self):
+        """flush del handler sin detener el hilo si la escritura falla (se reporta con handleError)."""
+        try:
+            self.handler.flush()
+        except Exception:
+            self.handler.handleError(logging.makeLogRecord({'msg': f"Log flush to {self.handler.baseFilename} failed"}))
+
+    def run(self):
+        handler = self.handler
+        while True:
+            try:
+                record = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._flush()
+                continue
+            if record is self.STOP:
+                self._flush()
+                return
+            if isinstance(record, threading.Event):
+                # Peticion de flush(): todo lo encolado antes ya se proceso
+                self._flush()
+                record.set()
+                continue
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Deja pasar como maximo `burst` mensajes por linea de codigo (pathname, lineno) en cada ventana
+    de `window` segundos. WARNING y superiores (y los mensajes con extra=RATE_LIMIT_EXEMPT) nunca
+    se limitan. El primer mensaje que pasa tras
+    una ventana con descartes lleva anotado cuantos se omitieron.
+    """
+    def __init__(self, burst=DEFAULT_RATE_LIMIT_BURST, window=DEFAULT_RATE_LIMIT_WINDOW,
+                 min_level=logging.WARNING):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.min_level = min_level
+        self._sites = {}               # (pathname, lineno) -> [inicio de ventana, mensajes, descartados]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= self.min_level or getattr(record, "rate_limit_exempt", False):
+            return True
+        now = time.monotonic()
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None:
+                site = self._sites[key] = [now, 0, 0]
+            if now - site[0] >= self.window:
+                site[0] = now
+                site[1] = 0
+            if site[1] >= self.burst:
+                site[2] += 1
+                return False
+            site[1] += 1
+            suppressed, site[2] = site[2], 0
+        if suppressed:
+            record.msg = f"{record.getMessage()} [{suppressed} similar message(s) suppressed]"
+            record.args = None
+        return True
+
+    def suppressed(self):
+        """
+        Returns:
+            dict: {(pathname, lineno): mensajes descartados aun no reportados}
+        """
+        with self._lock:
+            return {key: site[2] for key, site in self._sites.items() if site[2]}
+
+    def take_suppressed(self):
+        """Como suppressed(), pero los marca como reportados."""
+        with self._lock:
+            pending = {key: site[2] for key, site in self._sites.items() if site[2]}
+            for key in pending:
+                self._sites[key][2] = 0
+        return pending
+
+
+class OperationCounters(object):
+    """
+    Contadores por operacion ("cli:write", "io:read"...) con histograma de latencia, reportados
+    como una linea por operacion y periodo: "cli:write x 10,000 ok, 3 failures, p99 812.0us".
+    """
+    def __init__(self):
+        self._period = {}              # key -> [ok, fallos, LatencyHistogram]
+        self.totals = {}               # key -> [ok, fallos]
+        self._lock = threading.Lock()
+
+    def record(self, key, ok=True, latency_us=None):
+        from .latency import LatencyHistogram
+
+        with self._lock:
+            period = self._period.get(key)
+            if period is None:
+                period = self._period[key] = [0, 0, LatencyHistogram()]
+            total = self.totals.setdefault(key, [0, 0])
+            index = 0 if ok else 1
+            period[index] += 1
+            total[index] += 1
+        if latency_us is not None:
+            period[2].record(latency_us)
+
+    def take_summaries(self):
+        """
+        Lineas de resumen del periodo actual (y reinicia el periodo).
+
+        Returns:
+            list: Una linea por operacion con actividad
+        """
+        with self._lock:
+            period, self._period = self._period, {}
+        lines = []
+        for key, (ok, failures, histogram) in sorted(period.items()):
+            line = f"{key} x {ok:,} ok, {failures:,} failure(s)"
+            value = histogram.percentile(SUMMARY_PERCENTILE)
+            if value is not None:
+                line += f", p{SUMMARY_PERCENTILE} {value:.1f}us"
+            total_ok, total_failures = self.totals[key]
+            lines.append(f"{line} (total {total_ok + total_failures:,})")
+        return lines
+
+
+_queued_loggers = weakref.WeakSet()
+
+
+def _close_queued_loggers():
+    for test_logger in list(_queued_loggers):
+        test_logger.close()
+
+
+def _restart_writers_after_fork():
+    for test_logger in list(_queued_loggers):
+        test_logger._restart_writer()
+
+
+atexit.register(_close_queued_loggers)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_writers_after_fork)
+
+
 class TestLogger:
-    def __init__(self, name="TestLogger"):
+    def __init__(self, name="TestLogger", queued=None, buffer_size=DEFAULT_BUFFER_SIZE,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, rate_limit=None, burst=DEFAULT_RATE_LIMIT_BURST,
+                 summary_interval=DEFAULT_SUMMARY_INTERVAL, max_bytes=DEFAULT_MAX_LOG_BYTES, rotate_seconds=None,
+                 compress=None, retention_files=DEFAULT_RETENTION_FILES, retention_days=None,
+                 retention_bytes=DEFAULT_RETENTION_BYTES):
         """
         Start logger functions.
         Input:
         name (str): Logger name.
+        queued (bool): Modo cola (QueueHandler + escritor en segundo plano con escrituras grandes);
+                       None = variable de entorno NVME_LOG_QUEUED.
+        buffer_size (int): Bytes acumulados por el escritor antes de escribir (modo cola).
+        flush_interval (float): Segundos maximos entre escrituras (modo cola).
+        rate_limit (bool): Limita INFO/DEBUG repetitivos por linea de codigo y resume las
+                           operaciones registradas con count(); los fallos (WARNING+) se registran
+                           completos. None = variable de entorno NVME_LOG_RATE_LIMIT.
+        burst (int): Mensajes por linea de codigo y ventana (modo limitado).
+        summary_interval (float): Segundos por ventana y entre resumenes (modo limitado).
+        max_bytes (int): Rotar el archivo al superar este tamano (None = sin limite).
+        rotate_seconds (float): Rotar el archivo cada tantos segundos (None = sin rotacion por tiempo).
+        compress (str): Compresion de los logs cerrados: "gzip", "zstd" o "none";
+                        None = variable de entorno NVME_LOG_COMPRESS (gzip por defecto).
+        retention_files, retention_days, retention_bytes: Retencion del directorio de la prueba
+                        (cantidad, antiguedad y bytes totales; None = sin limite).
         """
         self.name = name
+        if queued is None:
+            queued = os.environ.get(LOG_QUEUED_ENV, "").lower() in ("1", "true", "yes")
+        self.queued = queued
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self._queue = None
+        self._writer = None
+        self._file_handler = None
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.compress = compress or os.environ.get(LOG_COMPRESS_ENV, log_archive.COMPRESS_GZIP).lower()
+        self.retention = {'max_files': retention_files, 'max_age_days': retention_days,
+                          'max_bytes': retention_bytes}
+        self.log_dir = None
+        self._archive_tasks = []
+        if rate_limit is None:
+            rate_limit = os.environ.get(LOG_RATE_LIMIT_ENV, "").lower() in ("1", "true", "yes")
+        self.summary_interval = summary_interval
+        self._rate_filter = RateLimitFilter(burst, summary_interval) if rate_limit else None
+        self._counters = OperationCounters() if rate_limit else None
+        self._last_summary = time.monotonic()
         # Create unique logger name to avoid conflicts
         unique_name = f"{name}_{id(self)}"
         self.logger = logging.getLogger(unique_name)
@@ -19,6 +367,9 @@ class TestLogger:
         self.logger.handlers = []
         
         self._setup_handler()
+        if self._rate_filter is not None:
+            # En el logger (no en el handler): los mensajes descartados ni se encolan ni se formatean
+            self.logger.addFilter(self._rate_filter)
 
     def _setup_handler(self):
         """
@@ -36,8 +387,7 @@ class TestLogger:
         
         # Create logs directory inside nvme_tester_python
         base_log_dir = os.path.join(project_root, "logs")
-        if not os.path.exists(base_log_dir):
-            os.makedirs(base_log_dir)
+        os.makedirs(base_log_dir, exist_ok=True)
         
         # Create subdirectory for each test case
         # Extract test name from logger name (remove any prefixes/suffixes if needed)
@@ -49,38 +399,34 @@ class TestLogger:
         
         # Create test-specific subdirectory inside nvme_tester_python/logs/
         test_log_dir = os.path.join(base_log_dir, clean_test_name)
-        if not os.path.exists(test_log_dir):
-            os.makedirs(test_log_dir)
+        os.makedirs(test_log_dir, exist_ok=True)
         
-        # Generate timestamp and log file path with uniqueness guarantee
+        # Generate timestamp and create the log file atomically (O_EXCL: no overwrite, no races)
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        base_log_name = f"{self.name}_{timestamp}.log"
-        log_file = os.path.join(test_log_dir, base_log_name)
-        
-        # Ensure unique filename to avoid overwriting
-        counter = 1
-        while os.path.exists(log_file):
-            unique_log_name = f"{self.name}_{timestamp}_{counter:03d}.log"
-            log_file = os.path.join(test_log_dir, unique_log_name)
-            counter += 1
-            
-            # Safety check to avoid infinite loop
-            if counter > 999:
-                # Use microseconds for even more precision
-                microsecond_timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-                unique_log_name = f"{self.name}_{microsecond_timestamp}.log"
-                log_file = os.path.join(test_log_dir, unique_log_name)
-                break
-        
-        # Setup file handler
-        file_handler = logging.FileHandler(log_file)
+        log_file, fd = log_archive.create_exclusive(test_log_dir, f"{self.name}_{timestamp}")
+        self.log_dir = test_log_dir
+
+        # Setup file handler (sin buffer en modo sincrono: cada mensaje se escribe al momento)
+        file_handler = BufferedAppendHandler(log_file, buffer_size=self.buffer_size if self.queued else 0, fd=fd,
+                                             max_bytes=self.max_bytes, rotate_seconds=self.rotate_seconds,
+                                             on_rotate=self._maintain_logs)
         file_handler.setLevel(logging.DEBUG)
-        file_format = logging.Formatter(
-            '%(asctime)s | %(name)s | %(levelname)-8s | %(funcName)s:%(lineno)d | %(message)s'
-        )
+        file_format = logging.Formatter(LOG_FORMAT)
         file_handler.setFormatter(file_format)
+        self._file_handler = file_handler
+
+        if self.queued:
+            # El hilo de la prueba solo encola; formato y escritura ocurren en el escritor
+            self._queue = queue.SimpleQueue()
+            self.logger.addHandler(_DeferredQueueHandler(self._queue))
+            self._writer = _LogWriter(self._queue, file_handler, self.flush_interval)
+            self._writer.start()
+            _queued_loggers.add(self)
+        else:
+            self.logger.addHandler(file_handler)
 
-        self.logger.addHandler(file_handler)
+        # Comprimir logs cerrados y aplicar la retencion en segundo plano
+        self._maintain_logs()
         
         # Log initial information about this log session
         self.logger.info(f"=== LOG SESSION STARTED ===")
@@ -88,9 +434,17 @@ class TestLogger:
         self.logger.info(f"Log File: {os.path.basename(log_file)}")
         self.logger.info(f"Log Directory: {test_log_dir}")
         self.logger.info(f"Session ID: {id(self)}")
+        self.logger.info(f"Mode: {'queued' if self.queued else 'synchronous'}"
+                         f"{', rate-limited' if self._rate_filter is not None else ''}")
         self.logger.info(f"Timestamp: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         self.logger.info(f"=============================")
 
+    def _maintain_logs(self, rotated_segment=None):
+        """Programa compresion + retencion del directorio de la prueba (tambien tras cada rotacion)."""
+        self._archive_tasks = [task for task in self._archive_tasks if not task.done()]
+        self._archive_tasks.append(log_archive.submit(log_archive.maintain_directory, self.log_dir,
+                                                      compress=self.compress, **self.retention))
+
     def log_test_start(self, test_name):
         """
         Start logger.
@@ -112,6 +466,9 @@ class TestLogger:
         else:
             self.logger.info(f" TEST FAILED: {test_name} - {result}")
         self.logger.info(f"Test {test_name} ended at {datetime.now()}")
+        self.log_summaries()
+        # Al terminar la prueba todo lo registrado debe estar en disco
+        self.flush()
 
     def log_command(self, command, result):
         """
@@ -126,26 +483,6 @@ class TestLogger:
             self.logger.info(f"Error en comando: {command} - {result}")
         self.logger.info(f"Command details: {command} -> {result}")
 
-    def info(self, message):
-        """Log an info message"""
-        self.logger.info(message)
-    
-    def debug(self, message):
-        """Log a debug message"""
-        self.logger.debug(message)
-    
-    def warning(self, message):
-        """Log a warning message"""
-        self.logger.warning(message)
-    
-    def error(self, message):
-        """Log an error message"""
-        self.logger.error(message)
-    
-    def critical(self, message):
-        """Log a critical message"""
-        self.logger.critical(message)
-
     def set_level(self, level):
         """
         Change logging level.
@@ -157,17 +494,104 @@ class TestLogger:
             if isinstance(handler, logging.StreamHandler) and not isinstance(handler, logging.FileHandler):
                 handler.setLevel(level)
     
-    def debug(self, message: str):
-        self.logger.debug(str(message))
+    # Los mensajes aceptan argumentos estilo %: logger.info("cmd %s rc=%d", cmd, rc) solo formatea
+    # si el nivel esta habilitado (y, en modo cola, lo hace el hilo escritor). stacklevel=2 atribuye
+    # el mensaje a quien llama (funcName/lineno del log y linea de codigo del modo limitado).
+    def debug(self, message, *args):
+        self.logger.debug(message, *args, stacklevel=2)
+
+    def info(self, message, *args):
+        self.logger.info(message, *args, stacklevel=2)
+
+    def warning(self, message, *args):
+        self.logger.warning(message, *args, stacklevel=2)
+
+    def error(self, message, *args):
+        self.logger.error(message, *args, stacklevel=2)
 
-    def info(self, message: str):
-        self.logger.info(str(message))
+    def critical(self, message, *args):
+        self.logger.critical(message, *args, stacklevel=2)
 
-    def warning(self, message: str):
-        self.logger.warning(str(message))
+    @property
+    def aggregating(self):
+        """True en modo limitado (las operaciones se resumen en lugar de registrarse una a una)."""
+        return self._counters is not None
 
-    def error(self, message: str):
-        self.logger.error(str(message))
+    def count(self, key, ok=True, latency_us=None):
+        """
+        Registra una operacion repetitiva para el resumen periodico (solo en modo limitado).
+
+        Args:
+            key (str): Operacion ("cli:write", "io:read"...)
+            ok (bool): Resultado
+            latency_us (float): Latencia en microsegundos (para el percentil del resumen)
+        """
+        if self._counters is None:
+            return
+        self._counters.record(key, ok, latency_us)
+        if time.monotonic() - self._last_summary >= self.summary_interval:
+            self.log_summaries()
+
+    def log_summaries(self):
+        """Registra los resumenes de operaciones y los mensajes descartados pendientes."""
+        if self._counters is None:
+            return
+        self._last_summary = time.monotonic()
+        for line in self._counters.take_summaries():
+            self.logger.info("Summary: %s", line, extra=RATE_LIMIT_EXEMPT)
+        for (pathname, lineno), suppressed in sorted(self._rate_filter.take_suppressed().items()):
+            self.logger.info("Suppressed %d repetitive message(s) from %s:%d",
+                             suppressed, os.path.basename(pathname), lineno, extra=RATE_LIMIT_EXEMPT)
+
+    def is_enabled(self, level):
+        """True si un mensaje de ese nivel se registraria (para evitar trabajo en lazos)."""
+        return self.logger.isEnabledFor(level)
+
+    def flush(self, timeout=FLUSH_TIMEOUT):
+        """
+        Espera a que todo lo registrado hasta ahora este escrito en el archivo.
+
+        Returns:
+            bool: False si el escritor no termino dentro del timeout
+        """
+        if self._writer is None:
+            if self._file_handler is not None:
+                self._file_handler.flush()
+            return True
+        if not self._writer.is_alive():
+            return False
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        """Vacia la cola, detiene el escritor y cierra el archivo. Idempotente."""
+        if self._file_handler is not None:
+            self.log_summaries()
+        if self._writer is not None:
+            if self._writer.is_alive():
+                self._queue.put(_LogWriter.STOP)
+                self._writer.join(FLUSH_TIMEOUT)
+            self._writer = None
+            _queued_loggers.discard(self)
+        if self._file_handler is not None:
+            self._file_handler.close()
+            self._file_handler = None
+        self.logger.handlers = []
+        # Los workers de fleet salen con os._exit: esperar la compresion pendiente
+        for task in self._archive_tasks:
+            try:
+                task.result(FLUSH_TIMEOUT)
+            except Exception:
+                pass
+        self._archive_tasks = []
 
-    def critical(self, message: str):
-        self.logger.critical(str(message))
+    def _restart_writer(self):
+        """Tras fork() el hilo escritor no existe en el hijo: cola y escritor nuevos."""
+        if self._writer is None:
+            return
+        self._file_handler.reset_after_fork()
+        self._queue = queue.SimpleQueue()
+        self.logger.handlers = [_DeferredQueueHandler(self._queue)]
+        self._writer = _LogWriter(self._queue, self._file_handler, self.flush_interval)
+        self._writer.start()
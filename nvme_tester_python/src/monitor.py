@@ -0,0 +1,287 @@
+"""
+Muestreo en segundo plano de SMART / temperatura (NvmeCommands.monitor).
+
+SmartMonitor consulta el log page SMART (y opcionalmente Get Features) de un dispositivo a
+intervalo fijo desde su propio hilo. Los SQE se construyen una sola vez y cada muestra se copia
+a un ring buffer preasignado (SampleRing), asi que una muestra cuesta un ioctl y un memcpy de
+512 bytes: suficiente para 10 Hz en 24 drives a la vez.
+
+Ejemplo:
+    monitor = NvmeCommands(logger, device="/dev/nvme0").monitor(interval=0.1)
+    ...
+    monitor.latest().temperature_celsius
+    monitor.stats("temperature", window=10)
+    monitor.stop()
+"""
+import threading
+import time
+
+import numpy as np
+
+from .admin_passthru_wrappper import SubmissionQueueEntry
+from .smart_log import SmartLog, SMART_LOG_SIZE
+from .smart_store import SMART_DTYPE, counter_values
+
+OPC_GET_LOG_PAGE = 0x02
+OPC_GET_FEATURES = 0x0A
+SMART_LOG_LID = 0x02
+NSID_ALL = 0xFFFFFFFF
+NUMDL_BIT = 16
+
+DEFAULT_INTERVAL = 1.0        # segundos entre muestras
+DEFAULT_CAPACITY = 3600       # muestras conservadas por dispositivo
+STOP_TIMEOUT = 5.0
+
+
+def smart_log_sqe():
+    """SQE de Get Log Page SMART / Health Information (512 bytes, todos los namespaces)."""
+    sqe = SubmissionQueueEntry()
+    sqe.OPC = OPC_GET_LOG_PAGE
+    sqe.NSID = NSID_ALL
+    sqe.DW10 = ((SMART_LOG_SIZE // 4 - 1) << NUMDL_BIT) | SMART_LOG_LID
+    return sqe
+
+
+def get_features_sqe(fid, nsid=0):
+    """SQE de Get Features (valor actual) para el Feature Identifier indicado."""
+    sqe = SubmissionQueueEntry()
+    sqe.OPC = OPC_GET_FEATURES
+    sqe.NSID = nsid
+    sqe.DW10 = fid & 0xFF
+    return sqe
+
+
+class SampleRing(object):
+    """
+    Ring buffer de muestras SMART con arreglos preasignados.
+
+    pages guarda las paginas SMART crudas (dtype SMART_DTYPE), timestamps el instante de cada
+    muestra y features el DW0 de cada Get Features muestreado (NaN si fallo).
+    """
+    def __init__(self, capacity=DEFAULT_CAPACITY, features=()):
+        self.capacity = capacity
+        self.features = tuple(features)
+        self.pages = np.zeros(capacity, dtype=SMART_DTYPE)
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.feature_values = np.full((capacity, len(self.features)), np.nan)
+        self.count = 0  # muestras escritas en total
+        self._raw = self.pages.view(np.uint8).reshape(capacity, SMART_LOG_SIZE)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def push(self, page, timestamp, feature_values=None):
+        """Copia una pagina SMART (512 bytes) en el siguiente slot."""
+        with self._lock:
+            slot = self.count % self.capacity
+            self._raw[slot] = np.frombuffer(page, dtype=np.uint8, count=SMART_LOG_SIZE)
+            self.timestamps[slot] = timestamp
+            if feature_values is not None:
+                self.feature_values[slot] = feature_values
+            self.count += 1
+        return slot
+
+    def _ordered_slots(self, window=None):
+        """Slots en orden cronologico, limitados a los ultimos `window` segundos si se indica."""
+        size = len(self)
+        slots = (np.arange(self.count - size, self.count) % self.capacity) if size else np.arange(0)
+        if window is not None and size:
+            newest = self.timestamps[slots[-1]]
+            slots = slots[self.timestamps[slots] >= newest - window]
+        return slots
+
+    def latest(self):
+        """
+        Returns:
+            tuple: (timestamp, SmartLog sobre una copia de la ultima pagina), (None, None) si vacio
+        """
+        with self._lock:
+            if not self.count:
+                return None, None
+            slot = (self.count - 1) % self.capacity
+            return float(self.timestamps[slot]), SmartLog(self._raw[slot].tobytes())
+
+    def snapshot(self, window=None):
+        """
+        Copia consistente de las muestras (orden cronologico).
+
+        Returns:
+            tuple: (timestamps, pages, feature_values)
+        """
+        with self._lock:
+            slots = self._ordered_slots(window)
+            return self.timestamps[slots], self.pages[slots], self.feature_values[slots]
+
+    def stats(self, field, window=None):
+        """
+        min/max/mean de un campo SMART (o de un FID muestreado) en la ventana.
+
+        Args:
+            field (str/int): Nombre de campo SMART o Feature Identifier
+            window (float): Segundos hacia atras desde la ultima muestra (None = todo el buffer)
+
+        Returns:
+            dict: {'min', 'max', 'mean', 'count'}; valores None si no hay muestras
+        """
+        timestamps, pages, feature_values = self.snapshot(window)
+        if field in self.features:
+            values = feature_values[:, self.features.index(field)]
+            values = values[~np.isnan(values)]
+        else:
+            values = counter_values(pages[field])
+        if not values.size:
+            return {'min': None, 'max': None, 'mean': None, 'count': 0}
+        return {'min': values.min().item(), 'max': values.max().item(),
+                'mean': float(values.mean()), 'count': int(values.size)}
+
+
+class SmartMonitor(object):
+    def __init__(self, logger, device, transport=None, interval=DEFAULT_INTERVAL,
+                 capacity=DEFAULT_CAPACITY, features=(), callback=None):
+        """
+        Args:
+            logger (TestLogger): Logger de la prueba
+            device (str): Ruta del dispositivo
+            transport (NvmeTransport): Transporte passthru (None usa el de por defecto)
+            interval (float): Segundos entre muestras
+            capacity (int): Tamano del ring buffer
+            features (iterable): Feature Identifiers a muestrear junto con SMART
+            callback (callable): Suscriptor inicial, ver subscribe()
+        """
+        if transport is None:
+            from .transport import default_transport
+            transport = default_transport()
+        self.logger = logger
+        self.device = device
+        self.transport = transport
+        self.interval = interval
+        self.ring = SampleRing(capacity, features)
+        self.errors = 0
+        self.missed = 0  # muestras omitidas porque el muestreo iba atrasado
+        self._smart_sqe = smart_log_sqe()
+        self._feature_sqes = [get_features_sqe(fid) for fid in self.ring.features]
+        self._subscribers = []
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._failing = False
+        if callback is not None:
+            self.subscribe(callback)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def subscribe(self, callback):
+        """
+        Registra callback(device, timestamp, smart_log, feature_values) para cada muestra.
+        Se invoca desde el hilo del monitor: debe ser rapido y no bloquear.
+        """
+        self._subscribers = self._subscribers + [callback]
+
+    def unsubscribe(self, callback):
+        self._subscribers = [subscriber for subscriber in self._subscribers if subscriber is not callback]
+
+    def start(self):
+        if self.running:
+            return self
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=f"smart-monitor-{self.device}", daemon=True)
+        self._thread.start()
+        self.logger.info(f"SMART monitor started on {self.device} (interval={self.interval}s)")
+        return self
+
+    def stop(self, timeout=STOP_TIMEOUT):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.logger.info(f"SMART monitor stopped on {self.device}: {self.ring.count} sample(s), "
+                         f"{self.errors} error(s), {self.missed} missed")
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def latest(self):
+        """Ultima muestra como SmartLog, None si aun no hay muestras."""
+        return self.ring.latest()[1]
+
+    def stats(self, field, window=None):
+        """Ver SampleRing.stats."""
+        return self.ring.stats(field, window)
+
+    def _submit(self, sqe, data_len=None):
+        cqe = self.transport.submit(self.device, sqe, data_len=data_len, read=data_len is not None)
+        if cqe is None or cqe.status_code_type or cqe.status_code:
+            return None
+        return cqe
+
+    def sample(self):
+        """
+        Toma una muestra de forma sincrona.
+
+        Returns:
+            bool: True si se guardo la muestra
+        """
+        try:
+            cqe = self._submit(self._smart_sqe, SMART_LOG_SIZE)
+            if cqe is None or len(cqe.data_buffer) < SMART_LOG_SIZE:
+                raise RuntimeError("SMART log page not returned")
+            feature_values = None
+            if self._feature_sqes:
+                feature_values = []
+                for sqe in self._feature_sqes:
+                    feature_cqe = self._submit(sqe)
+                    feature_values.append(np.nan if feature_cqe is None else feature_cqe.dw0)
+        except Exception as e:
+            self.errors += 1
+            if not self._failing:
+                # Solo se registra el primer error de cada racha para no inundar el log
+                self.logger.warning(f"SMART monitor sample failed on {self.device}: {e}")
+                self._failing = True
+            return False
+
+        if self._failing:
+            self.logger.info(f"SMART monitor recovered on {self.device}")
+            self._failing = False
+        timestamp = time.time()
+        self.ring.push(cqe.data_buffer, timestamp, feature_values)
+        if self._subscribers:
+            smart = SmartLog(cqe.data_buffer)
+            for callback in self._subscribers:
+                try:
+                    callback(self.device, timestamp, smart, feature_values)
+                except Exception as e:
+                    self.logger.error(f"SMART monitor subscriber failed on {self.device}: {e}")
+        return True
+
+    def _run(self):
+        next_sample = time.monotonic()
+        while not self._stop_event.is_set():
+            self.sample()
+            next_sample += self.interval
+            now = time.monotonic()
+            if now > next_sample:
+                # Atrasado: se descartan los slots perdidos en vez de muestrear en rafaga
+                skipped = int((now - next_sample) // self.interval) + 1
+                self.missed += skipped
+                next_sample += skipped * self.interval
+            self._stop_event.wait(next_sample - now)
+
+
+def monitor_devices(logger, devices, **kwargs):
+    """
+    Arranca un SmartMonitor por dispositivo.
+
+    Args:
+        logger (TestLogger): Logger compartido
+        devices (list): Rutas de los dispositivos
+        **kwargs: Argumentos de SmartMonitor (interval, capacity, features, callback, transport)
+
+    Returns:
+        dict: {device: SmartMonitor}
+    """
+    return {device: SmartMonitor(logger, device, **kwargs).start() for device in devices}
@@ -1,20 +1,56 @@
-import subprocess
 import json
+import locale
+import os
+import time
 from datetime import datetime
 
 from .logger import TestLogger
+from .transport import default_transport
+from .latency import default_recorder
+from .admin_passthru_wrappper import LATENCY_PATTERN, nvme_cli_path
+from .results_db import SNAPSHOT_ID_CTRL, SNAPSHOT_ID_NS, SNAPSHOT_SMART
+from .identify_cache import CACHEABLE_COMMANDS, INVALIDATING_COMMANDS, INVALIDATING_OPCODES, controller_cache
+from .launcher import default_launcher
+from .log_page import (LogPageReader, LOG_PAGES, NSID_ALL, DEFAULT_WORKERS, ERROR_ENTRY_SIZE, LID_ERROR,
+                       LID_FIRMWARE_SLOT, LID_CHANGED_NS, LID_EFFECTS, LID_ENDURANCE_GROUP, LID_PREDICTABLE_LATENCY,
+                       LID_SANITIZE)
+from .command_schema import NVME_COMMANDS, LOG_SCHEMA, GENERAL_SCHEMA, NAMESPACE_CONFIG_SCHEMA
 
 
 NVME = "nvme"
+# Subcomandos cuya salida se guarda como snapshot en la base de resultados (ver src/results_db.py)
+SNAPSHOT_COMMANDS = {
+    "id-ctrl": SNAPSHOT_ID_CTRL,
+    "id-ns": SNAPSHOT_ID_NS,
+    "smart-log": SNAPSHOT_SMART,
+}
+# Opciones de read/write que DirectIOEngine puede atender sin nvme-cli
+DIRECT_IO_OPTIONS = frozenset({"namespace_id", "start_block", "block_count", "data_size", "data", "force",
+                               "timeout", "json_output", "verbose"})
 
 
 class NvmeCommands():
-    def __init__(self, logger, device="/dev/nvme0", nvme_cli=NVME):
+    def __init__(self, logger, device="/dev/nvme0", nvme_cli=None, transport=None, identify_cache=True,
+                 identify_ttl=None, launcher=None):
         if logger is None:
             raise ValueError("You require logger instance object from logger.py Class")
         self.logger = logger
         self.device = device
-        self.nvme_cli = nvme_cli
+        # None: binario de la variable NVME_CLI (p.ej. el emulador de src/emulator.py) o "nvme"
+        self.nvme_cli = nvme_cli or nvme_cli_path()
+        # Transporte para comandos passthru (ver src/transport.py); None usa el transporte por defecto
+        self.transport = transport
+        # Motores de I/O directo por nodo de namespace (ver src/io_engine.py)
+        self._io_engines = {}
+        # Ejecucion en curso de src/results_db.py (la asigna TestManager); None = no se registra
+        self.results = None
+        # Cache de id-ctrl / id-ns / list-ns por controlador (ver src/identify_cache.py)
+        self.identify_cache = identify_cache
+        # Segundos de validez de una entrada (None = hasta la proxima invalidacion)
+        self.identify_ttl = identify_ttl
+        # Lanzador de nvme-cli (ver src/launcher.py); tiempos del ultimo comando en last_launch
+        self.launcher = launcher or default_launcher()
+        self.last_launch = None
         self.logger.info(f"NvmeCommands initialized (device={self.device}, nvme_cli={self.nvme_cli})")
 
 
@@ -23,26 +59,197 @@ class NvmeCommands():
             command = " ".join(cmd)
         else:
             command = str(cmd)
-        self.logger.info(f"Executing command: {command}")
+        self.logger.info("Executing command: %s", command)
+        start = time.perf_counter()
+        launch = self.last_launch = self.launcher.run(cmd)
+        elapsed = time.perf_counter() - start
+        encoding = locale.getpreferredencoding(False)
+        stdout = launch.stdout.decode(encoding, errors="replace")
+        stderr = launch.stderr.decode(encoding, errors="replace")
+        self.logger.debug("Launch timing: spawn %.1fus, read %.1fus, wait %.1fus", launch.spawn_time * 1e6,
+                          launch.read_time * 1e6, launch.wait_time * 1e6)
+        if launch.returncode != 0:
+            self._log_command_failure(cmd, command, launch.returncode, stdout, stderr)
+            return None
+        self._record_latency(cmd, elapsed, stdout, stderr)
+        return stdout
+
+    def _log_command_failure(self, cmd, command, returncode, stdout, stderr):
+        """
+        Detalle completo de un comando fallido. Se registra como WARNING para que el modo limitado
+        de TestLogger nunca lo descarte (aunque la linea "Executing command" si lo haya sido).
+        """
+        self.logger.warning("Error found during execution: %s", command)
+        self.logger.warning("Return Code: %s", returncode)
+        self.logger.warning("STDout: %s", stdout)
+        self.logger.warning("STDError: %s", stderr)
+        self.logger.count(self._command_key(cmd), ok=False)
+        if self.results is not None:
+            self.results.step(self._command_key(cmd), None, ok=False)
+
+    @staticmethod
+    def _command_key(cmd):
+        """Clave 'cli:<subcomando>' de un comando nvme-cli."""
+        parts = cmd if isinstance(cmd, (list, tuple)) else str(cmd).split()
+        return f"cli:{parts[1]}" if len(parts) > 1 else "cli"
+
+    def _record_latency(self, cmd, elapsed, stdout=None, stderr=None):
+        """
+        Registra la latencia de un comando nvme-cli en el recorder de src/latency.py, con clave
+        'cli:<subcomando>'. Si la salida incluye la linea de --latency tambien se registra.
+
+        Args:
+            cmd (list/str): Comando ejecutado
+            elapsed (float): Tiempo medido por el host en segundos
+            stdout, stderr (str): Salida del comando
+        """
+        parts = cmd if isinstance(cmd, (list, tuple)) else str(cmd).split()
+        if len(parts) < 2:
+            return
+        cli_us = None
+        for output in (stderr, stdout):
+            match = LATENCY_PATTERN.search(output) if output else None
+            if match:
+                cli_us = int(match.group(1))
+                break
+        default_recorder().record(self.device, f"cli:{parts[1]}", host_us=elapsed * 1e6, cli_us=cli_us)
+        self.logger.count(f"cli:{parts[1]}", latency_us=elapsed * 1e6)
+        if self.results is not None:
+            self.results.step(f"cli:{parts[1]}", elapsed)
+            kind = SNAPSHOT_COMMANDS.get(parts[1])
+            if kind is not None and stdout:
+                label = None
+                if "-n" in parts[:-1]:
+                    label = f"nsid={parts[parts.index('-n') + 1]}"
+                self.results.snapshot(kind, stdout, label)
+
+    def record_snapshot(self, kind, payload, label=None):
+        """
+        Guarda un snapshot en la ejecucion en curso (p.ej. la pagina SMART cruda de un passthru).
+
+        Args:
+            kind (str): SNAPSHOT_SMART, SNAPSHOT_ID_NS, SNAPSHOT_ID_CTRL (src/results_db.py)
+            payload (bytes/str/dict): Datos del snapshot
+            label (str): Etiqueta libre ("initial", "final"...)
+        """
+        if self.results is not None:
+            self.results.snapshot(kind, payload, label)
+
+    def _execute(self, cmd, json_output=False, label=None):
+        """
+        Ejecuta el comando construido por un metodo del wrapper y procesa su salida.
+        Las subclases (p.ej. AsyncNvmeCommands) lo sobrescriben para cambiar la forma de ejecucion
+        sin duplicar la construccion de los comandos.
+
+        Args:
+            cmd (list): Comando nvme-cli completo
+            json_output (bool): Decodificar la salida como JSON
+            label (str): Nombre del comando; si se indica, un JSON invalido solo genera un warning
+
+        Returns:
+            str/dict: Salida del comando, None si falla
+        """
+        cache, key, generation, output = self._cache_lookup(cmd)
+        if output is None:
+            output = self.run_command(cmd)
+            self._cache_update(cmd, cache, key, generation, output)
+        return self._parse_output(output, json_output, label)
+
+    def _cache_lookup(self, cmd):
+        """
+        Busca la salida de un comando de identificacion en el cache del controlador.
+
+        Returns:
+            tuple: (cache, clave, generacion, salida cacheada o None); cache None si no aplica
+        """
+        parts = cmd if isinstance(cmd, (list, tuple)) else str(cmd).split()
+        if not self.identify_cache or len(parts) < 3 or parts[1] not in CACHEABLE_COMMANDS:
+            return None, None, None, None
+        cache = controller_cache(self.device)
+        # id-ns depende del nodo (nvme0n1 implica el NSID 1); id-ctrl y list-ns son del controlador
+        node = str(parts[2]) if parts[1] == "id-ns" else None
+        key = (parts[1], node, tuple(str(part) for part in parts[3:]))
+        output, generation = cache.get(key, self.identify_ttl)
+        if output is not None:
+            self.logger.debug("Identify cache hit: %s %s", parts[1], " ".join(key[2]))
+        return cache, key, generation, output
+
+    def _cache_update(self, cmd, cache, key, generation, output):
+        """Guarda la salida de un identify o invalida el cache tras un comando que cambia el estado."""
+        if cache is not None:
+            if output is not None:
+                cache.put(key, output, generation)
+            return
+        parts = cmd if isinstance(cmd, (list, tuple)) else str(cmd).split()
+        if len(parts) > 1 and parts[1] in INVALIDATING_COMMANDS:
+            # Tambien si fallo: el comando pudo aplicarse parcialmente
+            self.invalidate_identify_cache()
+
+    def invalidate_identify_cache(self):
+        """Descarta los identify cacheados del controlador (p.ej. tras cambiarlo por otra via)."""
+        controller_cache(self.device).invalidate()
+
+    def identify_cache_stats(self):
+        """
+        Returns:
+            dict: hits, misses, invalidations, entries del cache del controlador
+        """
+        return controller_cache(self.device).stats()
+
+    def close(self):
+        """Cierra los motores de I/O directo abiertos (se vuelven a abrir si se usan de nuevo)."""
+        engines, self._io_engines = self._io_engines, {}
+        for path, engine in engines.items():
+            try:
+                engine.close()
+            except OSError as e:
+                self.logger.warning(f"Could not close direct I/O engine for {path}: {e}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _parse_output(self, output, json_output=False, label=None):
+        if not json_output or not output:
+            return output
+        if label is None:
+            return json.loads(output)
+        try:
+            return json.loads(output)
+        except json.JSONDecodeError:
+            self.logger.warning(f"Failed to parse JSON output from {label} command")
+            return output
+
+    def passthru(self, sqe, data_len=None, read=False, write=False, io=False):
+        """
+        Envia un SubmissionQueueEntry al dispositivo por el transporte configurado,
+        sin pasar por la salida de texto de nvme-cli cuando hay transporte nativo.
+
+        Args:
+            sqe (SubmissionQueueEntry): Comando a enviar
+            data_len (int): Tamano del buffer de datos en bytes
+            read (bool): Transferencia dispositivo -> host
+            write (bool): Transferencia host -> dispositivo (usa sqe.data_buffer)
+            io (bool): True para comandos de I/O (NVM), False para admin
+
+        Returns:
+            CompletionQueueEntry: Resultado del comando, None si falla el transporte
+        """
+        if self.transport is None:
+            self.transport = default_transport()
         try:
-            run_cmd = subprocess.run(cmd, capture_output=True, text=True, check=True)
-            return run_cmd.stdout
-        except subprocess.CalledProcessError as e:
-            self.logger.info(f"Error found during execution")
-            self.logger.info(f"Return Code: {e.returncode}")
-            self.logger.info(f"STDout: {e.stdout}")
-            self.logger.info(f"STDError: {e.stderr}")
+            return self.transport.submit(self.device, sqe, data_len=data_len, read=read, write=write, io=io)
+        except Exception as e:
+            self.logger.error(f"Passthru command opcode={sqe.OPC} failed on {self.device}: {e}")
             return None
+        finally:
+            if not io and sqe.OPC in INVALIDATING_OPCODES:
+                self.invalidate_identify_cache()
 
     def parametrizeOpcionsLogs(self, verbose=False, json_output=False, binary_raw=False):
-        options = []
-        if verbose:
-            options.append("-v")
-        if json_output:
-            options.append("--output-format=json")
-        if binary_raw:
-            options.append("-b")
-        return options
+        return LOG_SCHEMA.arguments(verbose=verbose, json_output=json_output, binary_raw=binary_raw)
     
     """Ejemplo de como se llamaria una funcion #Crear namespace con configuración completa
     nvme.create_ns(
@@ -57,170 +264,130 @@ class NvmeCommands():
     verbose=True         # Verbose output
     #)  """      
 
-    def parametrizeOpcionsConfig(self, nsze=None, ncap=None, flbas=None, dps=None, nmic=None, 
-                                anagrp_id=None, nvmset_id=None, endg_id=None, csi=None, 
-                                lbstm=None, nphndls=None, block_size=None, timeout=None,
-                                nsze_si=None, ncap_si=None, azr=False, rar=None, ror=None,
-                                rnumzrwa=None, phndls=None):
-        options = []
-        
-        # Namespace Size (nsze) - número de bloques lógicos
-        if nsze is not None:
-            options.extend(["--nsze", str(nsze)])
-        
-        # Namespace Capacity (ncap) - capacidad del namespace
-        if ncap is not None:
-            options.extend(["--ncap", str(ncap)])
-        
-        # Formatted LBA Size (flbas) - tamaño del bloque lógico formateado
-        if flbas is not None:
-            options.extend(["--flbas", str(flbas)])
-        
-        # Data Protection Settings (dps) - configuración de protección de datos
-        if dps is not None:
-            options.extend(["--dps", str(dps)])
-        
-        # Namespace Multi-path I/O and Namespace Sharing (nmic) 
-        if nmic is not None:
-            options.extend(["--nmic", str(nmic)])
-        
-        # ANA Group Identifier (anagrp-id) - identificador del grupo ANA
-        if anagrp_id is not None:
-            options.extend(["--anagrp-id", str(anagrp_id)])
-        
-        # NVM Set Identifier (nvmset-id) - identificador del conjunto NVM
-        if nvmset_id is not None:
-            options.extend(["--nvmset-id", str(nvmset_id)])
-        
-        # Endurance Group Identifier (endg-id) - identificador del grupo de resistencia
-        if endg_id is not None:
-            options.extend(["--endg-id", str(endg_id)])
-        
-        # Command Set Identifier (csi) - identificador del conjunto de comandos
-        if csi is not None:
-            options.extend(["--csi", str(csi)])
-        
-        # Logical Block Storage Tag Mask (lbstm) - máscara de etiqueta de almacenamiento
-        if lbstm is not None:
-            options.extend(["--lbstm", str(lbstm)])
-        
-        # Number of Placement Handles (nphndls) - número de manejadores de ubicación
-        if nphndls is not None:
-            options.extend(["--nphndls", str(nphndls)])
-        
-        # Block Size (block-size) - tamaño del bloque
-        if block_size is not None:
-            options.extend(["--block-size", str(block_size)])
-        
-        # Timeout (timeout) - tiempo límite
-        if timeout is not None:
-            options.extend(["--timeout", str(timeout)])
-        
-        # Namespace Size SI (nsze-si) - tamaño del namespace en unidades SI
-        if nsze_si is not None:
-            options.extend(["--nsze-si", str(nsze_si)])
-        
-        # Namespace Capacity SI (ncap-si) - capacidad del namespace en unidades SI
-        if ncap_si is not None:
-            options.extend(["--ncap-si", str(ncap_si)])
-        
-        # Allocate Zoned Random Write Area (azr) - asignar área de escritura aleatoria zonificada
-        if azr:
-            options.extend("--azr")
-        
-        # Random Area Requested (rar) - área aleatoria solicitada
-        if rar is not None:
-            options.extend(["--rar", str(rar)])
-        
-        # Random Optimal Requested (ror) - óptimo aleatorio solicitado
-        if ror is not None:
-            options.extend(["--ror", str(ror)])
-        
-        # Random Number Zoned Random Write Area (rnumzrwa) - número aleatorio de área de escritura aleatoria zonificada
-        if rnumzrwa is not None:
-            options.extend(["--rnumzrwa", str(rnumzrwa)])
-        
-        # Placement Handles (phndls) - manejadores de ubicación
-        if phndls is not None:
-            options.extend(["--phndls", str(phndls)])
+    def parametrizeOpcionsConfig(self, **kwargs):
+        """Opciones de create-ns (nsze, ncap, flbas, dps, ...; ver NAMESPACE_CONFIG_OPTIONS)."""
+        return NAMESPACE_CONFIG_SCHEMA.arguments(**kwargs)
+
+    # --- Construccion de comandos (ver src/command_schema.py) ---
+    def _build(self, subcommand, device=None, **options):
+        """argv de un subcomando con las opciones validadas y sin las que valen el default."""
+        return NVME_COMMANDS[subcommand].build(self.nvme_cli, device or self.device, **options)
 
-        return options
+    def _controller_device(self):
+        """Nodo del controlador: los comandos de gestion de namespaces no pueden usar un nodo que borran."""
+        from .readiness import controller_name
+        controller = controller_name(self.device)
+        if controller is None:
+            return self.device
+        return os.path.join(os.path.dirname(self.device), controller)
+
+    def prepare(self, subcommand, **fixed):
+        """
+        Comando con opciones fijas ya validadas y formateadas, para lazos que repiten la misma forma.
+
+        Ejemplo:
+            prepared = nvme.prepare("write", namespace_id=1, data_size=4096, data=path, force=True)
+            for lba in range(1000):
+                nvme.execute(prepared, start_block=lba, block_count=0)
+
+        Returns:
+            PreparedCommand: Ver src/command_schema.py
+        """
+        return NVME_COMMANDS[subcommand].prepare(self.nvme_cli, self.device, **fixed)
+
+    def execute(self, prepared, **values):
+        """Ejecuta un comando de prepare() con las opciones variables de esta llamada."""
+        json_output = bool(values.get('json_output') or prepared.fixed.get('json_output'))
+        return self._execute(prepared.argv(**values), json_output, label=prepared.subcommand)
    # --- Comandos de logs y diagnóstico ---
     def command_list(self, **kwargs):
-        cmd = [
-            self.nvme_cli,
-            "list",
-            self.device
-        ]
-        options = self.parametrizeOpcionsLogs(**kwargs)
-        cmd.extend(options)
-        
-        output = self.run_command(cmd)
-        if kwargs.get('json_output', False) and output:
-            output = json.loads(output)
-        return output
+        return self._execute(self._build("list", **kwargs), kwargs.get('json_output', False))
     
     def smart_log(self, **kwargs):
-        cmd = [
-            self.nvme_cli,
-            "smart_log",
-            self.device
-        ]
-        options = self.parametrizeOpcionsLogs(**kwargs)
-        cmd.extend(options)
-        
-        output = self.run_command(cmd)
-        
-        if kwargs.get('json_output', False) and output:
-            output = json.loads(output)
-        return output
-
+        return self._execute(self._build("smart-log", **kwargs), kwargs.get('json_output', False))
 
     def idctrol(self, **kwargs):
-        cmd = [
-            self.nvme_cli,
-            "id-ctrl",
-            self.device
-        ]
-        options = self.parametrizeOpcionsLogs(**kwargs)
-        cmd.extend(options)
-        
-        output = self.run_command(cmd)
-        
-        if kwargs.get('json_output', False) and output:
-            output = json.loads(output)
-        return output
+        return self._execute(self._build("id-ctrl", **kwargs), kwargs.get('json_output', False))
         
 
+    def get_log(self, lid, size, offset=0, nsid=NSID_ALL, lsp=0, lsi=0, rae=False, csi=0, uuid_index=0,
+                concurrent=None, out=None, max_workers=DEFAULT_WORKERS):
+        """
+        Get Log Page generico (estandar o de fabricante) de cualquier tamano; por encima de MDTS se
+        lee en tramos con Log Page Offset, en paralelo si el log lo admite (ver src/log_page.py).
+
+        Args:
+            lid (int): Log Identifier
+            size (int): Bytes a leer
+            offset (int): Log Page Offset inicial en bytes
+            nsid, lsp, lsi, rae, csi, uuid_index: Campos del comando
+            concurrent (bool): Tramos en paralelo; None = segun el LID
+            out (buffer): Destino escribible (p.ej. un mmap); None = bytearray nuevo
+            max_workers (int): Tramos simultaneos
+
+        Returns:
+            bytearray: Log page crudo, None si falla
+        """
+        reader = LogPageReader(self, max_workers=max_workers)
+        return reader.read(lid, size, offset, nsid=nsid, lsp=lsp, lsi=lsi, rae=rae, csi=csi, uuid_index=uuid_index,
+                           concurrent=concurrent, out=out)
+
+    def error_log(self, entries=None):
+        """Error Information (01h); por defecto todas las entradas que guarda el controlador (ELPE + 1)."""
+        if entries is None:
+            identify = self.idctrol(json_output=True)
+            entries = int(identify.get('elpe', 0)) + 1 if isinstance(identify, dict) else 1
+        return self.get_log(LID_ERROR, entries * ERROR_ENTRY_SIZE)
+
     def fw_log(self):
-        pass
-    def effects_log(self):
-        pass
-    def endurance_log(self):
-        pass
-    def predictable_lat_log(self):
-        pass
-    def telemetry_log(self):
-        pass
-    def changed_ns_list_log(self):
-        pass
-    def persistent_event_log(self):
-        pass
+        return self.get_log(LID_FIRMWARE_SLOT, LOG_PAGES["firmware-slot"].size)
+
+    def effects_log(self, csi=0):
+        return self.get_log(LID_EFFECTS, LOG_PAGES["effects"].size, csi=csi)
+
+    def endurance_log(self, endgid=1):
+        return self.get_log(LID_ENDURANCE_GROUP, LOG_PAGES["endurance-group"].size, lsi=endgid)
+
+    def predictable_lat_log(self, nvmset_id=1):
+        return self.get_log(LID_PREDICTABLE_LATENCY, LOG_PAGES["predictable-latency"].size, lsi=nvmset_id)
+
+    def telemetry_log(self, path, controller_initiated=False, data_area=3, create=True, resume=False,
+                      chunk_size=None):
+        """
+        Captura el log de telemetria en `path` por tramos de MDTS, sin cargarlo en memoria.
+
+        Args:
+            path (str): Archivo de salida
+            controller_initiated (bool): Log Controller-Initiated (08h) en lugar del Host-Initiated (07h)
+            data_area (int): Ultima data area a capturar (1-4)
+            create (bool): Host-Initiated: generar datos nuevos antes de leer
+            resume (bool): Continuar una captura interrumpida desde su checkpoint
+            chunk_size (int): Bytes por comando (None = MDTS)
+
+        Returns:
+            dict: Reporte de la captura (ver src/telemetry.py), None si falla
+        """
+        from .telemetry import TelemetryCapture
+        capture = TelemetryCapture(self, controller_initiated=controller_initiated, chunk_size=chunk_size)
+        return capture.capture(path, data_area=data_area, create=create, resume=resume)
+
+    def changed_ns_list_log(self, rae=False):
+        return self.get_log(LID_CHANGED_NS, LOG_PAGES["changed-ns"].size, rae=rae)
+
+    def persistent_event_log(self, size=None):
+        """Persistent Event Log (0Dh) completo o hasta `size` bytes (establece y libera el contexto)."""
+        return LogPageReader(self).read_persistent_event(size)
+
     def sanitize_log(self):
-        pass
-    def get_log(self):
-        pass
+        return self.get_log(LID_SANITIZE, LOG_PAGES["sanitize"].size)
 
     # --- Comandos de I/O y testing ---
-    def read(self, start_block=None, block_count=None, data_size=None, metadata_size=None, 
-             ref_tag=None, data=None, metadata=None, prinfo=None, app_tag_mask=None, 
-             app_tag=None, limited_retry=False, force_unit_access=False, dir_type=None, 
-             dir_spec=None, dsm=None, show_command=False, dry_run=False, latency=False, 
-             storage_tag=None, storage_tag_check=False, force=False, timeout=None, **kwargs):
+    def read(self, direct_io=False, **options):
         """
         Ejecuta comando NVMe read con los parámetros especificados.
         
         Args:
+            namespace_id: ID del namespace
             start_block: Bloque lógico de inicio (SLBA)
             block_count: Número de bloques lógicos (NLB)
             data_size: Tamaño de datos
@@ -243,221 +410,100 @@ class NvmeCommands():
             storage_tag_check: Verificación de etiqueta de almacenamiento
             force: Forzar operación
             timeout: Tiempo de espera
-            **kwargs: Opciones adicionales (json_output, verbose)
+            direct_io: Ejecutar con DirectIOEngine (sin nvme-cli) si no se piden campos NVMe especiales
+            json_output, verbose, binary_raw: Opciones de salida
         """
-        cmd = [
-            self.nvme_cli,
-            "read",
-            self.device
-        ]
-        
-        # Parámetros básicos
-        if start_block is not None:
-            cmd.extend(["--start-block", str(start_block)])
-            
-        if block_count is not None:
-            cmd.extend(["--block-count", str(block_count)])
-            
-        if data_size is not None:
-            cmd.extend(["--data-size", str(data_size)])
-            
-        if metadata_size is not None:
-            cmd.extend(["--metadata-size", str(metadata_size)])
-            
-        if ref_tag is not None:
-            cmd.extend(["--ref-tag", str(ref_tag)])
-            
-        if data is not None:
-            cmd.extend(["--data", str(data)])
-            
-        if metadata is not None:
-            cmd.extend(["--metadata", str(metadata)])
-            
-        if prinfo is not None:
-            cmd.extend(["--prinfo", str(prinfo)])
-            
-        if app_tag_mask is not None:
-            cmd.extend(["--app-tag-mask", str(app_tag_mask)])
-            
-        if app_tag is not None:
-            cmd.extend(["--app-tag", str(app_tag)])
-            
-        # Flags booleanos
-        if limited_retry:
-            cmd.append("--limited-retry")
-            
-        if force_unit_access:
-            cmd.append("--force-unit-access")
-            
-        if dir_type is not None:
-            cmd.extend(["--dir-type", str(dir_type)])
-            
-        if dir_spec is not None:
-            cmd.extend(["--dir-spec", str(dir_spec)])
-            
-        if dsm is not None:
-            cmd.extend(["--dsm", str(dsm)])
-            
-        if show_command:
-            cmd.append("--show-command")
-            
-        if dry_run:
-            cmd.append("--dry-run")
-            
-        if latency:
-            cmd.append("--latency")
-            
-        if storage_tag is not None:
-            cmd.extend(["--storage-tag", str(storage_tag)])
-            
-        if storage_tag_check:
-            cmd.append("--storage-tag-check")
-            
-        if force:
-            cmd.append("--force")
-            
-        if timeout is not None:
-            cmd.extend(["--timeout", str(timeout)])
+        return self._io("read", direct_io, options)
         
-        # Agregar opciones de logging
-        log_options = self.parametrizeOpcionsLogs(**kwargs)
-        cmd.extend(log_options)
-        
-        output = self.run_command(cmd)
-        
-        if kwargs.get('json_output', False) and output:
-            try:
-                output = json.loads(output)
-            except json.JSONDecodeError:
-                self.logger.warning("Failed to parse JSON output from read command")
-                
-        return output
-        
-    def write(self, namespace_id=None, start_block=None, block_count=None, data_size=None, metadata_size=None, 
-              ref_tag=None, data=None, metadata=None, prinfo=None, app_tag_mask=None, 
-              app_tag=None, limited_retry=False, force_unit_access=False, dir_type=None, 
-              dir_spec=None, dsm=None, show_command=False, dry_run=False, latency=False, 
-              storage_tag=None, storage_tag_check=False, force=False, timeout=None, **kwargs):
+    def write(self, direct_io=False, **options):
         """
         Ejecuta comando NVMe write con los parámetros especificados.
         
         Args:
-            namespace_id: ID del namespace
-            start_block: Bloque lógico de inicio (SLBA)
-            block_count: Número de bloques lógicos (NLB)
-            data_size: Tamaño de datos
-            metadata_size: Tamaño de metadatos
-            ref_tag: Etiqueta de referencia
-            data: Archivo de datos
-            metadata: Archivo de metadatos
-            prinfo: Información de protección
-            app_tag_mask: Máscara de etiqueta de aplicación
-            app_tag: Etiqueta de aplicación
-            limited_retry: Retry limitado
-            force_unit_access: Forzar acceso a unidad
-            dir_type: Tipo de directiva
-            dir_spec: Especificación de directiva
-            dsm: Dataset Management
-            show_command: Mostrar comando
-            dry_run: Ejecución en seco
-            latency: Mostrar latencia
-            storage_tag: Etiqueta de almacenamiento
-            storage_tag_check: Verificación de etiqueta de almacenamiento
-            force: Forzar operación
-            timeout: Tiempo de espera
-            **kwargs: Opciones adicionales (json_output, verbose)
+            Mismas opciones que read(); data es el archivo de origen
         """
-        cmd = [
-            self.nvme_cli,
-            "write",
-            self.device
-        ]
-        
-        # Namespace ID parameter
-        if namespace_id is not None:
-            cmd.extend(["--namespace-id", str(namespace_id)])
-        
-        # Parámetros básicos
-        if start_block is not None:
-            cmd.extend(["--start-block", str(start_block)])
-            
-        if block_count is not None:
-            cmd.extend(["--block-count", str(block_count)])
-            
-        if data_size is not None:
-            cmd.extend(["--data-size", str(data_size)])
-            
-        if metadata_size is not None:
-            cmd.extend(["--metadata-size", str(metadata_size)])
-            
-        if ref_tag is not None:
-            cmd.extend(["--ref-tag", str(ref_tag)])
-            
-        if data is not None:
-            cmd.extend(["--data", str(data)])
-            
-        if metadata is not None:
-            cmd.extend(["--metadata", str(metadata)])
-            
-        if prinfo is not None:
-            cmd.extend(["--prinfo", str(prinfo)])
-            
-        if app_tag_mask is not None:
-            cmd.extend(["--app-tag-mask", str(app_tag_mask)])
-            
-        if app_tag is not None:
-            cmd.extend(["--app-tag", str(app_tag)])
-            
-        # Flags booleanos
-        if limited_retry:
-            cmd.append("--limited-retry")
-            
-        if force_unit_access:
-            cmd.append("--force-unit-access")
-            
-        if dir_type is not None:
-            cmd.extend(["--dir-type", str(dir_type)])
-            
-        if dir_spec is not None:
-            cmd.extend(["--dir-spec", str(dir_spec)])
-            
-        if dsm is not None:
-            cmd.extend(["--dsm", str(dsm)])
-            
-        if show_command:
-            cmd.append("--show-command")
-            
-        if dry_run:
-            cmd.append("--dry-run")
-            
-        if latency:
-            cmd.append("--latency")
-            
-        if storage_tag is not None:
-            cmd.extend(["--storage-tag", str(storage_tag)])
-            
-        if storage_tag_check:
-            cmd.append("--storage-tag-check")
-            
-        if force:
-            cmd.append("--force")
-            
-        if timeout is not None:
-            cmd.extend(["--timeout", str(timeout)])
-        
-        # Agregar opciones de logging
-        log_options = self.parametrizeOpcionsLogs(**kwargs)
-        cmd.extend(log_options)
-        
-        output = self.run_command(cmd)
-        
-        if kwargs.get('json_output', False) and output:
-            try:
-                output = json.loads(output)
-            except json.JSONDecodeError:
-                self.logger.warning("Failed to parse JSON output from write command")
-                
-        return output
+        return self._io("write", direct_io, options)
+
+    def _io(self, op, direct_io, options):
+        if direct_io:
+            if self._direct_io_supported(options):
+                return self._direct_io(op, options.get('namespace_id'), options.get('start_block'),
+                                       options.get('block_count'), options.get('data_size'), options.get('data'))
+            self.logger.info(f"direct_io ignored: {op} requests NVMe-specific fields")
+        return self._execute(self._build(op, **options), options.get('json_output', False), label=op)
+
+    @staticmethod
+    def _direct_io_supported(options):
+        """True si ningun campo NVMe especial (PI, metadatos, directivas, flags) fue solicitado."""
+        return all(value is None or value is False for name, value in options.items()
+                   if name not in DIRECT_IO_OPTIONS)
+    def _namespace_path(self, namespace_id=None):
+        """Nodo de bloque del namespace ('/dev/nvme0' + NSID 1 -> '/dev/nvme0n1')."""
+        from .readiness import controller_name
+        name = os.path.basename(self.device)
+        controller = controller_name(self.device)
+        if controller is None or (namespace_id is None and name != controller):
+            # Namespace ya resuelto o archivo regular (pruebas sin drive)
+            return self.device
+        return os.path.join(os.path.dirname(self.device), f"{controller}n{namespace_id or 1}")
+
+    def _open_io_engine(self, path):
+        """DirectIOEngine del namespace; sobre un namespace emulado, el motor del emulador (cuenta en su SMART)."""
+        from .emulator import emulator_root, EmulatorIOEngine
+        from .io_engine import DirectIOEngine
+
+        if emulator_root(path) is not None:
+            return EmulatorIOEngine(path)
+        return DirectIOEngine(path, logger=self.logger)
+
+    def _direct_io(self, op, namespace_id=None, start_block=None, block_count=None, data_size=None, data=None):
+        """
+        read/write sobre DirectIOEngine con la semantica de nvme-cli: block_count en base cero,
+        data_size en bytes y data como archivo de origen/destino.
+
+        Returns:
+            str/bytes: "" si se uso archivo de datos, bytes leidos si no; None si falla
+        """
+        path = self._namespace_path(namespace_id)
+        try:
+            engine = self._io_engines.get(path)
+            if engine is None:
+                engine = self._open_io_engine(path)
+                self._io_engines[path] = engine
+            lba_size = engine.lba_size
+            length = data_size if data_size is not None else ((block_count or 0) + 1) * lba_size
+            length = -(-length // lba_size) * lba_size
+            offset = (start_block or 0) * lba_size
+            self.logger.info("Direct I/O %s: %s offset=%d length=%d", op, path, offset, length)
+
+            if op == "read":
+                start = time.perf_counter()
+                payload = engine.read(offset, length)
+                elapsed_us = (time.perf_counter() - start) * 1e6
+                default_recorder().record(path, "io:read", host_us=elapsed_us)
+                self.logger.count("io:read", latency_us=elapsed_us)
+                if data is None:
+                    return payload
+                with open(data, "wb") as f:
+                    f.write(payload)
+                return ""
+
+            payload = b""
+            if data is not None:
+                with open(data, "rb") as f:
+                    payload = f.read(length)
+            payload = payload.ljust(length, b"\x00")
+            start = time.perf_counter()
+            engine.write(offset, payload)
+            elapsed_us = (time.perf_counter() - start) * 1e6
+            default_recorder().record(path, "io:write", host_us=elapsed_us)
+            self.logger.count("io:write", latency_us=elapsed_us)
+            return ""
+        except (OSError, ValueError) as e:
+            self.logger.error(f"Direct I/O {op} failed on {path}: {e}")
+            self.logger.count(f"io:{op}", ok=False)
+            return None
+
     def write_zeros(self):
         pass
     def write_uncor(self):
@@ -475,180 +521,77 @@ class NvmeCommands():
 
     
     def parametrizeOpcionesConfigGeneral(self, nsid=None, controllers=None, json_output=None, verbose=None ):
-        options = []
-        
-        # Agregar opciones de configuración según los argumentos
-        if nsid is not None:
-            options.extend(["-n", str(nsid)])  # Use extend instead of append
-        if controllers is not None:
-            options.extend(["-c", str(controllers)])  # Use extend instead of append
-        if json_output:
-            options.append("--output-format=json")
-        if verbose:
-              options.append("-v")
-     
-        
-        return options
+        return GENERAL_SCHEMA.arguments(nsid=nsid, controllers=controllers, json_output=json_output,
+                                        verbose=verbose)
 
     # --- Comandos de configuración ---
     def id_ns(self,**kwargs):
-        cmd = [
-            self.nvme_cli,
-            "id-ns",
-            self.device
-        ]
-        
-        # Agregar opciones de configuración usando la función parametrize
-        config_options = self.parametrizeOpcionesConfigGeneral(**kwargs)
-        cmd.extend(config_options)
-        
-        output = self.run_command(cmd)
-        
-        if kwargs.get('json_output', False) and output:
-            output = json.loads(output)
-            
-        return output
+        return self._execute(self._build("id-ns", **kwargs), kwargs.get('json_output', False))
+
+    def list_ns(self, **kwargs):
+        """
+        Lista de namespaces activos del controlador (nvme list-ns).
+
+        Args:
+            **kwargs: nsid (primer NSID a listar), all_namespaces (incluir los no asociados),
+                      json_output, verbose
+        """
+        return self._execute(self._build("list-ns", **kwargs), kwargs.get('json_output', False))
+    def lba_formats(self, nsid=None):
+        """
+        Formatos LBA de un namespace (del id-ns cacheado).
+
+        Returns:
+            dict: current (indice en uso), block_size, metadata_size, formats (lbafs), None si falla
+        """
+        return self._lba_formats(self.id_ns(nsid=nsid, json_output=True))
+
+    @staticmethod
+    def _lba_formats(identify):
+        if not isinstance(identify, dict):
+            return None
+        formats = identify.get('lbafs', [])
+        flbas = identify.get('flbas', 0)
+        # FLBAS bits 3:0 y 6:5 (NVMe 2.0: hasta 64 formatos)
+        current = (flbas & 0x0F) | ((flbas >> 1) & 0x30)
+        selected = formats[current] if current < len(formats) else {}
+        return {
+            'current': current,
+            'block_size': 1 << selected['ds'] if 'ds' in selected else None,
+            'metadata_size': selected.get('ms'),
+            'formats': formats,
+        }
+
     def set_feature(self,**kwargs ):
-        cmd = [
-            self.nvme_cli,
-            "set-feature",
-            self.device
-        ]
-        
-        # Agregar opciones de configuración usando la función parametrize
-        config_options = self.parametrizeOpcionesConfigGeneral(**kwargs)
-        cmd.extend(config_options)
-        
-        output = self.run_command(cmd)
-        
-        if kwargs.get('json_output', False) and output:
-            output = json.loads(output)
-            
-        return output
+        return self._execute(self._build("set-feature", **kwargs), kwargs.get('json_output', False))
+
     def get_property(self,**kwargs ):
-        cmd = [
-            self.nvme_cli,
-            "get-property",
-            self.device
-        ]
-        
-        # Agregar opciones de configuración usando la función parametrize
-        config_options = self.parametrizeOpcionesConfigGeneral(**kwargs)
-        cmd.extend(config_options)
-        
-        output = self.run_command(cmd)
-        
-        if kwargs.get('json_output', False) and output:
-            output = json.loads(output)
-            
-        return output
+        return self._execute(self._build("get-property", **kwargs), kwargs.get('json_output', False))
+
     def set_property(self,**kwargs):
-        cmd = [
-            self.nvme_cli,
-            "set-property",
-            self.device
-        ]
-        
-        # Agregar opciones de configuración usando la función parametrize
-        config_options = self.parametrizeOpcionesConfigGeneral(**kwargs)
-        cmd.extend(config_options)
-        
-        output = self.run_command(cmd)
-        
-        if kwargs.get('json_output', False) and output:
-            output = json.loads(output)
-            
-        return output
+        return self._execute(self._build("set-property", **kwargs), kwargs.get('json_output', False))
+
+    # Gestion de namespaces: siempre sobre el controlador (antes se enviaba a /dev/nvme0 fijo)
     def ns_attach(self, **kwargs):
-        cmd = [
-            self.nvme_cli,
-            "attach-ns",
-            "/dev/nvme0",  
-        ]
-        
-        # Agregar opciones de configuración usando la función parametrize
-        config_options = self.parametrizeOpcionesConfigGeneral(**kwargs)
-        cmd.extend(config_options)
-        
-        output = self.run_command(cmd)
-        
-        if kwargs.get('json_output', False) and output:
-            output = json.loads(output)
-            
-        return output
+        return self._execute(self._build("attach-ns", self._controller_device(), **kwargs),
+                             kwargs.get('json_output', False))
 
     def ns_detach(self, **kwargs):
-        cmd = [
-            self.nvme_cli,
-            "detach-ns",
-            self.device
-        ]
-        
-        # Agregar opciones de configuración usando la función parametrize
-        config_options = self.parametrizeOpcionesConfigGeneral(**kwargs)
-        cmd.extend(config_options)
-        
-        output = self.run_command(cmd)
-        
-        if kwargs.get('json_output', False) and output:
-            output = json.loads(output)
-            
-        return output
+        return self._execute(self._build("detach-ns", self._controller_device(), **kwargs),
+                             kwargs.get('json_output', False))
+
     def create_ns(self, **kwargs):
-        cmd = [
-            self.nvme_cli,
-            "create-ns",
-            "/dev/nvme0"
-        ]
-        
-        # Agregar opciones de configuración usando la función parametrize
-        config_options = self.parametrizeOpcionsConfig(**kwargs)
-        cmd.extend(config_options)
-        
-        output = self.run_command(cmd)
-        
-        if kwargs.get('json_output', False) and output:
-            output = json.loads(output)
-            
-        return output
+        return self._execute(self._build("create-ns", self._controller_device(), **kwargs),
+                             kwargs.get('json_output', False))
     
     def delete_ns(self, **kwargs ):
-        cmd = [
-            self.nvme_cli,
-            "delete-ns",
-            "/dev/nvme0"
-        ]
-        
-        # Agregar opciones de configuración usando la función parametrize
-        config_options = self.parametrizeOpcionesConfigGeneral(**kwargs)
-        cmd.extend(config_options)
-        
-        output = self.run_command(cmd)
-        
-        if kwargs.get('json_output', False) and output:
-            output = json.loads(output)
-            
-        return output
-    def ns_rescan(self,**kwargs):
-        cmd = [
-            self.nvme_cli,
-            "ns-rescan",
-            self.device
-        ]
-        
-        # Agregar opciones de configuración usando la función parametrize
-        config_options = self.parametrizeOpcionsConfig(**kwargs)
-        cmd.extend(config_options)
-        
-        output = self.run_command(cmd)
-        
-        if kwargs.get('json_output', False) and output:
-            output = json.loads(output)
-            
-        return output
+        return self._execute(self._build("delete-ns", self._controller_device(), **kwargs),
+                             kwargs.get('json_output', False))
+
+    def ns_rescan(self):
+        return self._execute(self._build("ns-rescan", self._controller_device()))
     
-    def format_ns(self, nsid=None, lbaf=None, block_size=None, ses=None, pil=None, 
-                  pi=None, ms=None, reset=False, force=False, timeout=None, **kwargs):
+    def format_ns(self, **options):
         """
         Ejecuta comando NVMe format con los parámetros especificados.
         
@@ -663,59 +606,55 @@ class NvmeCommands():
             reset: Reset flag
             force: Force flag
             timeout: Tiempo de espera
-            **kwargs: Opciones adicionales (json_output, verbose)
+            json_output, verbose, binary_raw: Opciones de salida
         """
-        cmd = [
-            self.nvme_cli,
-            "format",
-            self.device
-        ]
-        
-        # Parámetros básicos
-        if nsid is not None:
-            cmd.extend(["--namespace-id", str(nsid)])
-            
-        if lbaf is not None:
-            cmd.extend(["--lbaf", str(lbaf)])
-            
-        if block_size is not None:
-            cmd.extend(["--block-size", str(block_size)])
-            
-        if ses is not None:
-            cmd.extend(["--ses", str(ses)])
-            
-        if pil is not None:
-            cmd.extend(["--pil", str(pil)])
-            
-        if pi is not None:
-            cmd.extend(["--pi", str(pi)])
-            
-        if ms is not None:
-            cmd.extend(["--ms", str(ms)])
-            
-        # Flags booleanos
-        if reset:
-            cmd.append("--reset")
-            
-        if force:
-            cmd.append("--force")
-            
-        if timeout is not None:
-            cmd.extend(["--timeout", str(timeout)])
-        
-        # Agregar opciones de logging
-        log_options = self.parametrizeOpcionsLogs(**kwargs)
-        cmd.extend(log_options)
-        
-        output = self.run_command(cmd)
-        
-        if kwargs.get('json_output', False) and output:
-            try:
-                output = json.loads(output)
-            except json.JSONDecodeError:
-                self.logger.warning("Failed to parse JSON output from format command")
-                
-        return output
+        return self._execute(self._build("format", **options), options.get('json_output', False), label="format")
+    # --- Espera de estado del dispositivo (ver src/readiness.py) ---
+    def _wait(self, condition, timeout, description, wake=None):
+        from .readiness import wait_until
+        if self.transport is None:
+            self.transport = default_transport()
+        return wait_until(lambda: condition(self.transport, self.device), timeout,
+                          description=f"{description} on {self.device}", logger=self.logger, wake=wake)
+
+    def wait_namespace_ready(self, nsid=1, timeout=None, wake=None):
+        """
+        Espera a que el namespace este activo, visible en sysfs y con nodo de bloque.
+
+        Args:
+            nsid (int): Namespace ID
+            timeout (float): Deadline en segundos
+            wake (UeventListener): Listener abierto antes del attach para reaccionar al uevent
+
+        Returns:
+            str: Ruta del nodo de bloque del namespace, None si vencio el deadline
+        """
+        from .readiness import namespace_ready, DEFAULT_NAMESPACE_TIMEOUT
+        return self._wait(lambda transport, device: namespace_ready(transport, device, nsid),
+                          timeout or DEFAULT_NAMESPACE_TIMEOUT, f"namespace {nsid}", wake)
+
+    def wait_namespaces_deleted(self, nsid=0xFFFFFFFF, timeout=None, wake=None):
+        """
+        Espera a que el namespace (o todos, con 0xFFFFFFFF) desaparezca de la lista activa y de sysfs.
+
+        Returns:
+            bool: True si se completo, None si vencio el deadline
+        """
+        from .readiness import namespaces_deleted, DEFAULT_NAMESPACE_TIMEOUT
+        return self._wait(lambda transport, device: namespaces_deleted(transport, device, nsid),
+                          timeout or DEFAULT_NAMESPACE_TIMEOUT, f"deletion of namespace {nsid:#x}", wake)
+
+    def wait_format_complete(self, nsid=1, block_size=None, timeout=None, wake=None):
+        """
+        Espera a que termine el format (FPI en 0) con el tamano de bloque esperado.
+
+        Returns:
+            bool: True si se completo, None si vencio el deadline
+        """
+        from .readiness import format_complete, DEFAULT_FORMAT_TIMEOUT
+        return self._wait(lambda transport, device: format_complete(transport, device, nsid, block_size),
+                          timeout or DEFAULT_FORMAT_TIMEOUT, f"format of namespace {nsid}", wake)
+
     # --- Comandos de seguridad ---
     def security_send(self):
         pass
@@ -759,5 +698,24 @@ class NvmeCommands():
         pass
     def show_topology(self):
         pass
-    def monitor(self):
-        pass
+    def monitor(self, interval=None, capacity=None, features=(), callback=None, start=True):
+        """
+        Muestreo periodico de SMART (y Get Features opcionales) en un hilo propio.
+
+        Args:
+            interval (float): Segundos entre muestras (por defecto 1s)
+            capacity (int): Muestras conservadas en el ring buffer
+            features (iterable): Feature Identifiers a muestrear (p.ej. 0x04 temperature threshold)
+            callback (callable): callback(device, timestamp, smart_log, feature_values) por muestra
+            start (bool): Arrancar el hilo inmediatamente
+
+        Returns:
+            SmartMonitor: Monitor del dispositivo (llamar stop() al terminar)
+        """
+        from .monitor import SmartMonitor, DEFAULT_INTERVAL, DEFAULT_CAPACITY
+        if self.transport is None:
+            self.transport = default_transport()
+        monitor = SmartMonitor(self.logger, self.device, transport=self.transport,
+                               interval=interval or DEFAULT_INTERVAL, capacity=capacity or DEFAULT_CAPACITY,
+                               features=features, callback=callback)
+        return monitor.start() if start else monitor
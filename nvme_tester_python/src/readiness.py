@@ -0,0 +1,299 @@
+"""
+Espera activa de condiciones del dispositivo (reemplaza los time.sleep fijos).
+
+wait_until() reevalua una condicion con backoff exponencial hasta que se cumple o vence el
+deadline. Si se le pasa un UeventListener, la pausa entre intentos termina en cuanto el kernel
+publica un uevent, asi que cada paso continua en el momento en que el dispositivo esta listo.
+
+Condiciones incluidas:
+    namespace_ready        NSID en la lista de namespaces activos, en sysfs y con nodo de bloque
+    namespaces_deleted     NSID (o todos, 0xFFFFFFFF) fuera de la lista activa y de sysfs
+    format_complete        Format Progress Indicator en 0 y tamano de bloque esperado
+"""
+import os
+import re
+import select
+import socket
+import stat
+import struct
+import time
+
+from .admin_passthru_wrappper import SubmissionQueueEntry
+from .discovery import NAMESPACE_RE, SYSFS_NVME_ROOT, DEV_ROOT
+
+DEFAULT_INITIAL_DELAY = 0.01   # segundos
+DEFAULT_MAX_DELAY = 0.5
+DEFAULT_BACKOFF = 2.0
+DEFAULT_NAMESPACE_TIMEOUT = 30
+DEFAULT_FORMAT_TIMEOUT = 600
+
+NSID_ALL = 0xFFFFFFFF
+OPC_IDENTIFY = 0x06
+CNS_IDENTIFY_NAMESPACE = 0x00
+CNS_ACTIVE_NAMESPACE_LIST = 0x02
+IDENTIFY_DATA_LEN = 4096
+ACTIVE_NS_LIST = struct.Struct(f"<{IDENTIFY_DATA_LEN // 4}I")
+
+# Identify Namespace: FLBAS (byte 26), FPI (byte 32), LBAF0 (byte 128, 4 bytes por formato)
+ID_NS_FLBAS_OFFSET = 26
+ID_NS_FPI_OFFSET = 32
+ID_NS_LBAF_OFFSET = 128
+ID_NS_LBAF_SIZE = 4
+ID_NS_LBADS_OFFSET = 2
+FLBAS_INDEX_MASK = 0x0F
+FLBAS_INDEX_HIGH_BIT = 5
+FLBAS_INDEX_HIGH_MASK = 0x3
+FPI_REMAINING_MASK = 0x7F
+
+NETLINK_KOBJECT_UEVENT = 15
+UEVENT_KERNEL_GROUP = 1
+UEVENT_BUFFER_SIZE = 64 * 1024
+
+CONTROLLER_NAME_RE = re.compile(r"^(nvme\d+)")
+
+
+def wait_until(condition, timeout, description="condition", logger=None, initial_delay=DEFAULT_INITIAL_DELAY,
+               max_delay=DEFAULT_MAX_DELAY, backoff=DEFAULT_BACKOFF, wake=None):
+    """
+    Reevalua condition() hasta que devuelva un valor verdadero o venza el deadline.
+
+    Args:
+        condition (callable): Sin argumentos; una excepcion cuenta como "aun no listo"
+        timeout (float): Deadline en segundos
+        description (str): Texto para el log
+        logger (TestLogger): Logger opcional
+        initial_delay, max_delay (float): Pausas inicial y maxima entre intentos
+        backoff (float): Factor de crecimiento de la pausa
+        wake (UeventListener): Despierta antes de tiempo cuando llega un uevent
+
+    Returns:
+        object: Valor devuelto por condition(), None si vencio el deadline
+    """
+    start = time.monotonic()
+    deadline = start + timeout
+    delay = initial_delay
+    attempts = 0
+    last_error = None
+    while True:
+        attempts += 1
+        try:
+            value = condition()
+        except Exception as e:
+            value = None
+            last_error = e
+        if value:
+            if logger is not None:
+                logger.info(f"{description} ready after {time.monotonic() - start:.3f}s ({attempts} check(s))")
+            return value
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            if logger is not None:
+                detail = f": {last_error}" if last_error is not None else ""
+                logger.warning(f"Timed out after {timeout}s waiting for {description}{detail}")
+            return None
+        pause = min(delay, remaining)
+        if wake is not None and wake.available:
+            wake.wait(pause)
+        else:
+            time.sleep(pause)
+        delay = min(delay * backoff, max_delay)
+
+
+class UeventListener(object):
+    """
+    Socket netlink de uevents del kernel. Debe abrirse antes de la accion que se espera
+    (attach, format...) para no perder el evento. Si el host no lo permite, available es False
+    y wait_until recurre al backoff normal.
+    """
+    def __init__(self):
+        self.sock = None
+        try:
+            self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT)
+            self.sock.bind((0, UEVENT_KERNEL_GROUP))
+            self.sock.setblocking(False)
+        except (AttributeError, OSError):
+            self.close()
+
+    @property
+    def available(self):
+        return self.sock is not None
+
+    def wait(self, timeout):
+        """
+        Espera hasta timeout segundos por uevents.
+
+        Returns:
+            list: Eventos recibidos como dicts (ACTION, DEVNAME, SUBSYSTEM, ...)
+        """
+        if self.sock is None:
+            time.sleep(timeout)
+            return []
+        readable, _, _ = select.select([self.sock], [], [], timeout)
+        events = []
+        while readable:
+            try:
+                message = self.sock.recv(UEVENT_BUFFER_SIZE)
+            except (BlockingIOError, InterruptedError):
+                break
+            fields = message.split(b"\0")
+            event = {}
+            for field in fields[1:]:
+                key, sep, value = field.partition(b"=")
+                if sep:
+                    event[key.decode(errors="replace")] = value.decode(errors="replace")
+            events.append(event)
+        return events
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def controller_name(device_path):
+    """'/dev/nvme0n1' -> 'nvme0'"""
+    match = CONTROLLER_NAME_RE.match(os.path.basename(device_path))
+    return match.group(1) if match else None
+
+
+def controller_path(device_path, dev_root=DEV_ROOT):
+    """Ruta del nodo de caracter del controlador ('/dev/nvme0n1' -> '/dev/nvme0')."""
+    name = controller_name(device_path)
+    return os.path.join(dev_root, name) if name else device_path
+
+
+def sysfs_namespaces(controller, sysfs_root=SYSFS_NVME_ROOT, dev_root=DEV_ROOT):
+    """
+    Namespaces del controlador segun sysfs.
+
+    Returns:
+        dict: {nsid: ruta del nodo de bloque}, None si no hay sysfs para el controlador
+    """
+    ctrl_dir = os.path.join(sysfs_root, controller)
+    try:
+        entries = os.listdir(ctrl_dir)
+    except OSError:
+        return None
+    namespaces = {}
+    for entry in entries:
+        match = NAMESPACE_RE.match(entry)
+        if match:
+            namespaces[int(match.group(2))] = os.path.join(dev_root, f"nvme{match.group(1)}n{match.group(2)}")
+    return namespaces
+
+
+def block_device_present(path):
+    """Nodo de bloque presente (o archivo regular: namespaces de src/emulator.py)."""
+    try:
+        mode = os.stat(path).st_mode
+    except OSError:
+        return False
+    return stat.S_ISBLK(mode) or stat.S_ISREG(mode)
+
+
+def _dev_root(device_path, dev_root):
+    """Directorio de nodos: el indicado, o el del propio device_path (permite raices emuladas)."""
+    return dev_root or os.path.dirname(device_path) or DEV_ROOT
+
+
+def _sysfs_namespaces(controller, sysfs_root, dev_root):
+    # sysfs solo describe los nodos reales de /dev
+    if dev_root != DEV_ROOT:
+        return None
+    return sysfs_namespaces(controller, sysfs_root, dev_root)
+
+
+def _identify(transport, controller_dev, cns, nsid=0):
+    sqe = SubmissionQueueEntry()
+    sqe.OPC = OPC_IDENTIFY
+    sqe.NSID = nsid
+    sqe.DW10 = cns
+    cqe = transport.submit(controller_dev, sqe, data_len=IDENTIFY_DATA_LEN, read=True)
+    if cqe is None or cqe.status_code_type or cqe.status_code or len(cqe.data_buffer) < IDENTIFY_DATA_LEN:
+        return None
+    return cqe.data_buffer
+
+
+def active_namespaces(transport, controller_dev):
+    """
+    Lista de namespaces activos (Identify CNS 02h).
+
+    Returns:
+        set: NSIDs activos, None si el comando no se pudo completar
+    """
+    data = _identify(transport, controller_dev, CNS_ACTIVE_NAMESPACE_LIST)
+    if data is None:
+        return None
+    active = set()
+    for nsid in ACTIVE_NS_LIST.unpack_from(data):
+        if nsid == 0:
+            break
+        active.add(nsid)
+    return active
+
+
+def namespace_format(transport, controller_dev, nsid):
+    """
+    Estado de formato de un namespace (Identify Namespace).
+
+    Returns:
+        tuple: (tamano de bloque en bytes, porcentaje restante de format), None si falla
+    """
+    data = _identify(transport, controller_dev, CNS_IDENTIFY_NAMESPACE, nsid)
+    if data is None:
+        return None
+    flbas = data[ID_NS_FLBAS_OFFSET]
+    index = (flbas & FLBAS_INDEX_MASK) | (((flbas >> FLBAS_INDEX_HIGH_BIT) & FLBAS_INDEX_HIGH_MASK) << 4)
+    lbads = data[ID_NS_LBAF_OFFSET + index * ID_NS_LBAF_SIZE + ID_NS_LBADS_OFFSET]
+    return 1 << lbads, data[ID_NS_FPI_OFFSET] & FPI_REMAINING_MASK
+
+
+def namespace_ready(transport, device_path, nsid, sysfs_root=SYSFS_NVME_ROOT, dev_root=None):
+    """Condicion: NSID activo, visible en sysfs y con nodo de bloque. Devuelve la ruta del nodo."""
+    dev_root = _dev_root(device_path, dev_root)
+    controller = controller_name(device_path)
+    controller_dev = os.path.join(dev_root, controller)
+    active = active_namespaces(transport, controller_dev)
+    if active is not None and nsid not in active:
+        return None
+    namespaces = _sysfs_namespaces(controller, sysfs_root, dev_root)
+    if namespaces is None:
+        ns_path = os.path.join(dev_root, f"{controller}n{nsid}")
+    elif nsid in namespaces:
+        ns_path = namespaces[nsid]
+    else:
+        return None
+    return ns_path if block_device_present(ns_path) else None
+
+
+def namespaces_deleted(transport, device_path, nsid=NSID_ALL, sysfs_root=SYSFS_NVME_ROOT, dev_root=None):
+    """Condicion: el NSID (o todos con 0xFFFFFFFF) ya no esta activo ni en sysfs."""
+    dev_root = _dev_root(device_path, dev_root)
+    controller = controller_name(device_path)
+    active = active_namespaces(transport, os.path.join(dev_root, controller))
+    if active is None:
+        # Identify fallo: no se sabe si el namespace sigue activo, se sigue esperando
+        return False
+    namespaces = _sysfs_namespaces(controller, sysfs_root, dev_root) or {}
+    if nsid == NSID_ALL:
+        return not active and not namespaces
+    return nsid not in active and nsid not in namespaces
+
+
+def format_complete(transport, device_path, nsid, block_size=None, dev_root=None):
+    """Condicion: format terminado (FPI en 0) y, si se indica, con el tamano de bloque esperado."""
+    dev_root = _dev_root(device_path, dev_root)
+    state = namespace_format(transport, os.path.join(dev_root, controller_name(device_path)), nsid)
+    if state is None:
+        return False
+    current_block_size, remaining = state
+    if remaining:
+        return False
+    return block_size is None or current_block_size == block_size
@@ -0,0 +1,486 @@
+"""
+Base de datos de resultados (SQLite en modo WAL).
+
+Guarda cada ejecucion de prueba (run) con los metadatos del dispositivo, la duracion de cada
+paso (comando), snapshots crudos de SMART / id-ns / id-ctrl y los histogramas de latencia
+medidos durante la prueba. Las escrituras se encolan y un hilo de fondo las confirma en lotes
+(una transaccion por lote), de modo que registrar no agrega I/O al hilo de la prueba. Los indices
+sobre serial, firmware, prueba y fecha hacen que las consultas habituales sean de milisegundos:
+
+    db = default_database()
+    db.runs(firmware="6CV10100", since=time.time() - 7 * 24 * 3600)
+
+Varios procesos (p.ej. los workers de src/fleet.py) pueden escribir en la misma base: WAL
+permite lectores concurrentes y busy_timeout serializa los escritores.
+"""
+import atexit
+import json
+import os
+import queue
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+
+# Ruta de la base; "none" desactiva el registro
+RESULTS_DB_ENV = "NVME_RESULTS_DB"
+RESULTS_DB_DISABLED = "none"
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "results")
+RESULTS_FILE = "results.db"
+SCHEMA_VERSION = 1
+
+DEFAULT_BATCH_SIZE = 500             # sentencias por transaccion
+DEFAULT_FLUSH_INTERVAL = 1.0         # segundos maximos que una escritura espera en la cola
+FLUSH_TIMEOUT = 30.0
+BUSY_TIMEOUT_MS = 30000
+
+STATUS_RUNNING = "RUNNING"
+SNAPSHOT_SMART = "smart"
+SNAPSHOT_ID_NS = "id-ns"
+SNAPSHOT_ID_CTRL = "id-ctrl"
+ENCODING_JSON = "json"
+ENCODING_TEXT = "text"
+ENCODING_RAW = "raw"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS devices (
+    serial TEXT PRIMARY KEY,
+    model TEXT,
+    firmware TEXT,
+    path TEXT,
+    pci_address TEXT,
+    first_seen REAL,
+    last_seen REAL
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id TEXT PRIMARY KEY,
+    session TEXT,
+    serial TEXT,
+    model TEXT,
+    firmware TEXT,
+    device TEXT,
+    test TEXT,
+    status TEXT,
+    started_at REAL,
+    finished_at REAL,
+    duration REAL,
+    error TEXT,
+    host TEXT,
+    pid INTEGER
+);
+CREATE INDEX IF NOT EXISTS runs_serial ON runs (serial, started_at);
+CREATE INDEX IF NOT EXISTS runs_firmware ON runs (firmware, started_at);
+CREATE INDEX IF NOT EXISTS runs_test ON runs (test, started_at);
+CREATE INDEX IF NOT EXISTS runs_started ON runs (started_at);
+CREATE INDEX IF NOT EXISTS runs_session ON runs (session);
+CREATE TABLE IF NOT EXISTS steps (
+    run_id TEXT,
+    seq INTEGER,
+    name TEXT,
+    started_at REAL,
+    duration REAL,
+    status TEXT
+);
+CREATE INDEX IF NOT EXISTS steps_run ON steps (run_id, seq);
+CREATE TABLE IF NOT EXISTS snapshots (
+    run_id TEXT,
+    kind TEXT,
+    label TEXT,
+    taken_at REAL,
+    encoding TEXT,
+    payload BLOB
+);
+CREATE INDEX IF NOT EXISTS snapshots_run ON snapshots (run_id, kind);
+CREATE TABLE IF NOT EXISTS latency (
+    run_id TEXT,
+    device TEXT,
+    opcode TEXT,
+    source TEXT,
+    count INTEGER,
+    p50 REAL,
+    p99 REAL,
+    p999 REAL,
+    max REAL,
+    histogram TEXT
+);
+CREATE INDEX IF NOT EXISTS latency_run ON latency (run_id);
+"""
+
+_INSERT_RUN = ("INSERT INTO runs (id, session, serial, model, firmware, device, test, status, started_at, host, pid) "
+               "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+_FINISH_RUN = ("UPDATE runs SET status = ?, finished_at = ?, duration = ?, error = ?, "
+               "model = COALESCE(?, model), firmware = COALESCE(?, firmware) WHERE id = ?")
+_UPSERT_DEVICE = ("INSERT INTO devices (serial, model, firmware, path, pci_address, first_seen, last_seen) "
+                  "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT(serial) DO UPDATE SET "
+                  "model = COALESCE(excluded.model, model), firmware = COALESCE(excluded.firmware, firmware), "
+                  "path = COALESCE(excluded.path, path), pci_address = COALESCE(excluded.pci_address, pci_address), "
+                  "last_seen = excluded.last_seen")
+_INSERT_STEP = "INSERT INTO steps (run_id, seq, name, started_at, duration, status) VALUES (?, ?, ?, ?, ?, ?)"
+_INSERT_SNAPSHOT = "INSERT INTO snapshots (run_id, kind, label, taken_at, encoding, payload) VALUES (?, ?, ?, ?, ?, ?)"
+_INSERT_LATENCY = ("INSERT INTO latency (run_id, device, opcode, source, count, p50, p99, p999, max, histogram) "
+                   "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+
+_default_database = None
+_default_database_lock = threading.Lock()
+
+
+def connect(path):
+    """Conexion con WAL, synchronous=NORMAL y espera ante bloqueos de otros procesos."""
+    connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+    connection.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.execute("PRAGMA synchronous = NORMAL")
+    return connection
+
+
+def _timestamp(value):
+    """Epoch en segundos desde float, int o datetime (None se conserva)."""
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return value
+
+
+class _DatabaseWriter(threading.Thread):
+    """Hilo escritor: agrupa las sentencias encoladas y las confirma en una transaccion por lote."""
+    STOP = None
+
+    def __init__(self, database, write_queue):
+        super().__init__(name="results-db-writer", daemon=True)
+        self.database = database
+        self.queue = write_queue
+
+    def run(self):
+        connection = None
+        try:
+            connection = self.database._open_connection()
+        except sqlite3.Error as e:
+            self.database._log(f"Unable to open results database {self.database.path}: {e}")
+        pending = []
+        events = []
+        stop = False
+        while not stop:
+            try:
+                item = self.queue.get(timeout=self.database.flush_interval)
+            except queue.Empty:
+                continue
+            while True:
+                if item is self.STOP:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    events.append(item)
+                else:
+                    pending.append(item)
+                if stop or len(pending) >= self.database.batch_size:
+                    break
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            if pending and connection is not None:
+                self._commit(connection, pending)
+            pending = []
+            for event in events:
+                event.set()
+            events = []
+        if connection is not None:
+            connection.close()
+
+    def _commit(self, connection, statements):
+        try:
+            with connection:
+                # Sentencias consecutivas iguales en un solo executemany
+                start = 0
+                for index in range(1, len(statements) + 1):
+                    if index == len(statements) or statements[index][0] != statements[start][0]:
+                        connection.executemany(statements[start][0],
+                                               [params for _, params in statements[start:index]])
+                        start = index
+        except sqlite3.Error as e:
+            self.database.errors += 1
+            self.database._log(f"Results database write failed ({len(statements)} statement(s) lost): {e}")
+
+
+class RunRecord(object):
+    """Ejecucion de una prueba en curso; se obtiene con ResultsDatabase.start_run."""
+    def __init__(self, database, run_id, serial, test, device=None, model=None, firmware=None,
+                 pci_address=None, started_at=None):
+        self.database = database
+        self.id = run_id
+        self.serial = serial
+        self.test = test
+        self.device = device
+        self.model = model
+        self.firmware = firmware
+        self.pci_address = pci_address
+        self.started_at = started_at if started_at is not None else time.time()
+        self.finished = False
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def step(self, name, duration, ok=True, started_at=None):
+        """
+        Registra un paso de la prueba (p.ej. un comando nvme-cli).
+
+        Args:
+            name (str): Nombre del paso
+            duration (float): Segundos (None si no se midio)
+            ok (bool): Resultado del paso
+            started_at (float): Epoch de inicio (por defecto ahora - duration)
+        """
+        if started_at is None:
+            started_at = time.time() - (duration or 0)
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+        self.database._enqueue(_INSERT_STEP, (self.id, seq, name, started_at, duration, "PASS" if ok else "FAIL"))
+
+    def snapshot(self, kind, payload, label=None):
+        """
+        Guarda un snapshot crudo (SMART, id-ns, id-ctrl...).
+
+        Args:
+            kind (str): SNAPSHOT_SMART, SNAPSHOT_ID_NS, SNAPSHOT_ID_CTRL u otro
+            payload (bytes/str/dict): Pagina cruda, salida de nvme-cli o JSON ya decodificado
+            label (str): Etiqueta libre (p.ej. "initial", "final", "nsid=1")
+        """
+        if isinstance(payload, (bytes, bytearray, memoryview)):
+            encoding, payload = ENCODING_RAW, bytes(payload)
+        elif isinstance(payload, str):
+            encoding = ENCODING_JSON if payload.lstrip().startswith(("{", "[")) else ENCODING_TEXT
+        else:
+            encoding, payload = ENCODING_JSON, json.dumps(payload)
+        if kind == SNAPSHOT_ID_CTRL and encoding == ENCODING_JSON and (self.model is None or self.firmware is None):
+            # El id-ctrl completa los metadatos si el indice de dispositivos no los tenia
+            try:
+                identify = json.loads(payload)
+                self.model = self.model or str(identify.get('mn', "")).strip() or None
+                self.firmware = self.firmware or str(identify.get('fr', "")).strip() or None
+            except (ValueError, AttributeError):
+                pass
+        self.database._enqueue(_INSERT_SNAPSHOT, (self.id, kind, label, time.time(), encoding, payload))
+
+    def latency(self, recorder, baseline=None, device=None):
+        """
+        Guarda los histogramas de latencia del recorder (src/latency.py).
+
+        Args:
+            recorder (LatencyRecorder): Recorder con las muestras
+            baseline (dict): recorder.to_dict() al inicio de la prueba; solo se guarda la diferencia
+            device (str): Solo los histogramas de este dispositivo (None = todos)
+        """
+        for (key_device, opcode, source), histogram in recorder.since(baseline).histograms.items():
+            if device is not None and key_device != device:
+                continue
+            data = histogram.to_dict()
+            summary = histogram.summary()
+            self.database._enqueue(_INSERT_LATENCY, (self.id, key_device, opcode, source, data['count'],
+                                                     summary.get('p50'), summary.get('p99'),
+                                                     summary.get('p99.9'), summary.get('max'), json.dumps(data)))
+
+    def finish(self, status, error=None):
+        """Cierra la ejecucion (status PASS/FAIL/ERROR) y actualiza los metadatos del dispositivo."""
+        if self.finished:
+            return
+        self.finished = True
+        now = time.time()
+        self.database._enqueue(_FINISH_RUN, (status, now, now - self.started_at, error, self.model,
+                                             self.firmware, self.id))
+        self.database._enqueue(_UPSERT_DEVICE, (self.serial, self.model, self.firmware, self.device,
+                                                self.pci_address, self.started_at, now))
+
+
+class ResultsDatabase(object):
+    def __init__(self, path=None, batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 logger=None):
+        """
+        Args:
+            path (str): Archivo SQLite (por defecto results/results.db)
+            batch_size (int): Sentencias maximas por transaccion
+            flush_interval (float): Segundos maximos que una escritura espera en la cola
+            logger (TestLogger): Logger opcional para errores de escritura
+        """
+        self.path = path or os.path.join(RESULTS_DIR, RESULTS_FILE)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.logger = logger
+        self.errors = 0
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = self._open_connection()
+        try:
+            if connection.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                with connection:
+                    connection.executescript(SCHEMA)
+                    connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        finally:
+            connection.close()
+        self._pid = None
+        self._queue = None
+        self._writer = None
+        self._reader = None
+        self._reader_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+
+    def _log(self, message):
+        if self.logger is not None:
+            self.logger.warning(message)
+
+    def _open_connection(self):
+        return connect(self.path)
+
+    # --- Escritura (por lotes) ---
+    def _enqueue(self, statement, params):
+        if self._pid != os.getpid():
+            # Primer uso o proceso hijo tras fork(): cola y escritor propios
+            with self._start_lock:
+                if self._pid != os.getpid():
+                    self._queue = queue.SimpleQueue()
+                    self._writer = _DatabaseWriter(self, self._queue)
+                    self._writer.start()
+                    self._reader = None
+                    self._pid = os.getpid()
+        self._queue.put((statement, params))
+
+    def start_run(self, serial, test, device=None, model=None, firmware=None, pci_address=None, session=None):
+        """
+        Registra el inicio de una prueba (queda en estado RUNNING hasta finish()).
+
+        Returns:
+            RunRecord: Ejecucion en curso
+        """
+        run = RunRecord(self, uuid.uuid4().hex, serial, test, device=device, model=model or None,
+                        firmware=firmware or None, pci_address=pci_address)
+        self._enqueue(_INSERT_RUN, (run.id, session, serial, run.model, run.firmware, device, test, STATUS_RUNNING,
+                                    run.started_at, socket.gethostname(), os.getpid()))
+        return run
+
+    def flush(self, timeout=FLUSH_TIMEOUT):
+        """
+        Espera a que todo lo encolado hasta ahora este confirmado en la base.
+
+        Returns:
+            bool: False si el escritor no termino dentro del timeout
+        """
+        if self._pid != os.getpid() or self._writer is None:
+            return True
+        if not self._writer.is_alive():
+            return False
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        """Confirma lo pendiente y detiene el escritor. Idempotente."""
+        if self._pid == os.getpid() and self._writer is not None and self._writer.is_alive():
+            self._queue.put(_DatabaseWriter.STOP)
+            self._writer.join(FLUSH_TIMEOUT)
+        self._writer = None
+        self._pid = None
+        with self._reader_lock:
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+
+    # --- Consultas ---
+    def query(self, sql, params=()):
+        """
+        Ejecuta una consulta de solo lectura (tras confirmar las escrituras propias pendientes).
+
+        Returns:
+            list: Filas como dict
+        """
+        self.flush()
+        with self._reader_lock:
+            if self._reader is None:
+                self._reader = self._open_connection()
+                self._reader.row_factory = sqlite3.Row
+            return [dict(row) for row in self._reader.execute(sql, params).fetchall()]
+
+    def runs(self, serial=None, firmware=None, model=None, test=None, status=None, session=None, since=None,
+             until=None, limit=None):
+        """
+        Ejecuciones que cumplen los filtros (None = cualquiera), de la mas reciente a la mas antigua.
+
+        Args:
+            since, until (float/datetime): Rango de started_at
+
+        Returns:
+            list: dicts con las columnas de la tabla runs
+        """
+        conditions = []
+        params = []
+        for column, value in (('serial', serial), ('firmware', firmware), ('model', model), ('test', test),
+                              ('status', status), ('session', session)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            conditions.append("started_at >= ?")
+            params.append(_timestamp(since))
+        if until is not None:
+            conditions.append("started_at < ?")
+            params.append(_timestamp(until))
+        sql = "SELECT * FROM runs"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY started_at DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        return self.query(sql, params)
+
+    def steps(self, run_id):
+        return self.query("SELECT * FROM steps WHERE run_id = ? ORDER BY seq", (run_id,))
+
+    def snapshots(self, run_id, kind=None):
+        """
+        Returns:
+            list: dicts con kind, label, taken_at, encoding y payload (JSON decodificado si corresponde)
+        """
+        if kind is None:
+            rows = self.query("SELECT * FROM snapshots WHERE run_id = ? ORDER BY taken_at", (run_id,))
+        else:
+            rows = self.query("SELECT * FROM snapshots WHERE run_id = ? AND kind = ? ORDER BY taken_at",
+                              (run_id, kind))
+        for row in rows:
+            if row['encoding'] == ENCODING_JSON:
+                row['payload'] = json.loads(row['payload'])
+        return rows
+
+    def latency(self, run_id):
+        rows = self.query("SELECT * FROM latency WHERE run_id = ? ORDER BY device, opcode, source", (run_id,))
+        for row in rows:
+            row['histogram'] = json.loads(row['histogram'])
+        return rows
+
+    def devices(self):
+        return self.query("SELECT * FROM devices ORDER BY serial")
+
+
+def new_session():
+    """Identificador que agrupa las ejecuciones de una misma corrida (todas las pruebas, una flota)."""
+    return uuid.uuid4().hex
+
+
+def default_database():
+    """
+    Base compartida del proceso (ruta de NVME_RESULTS_DB o results/results.db).
+
+    Returns:
+        ResultsDatabase: Base abierta, None si esta desactivada o no se puede abrir
+    """
+    global _default_database
+    with _default_database_lock:
+        if _default_database is None:
+            path = os.environ.get(RESULTS_DB_ENV) or None
+            if path is not None and path.lower() == RESULTS_DB_DISABLED:
+                return None
+            try:
+                _default_database = ResultsDatabase(path)
+            except (OSError, sqlite3.Error):
+                return None
+            atexit.register(_default_database.close)
+        return _default_database
@@ -0,0 +1,157 @@
+"""
+Planificador de pruebas consciente de recursos.
+
+Cada clase de prueba declara en el atributo RESOURCES los recursos del dispositivo que necesita:
+    CONTROLLER_SHARED     Solo lectura del controlador (identify, logs); compatible con otras
+    NAMESPACE_EXCLUSIVE   I/O sobre el namespace; no puede coincidir con otra prueba de I/O
+    CONTROLLER_EXCLUSIVE  Cambia estado del controlador; se ejecuta sola
+    DESTRUCTIVE           Borra/crea/formatea namespaces; se ejecuta sola
+
+TestScheduler ejecuta en paralelo (hilos del mismo proceso) las pruebas compatibles sobre un
+mismo dispositivo y serializa las conflictivas respetando el orden pedido, de modo que un
+format nunca coincide con un identify. Las pruebas se identifican por su posicion en la lista,
+asi que una prueba pedida dos veces se ejecuta dos veces.
+
+Las pruebas simultaneas comparten default_recorder() (src/latency.py): las latencias que cada
+una guarda en la base de resultados (diferencia respecto a su linea base) incluyen tambien los
+comandos que las demas pruebas enviaron al mismo dispositivo mientras corria.
+"""
+import threading
+import time
+
+CONTROLLER_SHARED = "controller_shared"
+CONTROLLER_EXCLUSIVE = "controller_exclusive"
+NAMESPACE_EXCLUSIVE = "namespace_exclusive"
+DESTRUCTIVE = "destructive"
+
+# Pruebas que no declaran recursos se tratan como exclusivas
+DEFAULT_RESOURCES = frozenset({CONTROLLER_EXCLUSIVE})
+EXCLUSIVE_RESOURCES = frozenset({CONTROLLER_EXCLUSIVE, DESTRUCTIVE})
+
+
+def test_resources(test_class):
+    """Recursos declarados por una clase de prueba (RESOURCES), como frozenset."""
+    return frozenset(getattr(test_class, "RESOURCES", DEFAULT_RESOURCES))
+
+
+def resources_conflict(first, second):
+    """
+    Args:
+        first, second (frozenset): Recursos de dos pruebas sobre el mismo dispositivo
+
+    Returns:
+        bool: True si no pueden ejecutarse a la vez
+    """
+    if first & EXCLUSIVE_RESOURCES or second & EXCLUSIVE_RESOURCES:
+        return True
+    return NAMESPACE_EXCLUSIVE in first and NAMESPACE_EXCLUSIVE in second
+
+
+class TestScheduler(object):
+    def __init__(self, serial_number, testnames, device_path=None, max_parallel=None, logger=None, session=None):
+        """
+        Args:
+            serial_number (str): Numero de serie del dispositivo
+            testnames (list): Pruebas de tests_pool, en el orden deseado
+            device_path (str): Ruta ya resuelta (None = la resuelve TestManager)
+            max_parallel (int): Maximo de pruebas simultaneas (None = sin limite)
+            logger (TestLogger): Logger del planificador (se crea uno si es None)
+            session (str): Sesion de la base de resultados (None = una nueva, ver src/results_db.py)
+        """
+        from .test_manager import tests_pool
+        from .results_db import new_session
+
+        if logger is None:
+            from .logger import TestLogger
+            logger = TestLogger("scheduler")
+        self.serial_number = serial_number
+        self.testnames = list(testnames)
+        self.device_path = device_path
+        self.max_parallel = max_parallel
+        self.logger = logger
+        self.session = session or new_session()
+        # Las pruebas se identifican por (posicion, nombre): una prueba repetida se ejecuta cada vez
+        self.tests = list(enumerate(self.testnames))
+        self.resources = {test: test_resources(tests_pool[test[1]]) if test[1] in tests_pool
+                          else DEFAULT_RESOURCES for test in self.tests}
+
+    def _can_start(self, test, running, pending):
+        if self.max_parallel is not None and len(running) >= self.max_parallel:
+            return False
+        resources = self.resources[test]
+        if any(resources_conflict(resources, self.resources[other]) for other in running):
+            return False
+        # Una prueba no adelanta a otra anterior con la que entra en conflicto
+        for other in pending:
+            if other == test:
+                return True
+            if resources_conflict(resources, self.resources[other]):
+                return False
+        return True
+
+    def _run_test(self, name):
+        from .test_manager import TestManager
+
+        start = time.time()
+        result = None
+        try:
+            manager = TestManager(self.serial_number, name, device_path=self.device_path, session=self.session)
+            if manager.test is not None:
+                result = manager.run()
+        except Exception as e:
+            self.logger.error(f"Test {name} raised: {e}")
+        return result, time.time() - start
+
+    def run(self, on_result=None):
+        """
+        Ejecuta todas las pruebas.
+
+        Args:
+            on_result (callable): on_result(testname, result, duration) al terminar cada prueba
+                (se invoca desde el hilo de la prueba)
+
+        Returns:
+            list: [(testname, resultado de run())] en el orden pedido, una entrada por prueba
+        """
+        results = {}
+        pending = list(self.tests)
+        running = set()
+        condition = threading.Condition()
+
+        def worker(test):
+            name = test[1]
+            result, duration = self._run_test(name)
+            self.logger.info(f"Test {name} finished in {duration:.2f}s")
+            if on_result is not None:
+                try:
+                    on_result(name, result, duration)
+                except Exception as e:
+                    self.logger.error(f"Scheduler result callback failed: {e}")
+            with condition:
+                results[test] = result
+                running.discard(test)
+                condition.notify_all()
+
+        threads = []
+        with condition:
+            while pending:
+                ready = [test for test in pending if self._can_start(test, running, pending)]
+                if not ready:
+                    condition.wait()
+                    continue
+                for test in ready:
+                    if not self._can_start(test, running, pending):
+                        continue
+                    pending.remove(test)
+                    running.add(test)
+                    index, name = test
+                    self.logger.info(f"Starting {name} (resources={sorted(self.resources[test])}, "
+                                     f"running={sorted(other for _, other in running)})")
+                    thread = threading.Thread(target=worker, args=(test,), name=f"test-{index}-{name}",
+                                              daemon=True)
+                    threads.append(thread)
+                    thread.start()
+
+        for thread in threads:
+            thread.join()
+        return [(name, results.get((index, name))) for index, name in self.tests]
@@ -0,0 +1,182 @@
+"""
+Decodificador del log page SMART / Health Information (LID 0x02, 512 bytes).
+
+SmartLog envuelve un memoryview de la pagina cruda (sin copiarla) y decodifica cada campo al
+accederlo con layouts struct precompilados. Los contadores de 128 bits se devuelven completos.
+Los nombres de campo coinciden con las claves de `nvme smart-log --output-format=json`.
+
+Ejemplo:
+    cqe = passthruSmartLog().get_smart_log(lid=2, numdl=127, device="/dev/nvme0", dataLen=512)
+    smart = SmartLog.from_cqe(cqe)
+    smart.host_write_commands, smart.temperature_celsius
+"""
+import struct
+
+SMART_LOG_SIZE = 512
+KELVIN_OFFSET = 273  # nvme-cli convierte Kelvin a Celsius restando 273 (entero)
+TEMPERATURE_SENSORS = 8
+
+U8 = "B"
+U16 = "H"
+U32 = "I"
+U128 = "QQ"
+SENSORS = f"{TEMPERATURE_SENSORS}H"
+
+# NVMe Base Specification, Figure "SMART / Health Information Log Page": (campo, offset, formato)
+SMART_LOG_LAYOUT = (
+    ("critical_warning", 0, U8),
+    ("temperature", 1, U16),
+    ("avail_spare", 3, U8),
+    ("spare_thresh", 4, U8),
+    ("percent_used", 5, U8),
+    ("endurance_grp_critical_warning_summary", 6, U8),
+    ("data_units_read", 32, U128),
+    ("data_units_written", 48, U128),
+    ("host_read_commands", 64, U128),
+    ("host_write_commands", 80, U128),
+    ("controller_busy_time", 96, U128),
+    ("power_cycles", 112, U128),
+    ("power_on_hours", 128, U128),
+    ("unsafe_shutdowns", 144, U128),
+    ("media_errors", 160, U128),
+    ("num_err_log_entries", 176, U128),
+    ("warning_temp_time", 192, U32),
+    ("critical_comp_time", 196, U32),
+    ("temperature_sensors", 200, SENSORS),
+    ("thm_temp1_trans_count", 216, U32),
+    ("thm_temp2_trans_count", 220, U32),
+    ("thm_temp1_total_time", 224, U32),
+    ("thm_temp2_total_time", 228, U32),
+)
+
+SMART_LOG_FIELDS = tuple(name for name, _, _ in SMART_LOG_LAYOUT)
+
+
+def _page_struct():
+    """Struct de la pagina completa (con los reservados como padding) para decodificacion masiva."""
+    fmt = "<"
+    position = 0
+    for _, offset, field_fmt in SMART_LOG_LAYOUT:
+        if offset > position:
+            fmt += f"{offset - position}x"
+        fmt += field_fmt
+        position = offset + struct.calcsize("<" + field_fmt)
+    fmt += f"{SMART_LOG_SIZE - position}x"
+    return struct.Struct(fmt)
+
+
+SMART_LOG_STRUCT = _page_struct()
+
+
+def _field_property(name, offset, field_fmt):
+    unpack_from = struct.Struct("<" + field_fmt).unpack_from
+    if field_fmt == U128:
+        def getter(self):
+            low, high = unpack_from(self._buffer, offset)
+            return low | (high << 64)
+    elif field_fmt == SENSORS:
+        def getter(self):
+            return unpack_from(self._buffer, offset)
+    else:
+        def getter(self):
+            return unpack_from(self._buffer, offset)[0]
+    getter.__name__ = name
+    return property(getter)
+
+
+class SmartLog(object):
+    __slots__ = ("_buffer",)
+
+    def __init__(self, buffer):
+        """
+        Args:
+            buffer: bytes/bytearray/memoryview con al menos 512 bytes (no se copia)
+        """
+        view = _byte_view(buffer)
+        if view.nbytes < SMART_LOG_SIZE:
+            raise ValueError(f"SMART log page requires {SMART_LOG_SIZE} bytes, got {view.nbytes}")
+        self._buffer = view[:SMART_LOG_SIZE]
+
+    @classmethod
+    def from_cqe(cls, cqe):
+        """
+        Crea el decodificador a partir del resultado de passthruSmartLog.get_smart_log.
+
+        Returns:
+            SmartLog: Decodificador, None si el CQE no trae una pagina completa
+        """
+        if cqe is None or not cqe.data_buffer or len(cqe.data_buffer) < SMART_LOG_SIZE:
+            return None
+        return cls(cqe.data_buffer)
+
+    @property
+    def raw(self):
+        """memoryview de los 512 bytes de la pagina."""
+        return self._buffer
+
+    @property
+    def temperature_celsius(self):
+        return self.temperature - KELVIN_OFFSET
+
+    def to_dict(self):
+        """Todos los campos decodificados (mismas claves que nvme-cli)."""
+        return dict(zip(SMART_LOG_FIELDS, self.values()))
+
+    def values(self):
+        values = SMART_LOG_STRUCT.unpack_from(self._buffer)
+        return _group_values(values)
+
+    @staticmethod
+    def iter_pages(buffer):
+        """
+        Recorre un buffer con paginas consecutivas de 512 bytes (p.ej. un archivo de capturas).
+
+        Yields:
+            SmartLog: Un decodificador por pagina, sobre el mismo buffer (sin copias)
+        """
+        view = _byte_view(buffer)
+        for offset in range(0, view.nbytes - SMART_LOG_SIZE + 1, SMART_LOG_SIZE):
+            yield SmartLog(view[offset:offset + SMART_LOG_SIZE])
+
+    @staticmethod
+    def iter_unpack(buffer):
+        """
+        Decodificacion masiva: una tupla de valores por pagina, en el orden de SMART_LOG_FIELDS.
+        Es el camino mas rapido para analisis offline de muchas capturas.
+        """
+        view = _byte_view(buffer)
+        for values in SMART_LOG_STRUCT.iter_unpack(view[:view.nbytes - view.nbytes % SMART_LOG_SIZE]):
+            yield _group_values(values)
+
+    def __repr__(self):
+        return f"SmartLog(temperature={self.temperature}K, percent_used={self.percent_used}%, " \
+               f"media_errors={self.media_errors})"
+
+
+def _byte_view(buffer):
+    view = memoryview(buffer)
+    if view.format != "B" or view.ndim != 1:
+        view = view.cast("B")
+    return view
+
+
+def _group_values(values):
+    """Une las mitades de los contadores de 128 bits y agrupa los sensores de temperatura."""
+    grouped = []
+    index = 0
+    for _, _, field_fmt in SMART_LOG_LAYOUT:
+        if field_fmt == U128:
+            grouped.append(values[index] | (values[index + 1] << 64))
+            index += 2
+        elif field_fmt == SENSORS:
+            grouped.append(tuple(values[index:index + TEMPERATURE_SENSORS]))
+            index += TEMPERATURE_SENSORS
+        else:
+            grouped.append(values[index])
+            index += 1
+    return tuple(grouped)
+
+
+for _name, _offset, _fmt in SMART_LOG_LAYOUT:
+    setattr(SmartLog, _name, _field_property(_name, _offset, _fmt))
+del _name, _offset, _fmt
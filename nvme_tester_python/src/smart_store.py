@@ -0,0 +1,199 @@
+"""
+Almacen columnar de snapshots SMART y motor de diferencias vectorizado (NumPy).
+
+Cada snapshot se guarda tal cual (512 bytes) en un arreglo estructurado cuyo dtype reproduce el
+layout del log page SMART (ver src/smart_log.py), de modo que la ingesta masiva de paginas
+crudas es un np.frombuffer sin decodificar campo por campo. Deltas, tasas y chequeos de umbral
+se evaluan sobre todo el arreglo a la vez.
+"""
+import time
+
+import numpy as np
+
+from .smart_log import SMART_LOG_LAYOUT, SMART_LOG_SIZE, KELVIN_OFFSET, U8, U16, U32, U128, SENSORS
+
+_NUMPY_FORMATS = {
+    U8: "u1",
+    U16: "<u2",
+    U32: "<u4",
+    U128: ("<u8", (2,)),     # [parte baja, parte alta]
+    SENSORS: ("<u2", (8,)),
+}
+
+SMART_DTYPE = np.dtype({
+    'names': [name for name, _, _ in SMART_LOG_LAYOUT],
+    'formats': [_NUMPY_FORMATS[fmt] for _, _, fmt in SMART_LOG_LAYOUT],
+    'offsets': [offset for _, offset, _ in SMART_LOG_LAYOUT],
+    'itemsize': SMART_LOG_SIZE,
+})
+
+# Campos acumulativos sobre los que tiene sentido calcular deltas y tasas
+COUNTER_FIELDS = tuple(name for name, _, fmt in SMART_LOG_LAYOUT if fmt in (U128, U32))
+
+DEFAULT_MAX_TEMPERATURE_C = 85
+DEFAULT_MAX_PERCENT_USED = 100
+DEFAULT_MAX_MEDIA_ERRORS = 0
+DEFAULT_CAPACITY = 1024
+INT64_MAX = np.iinfo(np.int64).max
+
+
+def counter_values(column):
+    """
+    Convierte una columna SMART a valores numericos.
+
+    Los contadores de 128 bits se devuelven como int64 mientras quepan (el caso normal) y como
+    float64 (con perdida de precision) si algun valor usa la parte alta.
+    """
+    if column.ndim == 2 and column.shape[1] == 2:
+        low = column[:, 0]
+        high = column[:, 1]
+        if not high.any() and (low.size == 0 or low.max() <= INT64_MAX):
+            return low.astype(np.int64)
+        return low.astype(np.float64) + high.astype(np.float64) * 2.0 ** 64
+    return column.astype(np.int64)
+
+
+class SmartSnapshotStore(object):
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        """
+        Args:
+            capacity (int): Snapshots preasignados (el almacen crece duplicando su tamano)
+        """
+        self.size = 0
+        self._pages = np.zeros(capacity, dtype=SMART_DTYPE)
+        self._timestamps = np.zeros(capacity, dtype=np.float64)
+        self._device_ids = np.zeros(capacity, dtype=np.int32)
+        self.devices = {}  # nombre de dispositivo -> id
+
+    def __len__(self):
+        return self.size
+
+    def _reserve(self, count):
+        needed = self.size + count
+        capacity = len(self._pages)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity = max(capacity * 2, 1)
+        self._pages = np.resize(self._pages, capacity)
+        self._timestamps = np.resize(self._timestamps, capacity)
+        self._device_ids = np.resize(self._device_ids, capacity)
+
+    def _device_id(self, device):
+        device_id = self.devices.get(device)
+        if device_id is None:
+            device_id = len(self.devices)
+            self.devices[device] = device_id
+        return device_id
+
+    def extend(self, raw_pages, device=None, timestamps=None):
+        """
+        Ingesta masiva de paginas SMART crudas consecutivas.
+
+        Args:
+            raw_pages: bytes/bytearray/memoryview con N*512 bytes
+            device (str): Dispositivo al que pertenecen las paginas
+            timestamps (array): N marcas de tiempo (segundos); por defecto el instante actual
+
+        Returns:
+            int: Numero de snapshots agregados
+        """
+        pages = np.frombuffer(raw_pages, dtype=SMART_DTYPE)
+        count = len(pages)
+        self._reserve(count)
+        end = self.size + count
+        self._pages[self.size:end] = pages
+        self._timestamps[self.size:end] = time.time() if timestamps is None else timestamps
+        self._device_ids[self.size:end] = self._device_id(device)
+        self.size = end
+        return count
+
+    def append(self, raw_page, device=None, timestamp=None):
+        """Agrega un snapshot (512 bytes crudos, p.ej. SmartLog.raw o cqe.data_buffer)."""
+        return self.extend(memoryview(raw_page)[:SMART_LOG_SIZE], device=device,
+                           timestamps=None if timestamp is None else [timestamp])
+
+    def append_cqe(self, cqe, device=None, timestamp=None):
+        """Agrega el resultado de passthruSmartLog.get_smart_log; False si no trae pagina completa."""
+        if cqe is None or not cqe.data_buffer or len(cqe.data_buffer) < SMART_LOG_SIZE:
+            return False
+        self.append(cqe.data_buffer, device=device, timestamp=timestamp)
+        return True
+
+    @property
+    def records(self):
+        """Vista del arreglo estructurado con los snapshots almacenados."""
+        return self._pages[:self.size]
+
+    @property
+    def timestamps(self):
+        return self._timestamps[:self.size]
+
+    def _select(self, device):
+        """Indices de los snapshots de un dispositivo ordenados por tiempo (todos si device es None)."""
+        if device is None:
+            indexes = np.arange(self.size)
+        else:
+            device_id = self.devices.get(device)
+            if device_id is None:
+                return np.arange(0)
+            indexes = np.flatnonzero(self._device_ids[:self.size] == device_id)
+        order = np.argsort(self._timestamps[indexes], kind="stable")
+        return indexes[order]
+
+    def field(self, name, device=None):
+        """Valores de un campo (contadores de 128 bits ya combinados) en orden temporal."""
+        return counter_values(self._pages[name][self._select(device)])
+
+    def deltas(self, device=None, fields=COUNTER_FIELDS):
+        """
+        Diferencias entre snapshots consecutivos de un dispositivo, para cada contador.
+
+        Returns:
+            dict: {campo: arreglo de N-1 deltas}
+        """
+        records = self._pages[self._select(device)]
+        return {name: np.diff(counter_values(records[name])) for name in fields}
+
+    def rates(self, device=None, fields=COUNTER_FIELDS):
+        """
+        Tasa de cambio por segundo entre snapshots consecutivos, para cada contador.
+
+        Returns:
+            dict: {campo: arreglo de N-1 tasas}
+        """
+        indexes = self._select(device)
+        elapsed = np.diff(self._timestamps[indexes])
+        elapsed[elapsed <= 0] = np.nan
+        records = self._pages[indexes]
+        return {name: np.diff(counter_values(records[name])) / elapsed for name in fields}
+
+    def diff(self, first, second, fields=COUNTER_FIELDS):
+        """
+        Diferencia entre dos snapshots concretos (indices de insercion).
+
+        Returns:
+            dict: {campo: second - first}
+        """
+        records = self._pages[[first, second]]
+        return {name: int(np.diff(counter_values(records[name]))[0]) for name in fields}
+
+    def check_thresholds(self, max_temperature_c=DEFAULT_MAX_TEMPERATURE_C,
+                         max_percent_used=DEFAULT_MAX_PERCENT_USED,
+                         max_media_errors=DEFAULT_MAX_MEDIA_ERRORS, device=None):
+        """
+        Evalua los umbrales sobre todos los snapshots a la vez.
+
+        Returns:
+            dict: {chequeo: indices de insercion de los snapshots que lo violan}
+        """
+        indexes = self._select(device)
+        records = self._pages[indexes]
+        temperature_c = records['temperature'].astype(np.int32) - KELVIN_OFFSET
+        violations = {
+            'temperature': temperature_c >= max_temperature_c,
+            'percent_used': records['percent_used'] >= max_percent_used,
+            'media_errors': counter_values(records['media_errors']) > max_media_errors,
+            'critical_warning': records['critical_warning'] != 0,
+        }
+        return {name: indexes[mask] for name, mask in violations.items()}
@@ -0,0 +1,249 @@
+"""
+Captura de los logs de telemetria (Host-Initiated 07h / Controller-Initiated 08h).
+
+Los logs de telemetria pueden ocupar cientos de MB, asi que nunca se arman en memoria:
+- la cabecera (bloque 0) indica el ultimo bloque de cada data area y la generacion de los datos,
+- el archivo de salida se preasigna con el tamano final y se mapea en memoria (mmap),
+- las data areas se leen con LogPageReader (src/log_page.py): tramos del tamano de MDTS con Log
+  Page Offset, pedidos en paralelo y copiados directamente a su posicion en el archivo,
+- un tramo fallido se reintenta desde el mismo offset; si se agotan los reintentos queda un
+  checkpoint (<salida>.progress) con el final de los tramos completos contiguos desde el inicio, y
+  capture(resume=True) continua desde ahi, siempre que la generacion de los datos del
+  controlador no haya cambiado.
+
+Ejemplo:
+    report = nvme.telemetry_log("/tmp/telemetry.bin", data_area=3)
+    report['bytes'], report['bytes_per_second'], report['consistent']
+"""
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+from .log_page import LogPageReader, LID_TELEMETRY_HOST, LID_TELEMETRY_CONTROLLER, DEFAULT_WORKERS
+
+LSP_CREATE_TELEMETRY = 0x1
+# Identify Controller LPA bit 3: logs de telemetria
+LPA_TELEMETRY = 1 << 3
+
+TELEMETRY_BLOCK_SIZE = 512
+TELEMETRY_HEADER = struct.Struct("<B4x3sHHH2xI")     # lid, ieee, da1lb, da2lb, da3lb, da4lb
+HOST_GENERATION_OFFSET = 381
+CONTROLLER_AVAILABLE_OFFSET = 382
+CONTROLLER_GENERATION_OFFSET = 383
+REASON_OFFSET = 384
+
+DEFAULT_RETRIES = 3
+DEFAULT_RETRY_DELAY = 0.1                 # segundos; se duplica en cada reintento
+CHECKPOINT_BYTES = 8 * 1024 * 1024        # bytes entre checkpoints
+PROGRESS_SUFFIX = ".progress"
+
+
+def parse_header(data):
+    """
+    Cabecera de un log de telemetria.
+
+    Returns:
+        dict: lid, ieee, last_blocks (data areas 1-4), host_generation, controller_available,
+              controller_generation, reason (bytes)
+    """
+    lid, ieee, da1, da2, da3, da4 = TELEMETRY_HEADER.unpack_from(data)
+    return {
+        'lid': lid,
+        'ieee': ieee.hex(),
+        'last_blocks': (da1, da2, da3, da4),
+        'host_generation': data[HOST_GENERATION_OFFSET],
+        'controller_available': data[CONTROLLER_AVAILABLE_OFFSET],
+        'controller_generation': data[CONTROLLER_GENERATION_OFFSET],
+        'reason': bytes(data[REASON_OFFSET:TELEMETRY_BLOCK_SIZE]),
+    }
+
+
+class TelemetryCapture(object):
+    def __init__(self, nvme, controller_initiated=False, chunk_size=None, retries=DEFAULT_RETRIES,
+                 retry_delay=DEFAULT_RETRY_DELAY, checkpoint_bytes=CHECKPOINT_BYTES, max_workers=DEFAULT_WORKERS):
+        """
+        Args:
+            nvme (NvmeCommands): Wrapper del dispositivo (passthru, idctrol y logger)
+            controller_initiated (bool): Log 08h en lugar del Host-Initiated 07h
+            chunk_size (int): Bytes por comando; None = maximo permitido por MDTS
+            retries (int): Reintentos por tramo antes de abandonar la captura
+            retry_delay (float): Espera antes del primer reintento en segundos
+            checkpoint_bytes (int): Avance contiguo entre actualizaciones del checkpoint
+            max_workers (int): Tramos simultaneos (1 = en orden)
+        """
+        self.logger = nvme.logger
+        self.lid = LID_TELEMETRY_CONTROLLER if controller_initiated else LID_TELEMETRY_HOST
+        if chunk_size:
+            # El Log Page Offset de telemetria debe ser multiplo del bloque de 512 bytes
+            chunk_size = max(TELEMETRY_BLOCK_SIZE, chunk_size - chunk_size % TELEMETRY_BLOCK_SIZE)
+        self.reader = LogPageReader(nvme, max_workers=max_workers, chunk_size=chunk_size, retries=retries,
+                                    retry_delay=retry_delay)
+        self.checkpoint_bytes = checkpoint_bytes
+
+    @property
+    def name(self):
+        return "controller-initiated" if self.lid == LID_TELEMETRY_CONTROLLER else "host-initiated"
+
+    def _limits(self):
+        """
+        Returns:
+            tuple: (bytes por comando, soporta offset) o None si el controlador no tiene telemetria
+        """
+        limits = self.reader.controller()
+        if limits is None:
+            return None
+        if not limits['lpa'] & LPA_TELEMETRY:
+            self.logger.error(f"Telemetry capture: controller does not support telemetry (lpa=0x{limits['lpa']:x})")
+            return None
+        chunk = limits['max_transfer']
+        return max(TELEMETRY_BLOCK_SIZE, chunk - chunk % TELEMETRY_BLOCK_SIZE), limits['offsets']
+
+    def _read(self, offset, length, create=False, out=None, on_chunk=None):
+        """Tramo [offset, offset + length) del log (en `out` si se indica); None si falla."""
+        return self.reader.read(self.lid, length, offset, lsp=LSP_CREATE_TELEMETRY if create else 0, out=out,
+                                on_chunk=on_chunk)
+
+    def _generation(self, header):
+        return header['controller_generation' if self.lid == LID_TELEMETRY_CONTROLLER else 'host_generation']
+
+    @staticmethod
+    def _load_progress(progress_path):
+        try:
+            with open(progress_path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _save_progress(progress_path, progress):
+        tmp_path = progress_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(progress, f)
+        os.replace(tmp_path, progress_path)
+
+    def capture(self, path, data_area=3, create=True, resume=False):
+        """
+        Captura el log hasta el final de `data_area` en `path`.
+
+        Args:
+            path (str): Archivo de salida (se preasigna con el tamano del log)
+            data_area (int): Ultima data area a capturar (1-4; cada una incluye las anteriores)
+            create (bool): Host-Initiated: pedir al controlador una captura nueva (LSP bit 0)
+            resume (bool): Continuar una captura interrumpida segun <path>.progress
+
+        Returns:
+            dict: path, lid, data_area, size, bytes (leidos en esta llamada), resumed_from, chunks,
+                  elapsed, bytes_per_second, generation, consistent (la generacion no cambio
+                  durante la captura); None si la captura falla
+        """
+        if data_area not in (1, 2, 3, 4):
+            self.logger.error(f"Telemetry capture: invalid data area {data_area}")
+            return None
+        limits = self._limits()
+        if limits is None:
+            return None
+        chunk, offsets = limits
+        progress_path = path + PROGRESS_SUFFIX
+        progress = self._load_progress(progress_path) if resume else None
+
+        # Una captura reanudada no puede crear datos nuevos: invalidaria lo ya escrito
+        header_data = self._read(0, TELEMETRY_BLOCK_SIZE, create=create and progress is None
+                                 and self.lid == LID_TELEMETRY_HOST)
+        if header_data is None:
+            return None
+        header = parse_header(header_data)
+        if self.lid == LID_TELEMETRY_CONTROLLER and not header['controller_available']:
+            self.logger.warning("Telemetry capture: no controller-initiated data available")
+        generation = self._generation(header)
+        size = (header['last_blocks'][data_area - 1] + 1) * TELEMETRY_BLOCK_SIZE
+        if size > chunk and not offsets:
+            self.logger.error(f"Telemetry capture: {size} bytes exceed the transfer limit ({chunk}) and the "
+                              f"controller does not support log page offsets")
+            return None
+
+        start = TELEMETRY_BLOCK_SIZE
+        if progress is not None:
+            if (progress.get('lid'), progress.get('generation'), progress.get('size')) == (self.lid, generation, size) \
+                    and os.path.exists(path) and os.path.getsize(path) == size:
+                start = progress['offset']
+                self.logger.info(f"Resuming telemetry capture at offset {start} of {size}")
+            else:
+                self.logger.warning("Telemetry capture: checkpoint does not match the device data, restarting")
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if start == TELEMETRY_BLOCK_SIZE:
+                os.ftruncate(fd, 0)
+                if hasattr(os, "posix_fallocate"):
+                    os.posix_fallocate(fd, 0, size)
+                else:
+                    os.ftruncate(fd, size)
+            with mmap.mmap(fd, size) as output:
+                output[:TELEMETRY_BLOCK_SIZE] = header_data[:TELEMETRY_BLOCK_SIZE]
+                report = self._transfer(output, start, size, chunk, generation, progress_path)
+        finally:
+            os.close(fd)
+        if report is None:
+            return None
+
+        final_header = self._read(0, TELEMETRY_BLOCK_SIZE)
+        consistent = final_header is not None and self._generation(parse_header(final_header)) == generation
+        if not consistent:
+            self.logger.warning("Telemetry data generation changed during capture; the capture is inconsistent")
+        try:
+            os.unlink(progress_path)
+        except OSError:
+            pass
+        report.update({'path': path, 'lid': self.lid, 'data_area': data_area, 'size': size,
+                       'resumed_from': start if start != TELEMETRY_BLOCK_SIZE else None,
+                       'generation': generation, 'consistent': consistent})
+        self.logger.info(f"Telemetry {self.name} capture: {size} bytes in {report['elapsed']:.3f}s "
+                         f"({report['bytes_per_second'] / 1e6:.1f} MB/s)")
+        return report
+
+    def _transfer(self, output, start, size, chunk, generation, progress_path):
+        """
+        Copia [start, size) al mapeo. Los tramos pueden completar en cualquier orden: el checkpoint
+        guarda el final de los tramos contiguos ya copiados desde `start` (cada checkpoint_bytes de
+        avance y al fallar), asi un tramo fallido no descarta los anteriores.
+        """
+        began = time.perf_counter()
+        lock = threading.Lock()
+        completed = {}
+        state = {'contiguous': start, 'saved': start}
+
+        def save(offset):
+            output.flush()
+            self._save_progress(progress_path, {'lid': self.lid, 'generation': generation, 'size': size,
+                                                'offset': offset})
+            state['saved'] = offset
+
+        def on_chunk(position, length):
+            with lock:
+                completed[start + position] = length
+                while state['contiguous'] in completed:
+                    state['contiguous'] += completed.pop(state['contiguous'])
+                if state['contiguous'] < size and state['contiguous'] - state['saved'] >= self.checkpoint_bytes:
+                    save(state['contiguous'])
+
+        with memoryview(output) as view:
+            result = self._read(start, size - start, out=view[start:size], on_chunk=on_chunk)
+        if result is None:
+            with lock:
+                save(state['contiguous'])
+            self.logger.error(f"Telemetry capture interrupted at offset {state['contiguous']} of {size}; "
+                              f"resume with resume=True")
+            return None
+        chunks = -(-(size - start) // chunk)
+        output.flush()
+        elapsed = time.perf_counter() - began
+        transferred = size - start
+        return {
+            'bytes': transferred,
+            'chunks': chunks,
+            'elapsed': elapsed,
+            'bytes_per_second': transferred / elapsed if elapsed > 0 else 0.0,
+        }
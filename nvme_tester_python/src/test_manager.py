@@ -1,11 +1,17 @@
 import sys
 import os
+import time
 
 # Add the parent directory to the path to import modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from .logger import TestLogger
 from .nvme_wrapper import NvmeCommands
+from .discovery import DeviceDiscovery
+from .device_index import DeviceIndex
+from .latency import default_recorder
+from .results_db import default_database
+from .fleet import STATUS_PASS, STATUS_FAIL, STATUS_ERROR, is_passing_result
 
 from tests.test_id_control import NvmeIdCtrlTest as testIdControl
 from tests.test_smart_log import NvmeSmartLogTemperatureTest as NvmeSmartLogTemperatureTest
@@ -21,15 +27,23 @@ tests_pool = {
 
 
 class TestManager(object):
-    def __init__(self, serial_number, testname):
+    def __init__(self, serial_number, testname, device_path=None, session=None):
         self.serial_number = serial_number
         self.testname = testname
         self.nvme = None
-        self.physical_path = None
+        # Ruta ya resuelta por el descubrimiento (evita volver a ejecutar nvme list)
+        self.physical_path = device_path
+        # Entrada del indice de dispositivos (modelo, firmware, PCI) si se consulto
+        self.device_info = None
+        # Agrupa en la base de resultados las pruebas de una misma corrida (ver src/results_db.py)
+        self.session = session
         self.logger = TestLogger(self.testname)
         self.test = None
 
-        if self.initialize() is None:
+        start = time.time()
+        initialized = self.initialize()
+        self.init_duration = time.time() - start
+        if initialized is None:
             self.logger.error(f"Unable to get Physical Path for SN: {self.serial_number}")
             return
 
@@ -48,16 +62,24 @@ class TestManager(object):
             str: Ruta física del dispositivo si se encuentra, None si falla
         """
         try:
-            # Initialize the NVMe wrapper with temporary empty device for device discovery
-            temp_nvme = NvmeCommands(self.logger)
-            
-            # Get the physical path of the NVMe device
-            nvme_list_output = temp_nvme.command_list(json_output=True)
-            if nvme_list_output is None:
-                self.logger.error("Failed to get NVMe device list")
-                return None
+            if self.physical_path is None:
+                # Indice persistente SN -> dispositivo (se regenera solo si hubo hotplug/renombrado)
+                device = DeviceIndex(self.logger).lookup(self.serial_number)
+                self.device_info = device
+                if device is not None:
+                    self.physical_path = DeviceDiscovery.preferred_path(device)
+
+            if self.physical_path is None:
+                # Initialize the NVMe wrapper with temporary empty device for device discovery
+                temp_nvme = NvmeCommands(self.logger)
                 
-            self.physical_path = self.get_device_path(self.serial_number, nvme_list_output)
+                # Get the physical path of the NVMe device
+                nvme_list_output = temp_nvme.command_list(json_output=True)
+                if nvme_list_output is None:
+                    self.logger.error("Failed to get NVMe device list")
+                    return None
+                    
+                self.physical_path = self.get_device_path(self.serial_number, nvme_list_output)
             
             if self.physical_path is None:
                 self.logger.error(f"Device with serial number {self.serial_number} not found")
@@ -92,9 +114,15 @@ class TestManager(object):
                 
             # Log inicio de la prueba
             self.logger.info(f"Running test: {self.testname} for device {self.physical_path}")
+            run = self.start_result_record()
             
             # Ejecutar la prueba usando la instancia correcta
-            result = self.test.run()
+            try:
+                result = self.test.run()
+            except Exception as e:
+                self.finish_result_record(run, STATUS_ERROR, str(e))
+                raise
+            self.finish_result_record(run, STATUS_PASS if is_passing_result(result) else STATUS_FAIL)
             
             if result is not None:
                 self.logger.info(f"Test {self.testname} execution completed successfully.")
@@ -106,6 +134,42 @@ class TestManager(object):
         except Exception as e:
             self.logger.error(f"Error during test execution: {e}")
             return None
+        finally:
+            if self.nvme is not None:
+                self.nvme.close()
+
+    def start_result_record(self):
+        """
+        Abre la ejecucion en la base de resultados y la asigna al wrapper, que registra cada
+        comando como paso y guarda los snapshots de identify / SMART.
+
+        Returns:
+            RunRecord: Ejecucion en curso, None si la base esta desactivada
+        """
+        database = default_database()
+        if database is None:
+            return None
+        if self.device_info is None:
+            # Sin consulta de sysfs ni nvme-cli: solo lo que ya esta en el indice persistente
+            index = DeviceIndex(self.logger)
+            self.device_info = (index.load() or {}).get(self.serial_number.strip())
+        info = self.device_info or {}
+        run = database.start_run(self.serial_number.strip(), self.testname, device=self.physical_path,
+                                 model=info.get('model'), firmware=info.get('firmware'),
+                                 pci_address=info.get('pci_address'), session=self.session)
+        run.step("initialize", self.init_duration, started_at=run.started_at - self.init_duration)
+        # Linea base del recorder: solo se guardan las latencias medidas durante esta prueba (el
+        # recorder es del proceso: incluye las pruebas que TestScheduler ejecute a la vez)
+        self._latency_baseline = default_recorder().to_dict()
+        self.nvme.results = run
+        return run
+
+    def finish_result_record(self, run, status, error=None):
+        if run is None:
+            return
+        self.nvme.results = None
+        run.latency(default_recorder(), baseline=self._latency_baseline)
+        run.finish(status, error)
 
     def set_final_result(self):
         """
@@ -0,0 +1,267 @@
+"""
+Capa de transporte para comandos NVMe passthru.
+
+Un transporte recibe un SubmissionQueueEntry y devuelve un CompletionQueueEntry.
+- IoctlTransport: mantiene abierto el fd del dispositivo y usa NVME_IOCTL_ADMIN_CMD /
+  NVME_IOCTL_IO_CMD directamente, sin crear procesos ni parsear texto.
+- CliTransport: camino de respaldo con nvme-cli (admin-passthru / io-passthru).
+
+Cualquier objeto con un metodo submit() compatible puede sustituirlos (por ejemplo un mock
+para probar sin drive).
+
+Ambos transportes registran la latencia de cada comando en el recorder de src/latency.py
+(medida por el host y, en CliTransport, tambien la reportada por nvme-cli).
+"""
+import ctypes
+import errno
+import os
+import struct
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Plataformas sin ioctl (Windows)
+    fcntl = None
+
+from .admin_passthru_wrappper import (AdminPassthru, CompletionQueueEntry, CONST_TIMEOUT_LIMIT,
+                                      SECONDS_TO_MILISECONS, FUSE_FLAG_MASK, PSDT_FLAG_BIT,
+                                      PSDT_FLAG_MASK, MICROSECONDS_TO_MILISECONDS, DW0, DW1, DW2, DW3)
+from .latency import default_recorder, opcode_key
+
+# linux/nvme_ioctl.h: _IOWR('N', 0x41 / 0x43, struct nvme_passthru_cmd)
+NVME_IOCTL_ADMIN_CMD = 0xC0484E41
+NVME_IOCTL_IO_CMD = 0xC0484E43
+
+# struct nvme_passthru_cmd (72 bytes):
+# opcode, flags, rsvd1, nsid, cdw2, cdw3, metadata, addr, metadata_len, data_len,
+# cdw10..cdw15, timeout_ms, result
+PASSTHRU_CMD = struct.Struct("<BBHIIIQQIIIIIIIIII")
+PASSTHRU_RESULT = struct.Struct("<I")
+PASSTHRU_RESULT_OFFSET = 68
+
+# El ioctl devuelve el Status Field del CQE (DW3 bits 31:17) desplazado a bit 0
+STATUS_FIELD_MASK = 0x7FFF
+STATUS_FIELD_BIT = 17
+
+DWORD_MASK = 0xFFFFFFFF
+
+# Errores de ioctl que indican que el camino nativo no es usable en este host/dispositivo
+FALLBACK_ERRNOS = (errno.ENOTTY, errno.EPERM, errno.EACCES)
+
+TRANSPORT_ENV = "NVME_TRANSPORT"
+TRANSPORT_AUTO = "auto"
+TRANSPORT_CLI = "cli"
+TRANSPORT_IOCTL = "ioctl"
+TRANSPORT_EMULATOR = "emulator"
+
+
+def _dword(value):
+    """Convierte un campo del SQE (None, int o str hex) a un dword."""
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        value = int(value, 0)
+    return int(value) & DWORD_MASK
+
+
+class NvmeTransport(object):
+    """Interfaz base de transporte."""
+    name = "base"
+
+    def submit(self, device_path, sqe, data_len=None, read=False, write=False, io=False):
+        """
+        Envia un comando y espera su completion.
+
+        Args:
+            device_path (str): Ruta del controlador (/dev/nvmeX) o namespace (/dev/nvmeXnY)
+            sqe (SubmissionQueueEntry): Comando a enviar
+            data_len (int): Tamano del buffer de datos en bytes
+            read (bool): Transferencia dispositivo -> host
+            write (bool): Transferencia host -> dispositivo (usa sqe.data_buffer)
+            io (bool): True para comandos de I/O, False para admin
+
+        Returns:
+            CompletionQueueEntry: Resultado del comando
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class CliTransport(NvmeTransport):
+    """Transporte de respaldo: un proceso nvme-cli por comando."""
+    name = TRANSPORT_CLI
+
+    def __init__(self, recorder=None):
+        self.passthru = AdminPassthru(transport=self)
+        self.recorder = recorder if recorder is not None else default_recorder()
+
+    def submit(self, device_path, sqe, data_len=None, read=False, write=False, io=False):
+        start = time.perf_counter()
+        cqe = self.passthru.submit_cli(sqe, device_path, data_len=data_len, read=read, write=write, io=io)
+        elapsed_ms = (time.perf_counter() - start) * SECONDS_TO_MILISECONS
+        cqe.elapsed_time = elapsed_ms
+        # cqe.latency es la latencia reportada por nvme-cli (--latency), en ms; None si no la imprimio
+        cli_us = cqe.latency * MICROSECONDS_TO_MILISECONDS if cqe.latency is not None else None
+        self.recorder.record(device_path, opcode_key(_dword(sqe.OPC), io),
+                             host_us=elapsed_ms * MICROSECONDS_TO_MILISECONDS, cli_us=cli_us)
+        return cqe
+
+
+class IoctlTransport(NvmeTransport):
+    """Transporte nativo: ioctl NVMe sobre un fd persistente por dispositivo."""
+    name = TRANSPORT_IOCTL
+
+    def __init__(self, fallback=None, timeout_ms=CONST_TIMEOUT_LIMIT * SECONDS_TO_MILISECONS, recorder=None):
+        """
+        Args:
+            fallback (NvmeTransport): Transporte a usar si el dispositivo no acepta ioctl
+            timeout_ms (int): Timeout del comando en milisegundos (0 = default del kernel)
+            recorder (LatencyRecorder): Destino de las latencias (None = default_recorder())
+        """
+        if fcntl is None:
+            raise OSError(errno.ENOSYS, "ioctl is not available on this platform")
+        self.fallback = fallback
+        self.timeout_ms = timeout_ms
+        self.recorder = recorder if recorder is not None else default_recorder()
+        self._fds = {}
+        self._lock = threading.Lock()
+
+    def _get_fd(self, device_path):
+        fd = self._fds.get(device_path)
+        if fd is None:
+            with self._lock:
+                fd = self._fds.get(device_path)
+                if fd is None:
+                    fd = os.open(device_path, os.O_RDWR)
+                    self._fds[device_path] = fd
+        return fd
+
+    def _forget_fd(self, device_path):
+        with self._lock:
+            fd = self._fds.pop(device_path, None)
+        if fd is not None:
+            os.close(fd)
+
+    def submit(self, device_path, sqe, data_len=None, read=False, write=False, io=False):
+        try:
+            fd = self._get_fd(device_path)
+        except OSError:
+            if self.fallback is None:
+                raise
+            return self.fallback.submit(device_path, sqe, data_len=data_len, read=read, write=write, io=io)
+
+        if write:
+            data = sqe.data_buffer
+            if not isinstance(data, bytearray):
+                data = bytearray(data)
+            if data_len is None:
+                data_len = len(data)
+            elif data_len > len(data):
+                # El kernel transfiere data_len bytes: el resto del buffer se completa con ceros
+                padded = bytearray(data_len)
+                padded[:len(data)] = data
+                data = padded
+        else:
+            data = bytearray(data_len or 0)
+        data_len = data_len or 0
+
+        addr = 0
+        c_buffer = None
+        if data_len:
+            c_buffer = (ctypes.c_char * len(data)).from_buffer(data)
+            addr = ctypes.addressof(c_buffer)
+
+        flags = (_dword(sqe.FUSE) & FUSE_FLAG_MASK) | ((_dword(sqe.PSDT) & PSDT_FLAG_MASK) << PSDT_FLAG_BIT)
+        cmd = bytearray(PASSTHRU_CMD.size)
+        PASSTHRU_CMD.pack_into(cmd, 0,
+                               _dword(sqe.OPC) & 0xFF, flags, 0,
+                               _dword(sqe.NSID), _dword(sqe.DW2), _dword(sqe.DW3),
+                               0, addr, 0, data_len,
+                               _dword(sqe.DW10), _dword(sqe.DW11), _dword(sqe.DW12),
+                               _dword(sqe.DW13), _dword(sqe.DW14), _dword(sqe.DW15),
+                               self.timeout_ms, 0)
+
+        request = NVME_IOCTL_IO_CMD if io else NVME_IOCTL_ADMIN_CMD
+        start = time.perf_counter()
+        try:
+            status = fcntl.ioctl(fd, request, cmd, True)
+        except OSError as e:
+            if e.errno not in FALLBACK_ERRNOS or self.fallback is None:
+                raise
+            self._forget_fd(device_path)
+            return self.fallback.submit(device_path, sqe, data_len=data_len, read=read, write=write, io=io)
+        finally:
+            del c_buffer
+        elapsed_ms = (time.perf_counter() - start) * SECONDS_TO_MILISECONS
+        self.recorder.record(device_path, opcode_key(_dword(sqe.OPC), io),
+                             host_us=elapsed_ms * MICROSECONDS_TO_MILISECONDS)
+
+        status_dwords = {
+            DW0: PASSTHRU_RESULT.unpack_from(cmd, PASSTHRU_RESULT_OFFSET)[0],
+            DW1: 0,
+            DW2: 0,
+            DW3: (status & STATUS_FIELD_MASK) << STATUS_FIELD_BIT,
+        }
+        cqe = CompletionQueueEntry()
+        cqe.populate_cqe(status_dwords, data)
+        cqe.latency = elapsed_ms
+        cqe.elapsed_time = elapsed_ms
+        return cqe
+
+    def close(self):
+        with self._lock:
+            fds = list(self._fds.values())
+            self._fds.clear()
+        for fd in fds:
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+_default_transports = {}
+_default_lock = threading.Lock()
+
+
+def default_transport(kind=None):
+    """
+    Devuelve el transporte compartido del proceso.
+
+    Args:
+        kind (str): "auto" (ioctl con respaldo nvme-cli), "ioctl", "cli" o "emulator"
+                    (emulador en proceso sobre NVME_EMULATOR_DIR, ver src/emulator.py).
+                    Por defecto se toma de la variable de entorno NVME_TRANSPORT.
+
+    Returns:
+        NvmeTransport: Instancia compartida (los fd se reutilizan entre llamadas)
+    """
+    if kind is None:
+        kind = os.environ.get(TRANSPORT_ENV, TRANSPORT_AUTO).lower()
+    if kind == TRANSPORT_AUTO and fcntl is None:
+        kind = TRANSPORT_CLI
+
+    with _default_lock:
+        transport = _default_transports.get(kind)
+        if transport is None:
+            if kind == TRANSPORT_CLI:
+                transport = CliTransport()
+            elif kind == TRANSPORT_IOCTL:
+                transport = IoctlTransport()
+            elif kind == TRANSPORT_AUTO:
+                transport = IoctlTransport(fallback=CliTransport())
+            elif kind == TRANSPORT_EMULATOR:
+                from .emulator import EmulatorTransport
+                transport = EmulatorTransport()
+            else:
+                raise ValueError(f"Unknown NVMe transport: {kind}")
+            _default_transports[kind] = transport
+    return transport
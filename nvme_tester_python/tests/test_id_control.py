@@ -1,20 +1,13 @@
-import json
-import sys
-import os
-
-# Path to read the json from anywhere
-file_path = os.path.join(os.path.dirname(os.path.abspath(os.path.join(__file__, ".."))),  # up to main.py's folder
-                         "utils", "json", "idcontrol.json"
-                         )
-
 from src.nvme_wrapper import NvmeCommands
 from src.logger import TestLogger
-
-# Path to the JSON file with expected values (relative to this file)
-file_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "utils", "json", "idcontrol.json")
+from src.scheduler import CONTROLLER_SHARED
+from src.golden_profile import default_store
 
 
 class NvmeIdCtrlTest:
+    # Solo identify: puede coincidir con cualquier prueba no destructiva
+    RESOURCES = (CONTROLLER_SHARED,)
+
     def __init__(self, nvme_wrapper, logger):
         self.nvme = nvme_wrapper
         self.logger = logger
@@ -29,49 +22,34 @@ class NvmeIdCtrlTest:
             self.logger.log_test_end("test_id_ctrl", "FAIL")
             return False
         
-        self.logger.info(f"Comando ejecutado exitosamente. Cargando archivo de referencia: {file_path}")
-        
-        try:
-            with open(file_path, "r") as f:
-                reference = json.load(f)
-            self.logger.info(f"Archivo de referencia cargado exitosamente con {len(reference)} campos")
-        except FileNotFoundError:
-            self.logger.error(f"No se encontró el archivo de referencia: {file_path}")
-            self.logger.log_test_end("test_id_ctrl", "FAIL")
-            return False
-        except json.JSONDecodeError as e:
-            self.logger.error(f"Error al decodificar JSON: {e}")
+        store = default_store()
+        for problem in store.errors:
+            self.logger.warning(f"Perfil de referencia descartado: {problem}")
+        profile = store.lookup(output.get('mn', ""), output.get('fr', ""))
+        if profile is None:
+            self.logger.error(f"No hay perfil de referencia para modelo '{str(output.get('mn', '')).strip()}' "
+                              f"firmware '{str(output.get('fr', '')).strip()}' "
+                              f"(firmwares con perfil: {store.firmwares(output.get('mn', ''))})")
             self.logger.log_test_end("test_id_ctrl", "FAIL")
             return False
-        
-        ignore_fields = ["sn", "fguid", "unvmcap", "subnqn"]
-        self.logger.info(f"Campos ignorados en la comparación: {ignore_fields}")
-        
-        errors = 0
-        matches = 0
-        total_fields = len([k for k in reference.keys() if k not in ignore_fields])
-        
-        self.logger.info(f"Iniciando comparación de {total_fields} campos...")
-        
-        for key, expected_value in reference.items():
-            if key in ignore_fields:
-                self.logger.debug(f"Campo '{key}' ignorado como se esperaba")
-                continue
-                
-            actual_value = output.get(key)
-            if actual_value != expected_value:
-                errors += 1
-                self.logger.error(f" Campo '{key}': esperado '{expected_value}', encontrado '{actual_value}'")
-            else:
-                matches += 1
-                self.logger.info(f" Campo '{key}' coincide: {actual_value}")
-        
+        self.logger.info(f"Comando ejecutado exitosamente. Perfil de referencia: {profile.source}")
+        self.logger.info(f"Campos ignorados en la comparación: {list(profile.ignore)}")
+
+        result = profile.compare(output)
+        total_fields = result['compared']
+        errors = len(result['mismatches'])
+        matches = total_fields - errors
+        if result['fast_path']:
+            self.logger.debug("Campos exactos verificados por hash del perfil")
+        for key, expected_value, actual_value in result['mismatches']:
+            self.logger.error(f" Campo '{key}': esperado '{expected_value}', encontrado '{actual_value}'")
+
         # Resumen de resultados
         self.logger.info(f"Resumen de comparación:")
         self.logger.info(f"  - Total de campos comparados: {total_fields}")
         self.logger.info(f"  - Campos que coinciden: {matches}")
         self.logger.info(f"  - Campos con errores: {errors}")
-        self.logger.info(f"  - Tasa de éxito: {(matches/total_fields)*100:.1f}%")
+        self.logger.info(f"  - Tasa de éxito: {(matches/total_fields)*100:.1f}%" if total_fields else "  - Tasa de éxito: n/a")
         
         if errors == 0:
             self.logger.info(" Todos los campos coinciden perfectamente!")
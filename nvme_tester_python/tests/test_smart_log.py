@@ -9,6 +9,10 @@ from src.admin_passthru_wrappper import AdminPassthru, SubmissionQueueEntry, Com
 from utils.get_smart_log import passthruSmartLog
 from src.nvme_wrapper import NvmeCommands
 from src.logger import TestLogger
+from src.smart_log import SmartLog
+from src.scheduler import CONTROLLER_SHARED, NAMESPACE_EXCLUSIVE
+from src.latency import default_recorder, opcode_key, SOURCE_CLI, SOURCE_HOST
+from src.results_db import SNAPSHOT_SMART
 
 #Instanciar dentro de mi objeto de test clase
 smart_Log_InstanceAdminPassthru = passthruSmartLog()
@@ -20,6 +24,11 @@ class NvmeSmartLogTemperatureTest():
     This class contains test cases for NVMe commands.
     It is designed to be used with the NVMe wrapper to execute various NVMe commands.
     """
+    # Compara contadores SMART antes/despues de su propio I/O: no comparte el namespace
+    RESOURCES = (CONTROLLER_SHARED, NAMESPACE_EXCLUSIVE)
+    # SLO de latencia de Get Log Page (p99 medido por el host, microsegundos)
+    GET_LOG_PAGE_P99_SLO_US = 100000
+
     def __init__(self, nvme_wrapper, logger):
         self.nvme_wrapper = nvme_wrapper
         self.logger = logger   
@@ -27,6 +36,8 @@ class NvmeSmartLogTemperatureTest():
 
     def run(self):
         self.logger.log_test_start("test_smart_log")
+        # Linea base del recorder del proceso: el SLO se valida solo con los comandos de esta prueba
+        latency_baseline = default_recorder().to_dict()
         # Test 2: SMART-LOG
         #     Purpose: Create a dynamic test to validate nvme smart-log command is working as expected.
         #     Execution Steps:
@@ -52,33 +63,26 @@ class NvmeSmartLogTemperatureTest():
                 return None
             
             self.logger.log_command("get_smart_log", "SUCCESS" if cqe_result.data_buffer else "FAIL")
+            self.nvme_wrapper.record_snapshot(SNAPSHOT_SMART, cqe_result.data_buffer, label="initial")
              #     nvme admin-passthru /dev/nvme0 --opcode=0x0A --cdw10=0x04 --data-len=16 --read
-            if cqe_result.data_buffer and len(cqe_result.data_buffer) >= 512:
+            smart_initial = SmartLog.from_cqe(cqe_result)
+            if smart_initial is not None:
                 self.logger.info("get_smart_log executed successfully.")
                  # Critical Warning (byte 0)
-                critial_warning = cqe_result.data_buffer[0:1]
+                critial_warning = smart_initial.critical_warning
                 #logger
                 #     - Check temperature is within threshold using Get Features FID 0x4.
                
                 #     - Change temperature threshold and critical warning using set-feature.
                 #Temperature (byte 1-2)
-                temp_kelvin = int.from_bytes(cqe_result.data_buffer[1:3], byteorder='little')
-                temp_celsius = temp_kelvin - 273.15 # Convert Kelvin to Celsius
+                temp_kelvin = smart_initial.temperature
+                temp_celsius = smart_initial.temperature_celsius # Convert Kelvin to Celsius
                 self.logger.info(f"Temperature in Kelvin: {temp_kelvin}")
                 self.logger.info(f"Temperature in Celsius: {temp_celsius}")
                 #     - Validate POH (Power On Hours) is less than 1000.
                 #     Check bits 143:128 🡪 0x8F : 0x80
                 #     Power On Hours (POH) (bytes 128-143, 16 bytes little endian)
-                #     According to NVMe 1.4 spec: Power On Hours is at offset 128-143 (16 bytes)
-                
-                # Read POH correctly - it's at bytes 128-143, but actual value is at offset 8 within this range
-                poh_bytes_full = cqe_result.data_buffer[128:144]  # 16 bytes: 128-143
-                
-                # Debug: print raw bytes to see what we're getting
-                self.logger.info(f"POH raw bytes (first 16): {' '.join(f'{b:02x}' for b in poh_bytes_full)}")
-                
-                # POH actual value is at bytes 8-11 within the 16-byte field (offset 136-139 absolute)
-                poh = int.from_bytes(poh_bytes_full[8:12], byteorder='little')
+                poh = smart_initial.power_on_hours
                 
                 #logger
                 self.logger.info(f"Power On Hours (POH): {poh} hours")
@@ -91,9 +95,7 @@ class NvmeSmartLogTemperatureTest():
                 #Media and Data Integrity Errors (bytes 160-175, 16 bytes little endian)
                 #     According to NVMe 1.4 spec: Media and Data Integrity Errors at offset 160-175
                 #     MDIE = 0
-                media_errors_bytes = cqe_result.data_buffer[160:176]  # 16 bytes: 160-175 (176 is exclusive)
-                # Use first 8 bytes to avoid overflow
-                media_errors = int.from_bytes(media_errors_bytes[:8], byteorder='little')
+                media_errors = smart_initial.media_errors
                 #logger
                 self.logger.info(f"Media and Data Integrity Errors: {media_errors}")
                 
@@ -103,29 +105,11 @@ class NvmeSmartLogTemperatureTest():
                 # Data Units Written: bytes 48-63 (16 bytes)  
                 # Host Read Commands: bytes 64-79 (16 bytes)
                 # Host Write Commands: bytes 80-95 (16 bytes)
-                initial_data_units_read_bytes = cqe_result.data_buffer[32:48]
-                initial_data_units_written_bytes = cqe_result.data_buffer[48:64]
-                initial_host_read_bytes = cqe_result.data_buffer[64:80]
-                initial_host_write_bytes = cqe_result.data_buffer[80:96]
+                initial_data_units_read = smart_initial.data_units_read
+                initial_data_units_written = smart_initial.data_units_written
+                initial_host_read_32 = smart_initial.host_read_commands
                 
-                initial_data_units_read = int.from_bytes(initial_data_units_read_bytes[:4], byteorder='little')
-                initial_data_units_written = int.from_bytes(initial_data_units_written_bytes[:4], byteorder='little')
-                # Host commands positioning corrected based on analysis
-                initial_host_read_32 = int.from_bytes(initial_host_read_bytes[4:8], byteorder='little')
-                
-                # WORKAROUND: Get initial host write commands using direct nvme command
-                try:
-                    import subprocess
-                    result_json = subprocess.run(['nvme', 'smart-log', device_path.replace('n1', ''), '--output-format=json'], 
-                                               capture_output=True, text=True, check=True)
-                    import json
-                    smart_data = json.loads(result_json.stdout)
-                    initial_host_write_32 = smart_data.get('host_write_commands', 0)
-                    self.logger.info(f"Initial host write commands (direct): {initial_host_write_32}")
-                except Exception as e:
-                    # Fallback to original method if direct command fails
-                    initial_host_write_32 = int.from_bytes(initial_host_write_bytes[4:8], byteorder='little')
-                    self.logger.warning(f"Direct nvme command failed for initial values, using fallback: {e}")
+                initial_host_write_32 = smart_initial.host_write_commands
                 
                 self.logger.info(f"Initial Data Units Read: {initial_data_units_read}")
                 self.logger.info(f"Initial Data Units Written: {initial_data_units_written}")
@@ -133,7 +117,7 @@ class NvmeSmartLogTemperatureTest():
                 self.logger.info(f"Initial Host write commands: {initial_host_write_32}")
                                 
                 #     - Verify percentage usage is less than 100%.
-                usage_percentage = cqe_result.data_buffer[5]
+                usage_percentage = smart_initial.percent_used
                 self.logger.info(f"Usage percentage: {usage_percentage}")
                 if usage_percentage < 100:
                     self.logger.info("Usage percentage is less than 100%. Test passed.")
@@ -162,7 +146,8 @@ class NvmeSmartLogTemperatureTest():
                             block_count=1, 
                             data_size=512,
                             data=temp_data_file,
-                            force=True  # Add force flag to avoid permission issues
+                            force=True,  # Add force flag to avoid permission issues
+                            direct_io=True  # O_DIRECT sobre el namespace, sin lanzar nvme-cli
                         )
                         
                         # Execute read command
@@ -170,7 +155,8 @@ class NvmeSmartLogTemperatureTest():
                             start_block=0, 
                             block_count=1,
                             data_size=512,
-                            force=True  # Add force flag to avoid permission issues
+                            force=True,  # Add force flag to avoid permission issues
+                            direct_io=True
                         )
                         
                         self.logger.info(f"Iteration {i+1}: Write={write_result is not None}, Read={read_result is not None}")
@@ -193,41 +179,24 @@ class NvmeSmartLogTemperatureTest():
                     return None
                 
                 self.logger.log_command("get_smart_log_final", "SUCCESS" if cqe_result_final.data_buffer else "FAIL")
-                if cqe_result_final.data_buffer and len(cqe_result_final.data_buffer) >= 512:
-                    self.logger.info("Final get_smart_log executed successfully.")
+                self.nvme_wrapper.record_snapshot(SNAPSHOT_SMART, cqe_result_final.data_buffer, label="final")
+                smart_final = SmartLog.from_cqe(cqe_result_final)
+                if smart_final is None:
+                    self.logger.error("Final get_smart_log returned insufficient data.")
+                    self.logger.log_test_end("test_smart_log", "FAIL")
+                    return None
+                self.logger.info("Final get_smart_log executed successfully.")
                 #     - Verify host_read_commands and host_write_commands increased by N.
                 #     According to NVMe 1.4 spec (corrected offsets): 
                 #     Data Units Read: bytes 32-47 (16 bytes)
                 #     Data Units Written: bytes 48-63 (16 bytes)
                 #     Host Read Commands: bytes 64-79 (16 bytes)  
                 #     Host Write Commands: bytes 80-95 (16 bytes)
-                final_data_units_read_bytes = cqe_result_final.data_buffer[32:48]
-                final_data_units_written_bytes = cqe_result_final.data_buffer[48:64]
-                final_host_read_bytes = cqe_result_final.data_buffer[64:80]
-                final_host_write_bytes = cqe_result_final.data_buffer[80:96]
-                
-                # Debug: print raw bytes
-                self.logger.info(f"Final Host Read raw bytes: {' '.join(f'{b:02x}' for b in final_host_read_bytes[:8])}")
-                self.logger.info(f"Final Host Write raw bytes: {' '.join(f'{b:02x}' for b in final_host_write_bytes[:8])}")
+                final_data_units_read = smart_final.data_units_read
+                final_data_units_written = smart_final.data_units_written
+                final_host_read_32 = smart_final.host_read_commands
                 
-                # Read values - Host commands positioning corrected based on analysis
-                final_data_units_read = int.from_bytes(final_data_units_read_bytes[:4], byteorder='little')
-                final_data_units_written = int.from_bytes(final_data_units_written_bytes[:4], byteorder='little')
-                final_host_read_32 = int.from_bytes(final_host_read_bytes[4:8], byteorder='little')
-                
-                # WORKAROUND: Host Write Commands - use direct nvme command due to data processing issues
-                try:
-                    import subprocess
-                    result_json = subprocess.run(['nvme', 'smart-log', device_path.replace('n1', ''), '--output-format=json'], 
-                                               capture_output=True, text=True, check=True)
-                    import json
-                    smart_data = json.loads(result_json.stdout)
-                    final_host_write_32 = smart_data.get('host_write_commands', 0)
-                    self.logger.info(f"Using direct nvme command for host write commands: {final_host_write_32}")
-                except Exception as e:
-                    # Fallback to original method if direct command fails
-                    final_host_write_32 = int.from_bytes(final_host_write_bytes[4:8], byteorder='little')
-                    self.logger.warning(f"Direct nvme command failed, using fallback: {e}")
+                final_host_write_32 = smart_final.host_write_commands
                 
                 self.logger.info(f"Final Data Units Read: {final_data_units_read}")
                 self.logger.info(f"Final Data Units Written: {final_data_units_written}")
@@ -245,10 +214,22 @@ class NvmeSmartLogTemperatureTest():
                     self.logger.info(f" Command counters increased correctly (R+{read_increase}, W+{write_increase} >= {N_times})")
                 else:
                     self.logger.warning(f" Command counters may not have increased as expected (R+{read_increase}, W+{write_increase}, expected >= {N_times})")
+
+                #     - Validate Get Log Page latency SLO (percentiles in src/latency.py).
+                #     Con el transporte nvme-cli la latencia del host incluye el arranque del proceso:
+                #     se valida la que reporta nvme-cli (--latency) si la hay
+                recorder = default_recorder().since(latency_baseline)
+                source = SOURCE_CLI if recorder.select(device_path, opcode_key(0x02), SOURCE_CLI).count \
+                    else SOURCE_HOST
+                latency_ok = recorder.check_slo(99, self.GET_LOG_PAGE_P99_SLO_US, device=device_path,
+                                                opcode=opcode_key(0x02), source=source, logger=self.logger)
+                if not latency_ok:
+                    self.logger.log_test_end("test_smart_log", "FAIL")
+                    return None
                     
                 #     - Validate critical warning was updated and temperature reset.
-                critial_warning_after = cqe_result_final.data_buffer[0:1]
-                temp_kelvin_after = int.from_bytes(cqe_result_final.data_buffer[1:3],byteorder='little')
+                critial_warning_after = smart_final.critical_warning
+                temp_kelvin_after = smart_final.temperature
                 self.logger.info(f"Critical warning after: {critial_warning_after}")
                 self.logger.info(f"Temperature in Kelvin after: {temp_kelvin_after}")
                 if critial_warning_after == critial_warning and temp_kelvin_after == temp_kelvin:
@@ -7,6 +7,9 @@ from src.admin_passthru_wrappper import AdminPassthru, SubmissionQueueEntry, Com
 from utils.get_ID_NS import passthruID_NS
 from src.nvme_wrapper import NvmeCommands
 from src.logger import TestLogger
+from src.scheduler import DESTRUCTIVE
+from src.readiness import UeventListener
+from src.results_db import SNAPSHOT_ID_NS
 
 #Instanciar dentro de mi objeto de test clase
 passthruIDInstance = passthruID_NS()
@@ -14,7 +17,8 @@ passthruIDInstance = passthruID_NS()
           
 
 class TestSmartLogHealt():
-   
+    # Borra, crea y formatea namespaces
+    RESOURCES = (DESTRUCTIVE,)
 
     def __init__(self, nvme_wrapper, logger):
         self.nvme_wrapper = nvme_wrapper
@@ -24,6 +28,8 @@ class TestSmartLogHealt():
 
     def run(self):
         self.logger.log_test_start("test_smart_log_healt")
+        # Se abre antes de borrar/crear/formatear para despertar las esperas con cada uevent
+        uevents = UeventListener()
         
         try:
             # Test 3: ID-NS
@@ -52,10 +58,11 @@ class TestSmartLogHealt():
                 import subprocess
                 import json
                 result = subprocess.run(
-                    ['nvme', 'id-ns', device_path, '--output-format=json'],
+                    [self.nvme_wrapper.nvme_cli, 'id-ns', device_path, '--output-format=json'],
                     capture_output=True, text=True, check=True
                 )
                 id_ns_data = json.loads(result.stdout)
+                self.nvme_wrapper.record_snapshot(SNAPSHOT_ID_NS, result.stdout, label="initial")
                 
                 # Extract values from JSON output
                 nsze = id_ns_data.get('nsze', 0)
@@ -139,9 +146,9 @@ class TestSmartLogHealt():
             except Exception as e:
                 self.logger.warning(f"Delete namespaces failed (this might be expected): {e}")
 
-            # Wait a moment for the system to process the deletion
-            import time
-            time.sleep(2)
+            # Wait for the deletion to be reflected in the active NS list and sysfs
+            if not self.nvme_wrapper.wait_namespaces_deleted(wake=uevents):
+                self.logger.warning("Namespaces still reported after delete; continuing")
             
             self.logger.info("Creating new namespace...")
             # - Create namespace with reasonable size (smaller size for testing)
@@ -183,8 +190,11 @@ class TestSmartLogHealt():
                 self.logger.log_test_end("test_smart_log_healt", "FAIL")
                 return None
             
-            # Wait for namespace to be ready
-            time.sleep(3)
+            # Wait for namespace to be ready (active, in sysfs and with block device node)
+            if not self.nvme_wrapper.wait_namespace_ready(nsid=1, wake=uevents):
+                self.logger.error("Namespace 1 did not become ready after attach.")
+                self.logger.log_test_end("test_smart_log_healt", "FAIL")
+                return None
             
             # - Format the block size of the drive
             self.logger.info("Formatting namespace with 4096 byte blocks...")
@@ -206,8 +216,12 @@ class TestSmartLogHealt():
                 self.logger.log_test_end("test_smart_log_healt", "FAIL")
                 return None
                 
-            # Wait for format to complete
-            time.sleep(3)
+            # Wait for format to complete and the namespace block device to come back
+            if not self.nvme_wrapper.wait_format_complete(nsid=1, block_size=4096, wake=uevents) \
+                    or not self.nvme_wrapper.wait_namespace_ready(nsid=1, wake=uevents):
+                self.logger.error("Format did not complete in time.")
+                self.logger.log_test_end("test_smart_log_healt", "FAIL")
+                return None
 
             # - Execute nvme write.
             self.logger.info("Executing write command...")
@@ -289,10 +303,11 @@ class TestSmartLogHealt():
             # Workaround: Use direct nvme command for final ID-NS as well
             try:
                 result_final = subprocess.run(
-                    ['nvme', 'id-ns', device_path, '--output-format=json'],
+                    [self.nvme_wrapper.nvme_cli, 'id-ns', device_path, '--output-format=json'],
                     capture_output=True, text=True, check=True
                 )
                 id_ns_data_final = json.loads(result_final.stdout)
+                self.nvme_wrapper.record_snapshot(SNAPSHOT_ID_NS, result_final.stdout, label="final")
                 
                 # Extract final values from JSON output
                 nsze_after = id_ns_data_final.get('nsze', 0)
@@ -438,5 +453,7 @@ class TestSmartLogHealt():
             self.logger.error(f"Error during test execution: {e}")
             self.logger.log_test_end("test_smart_log_healt", "ERROR")
             return None
+        finally:
+            uevents.close()
 
       
\ No newline at end of file
@@ -4,7 +4,7 @@ import os
 # Add the parent directory to the path to import modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from src.admin_passthru_wrappper import AdminPassthru, SubmissionQueueEntry, CompletionQueueEntry
+from src.admin_passthru_wrappper import AdminPassthru, SubmissionQueueEntry
 
 ### Get Features Consts
 OPC_GET_FEATURES = 0x0A
@@ -43,23 +43,8 @@ class GetFeatures(AdminPassthru):
         sqe.DW14 = (uuid << UUIDI_BIT) & UUIDI_MASK
 
         try:
-            output, err, return_code, status_dwords = self.admin_passthru(opcode=sqe.OPC,
-                                                                          namespace_id=sqe.NSID,
-                                                                          cdw10=sqe.DW10,
-                                                                          cdw11=sqe.DW11,
-                                                                          cdw12=sqe.DW12,
-                                                                          cdw13=sqe.DW13,
-                                                                          cdw14=sqe.DW14,
-                                                                          cdw15=sqe.DW15,
-                                                                          use_controller_path=True,
-                                                                          latency=True,
-                                                                          raw_binary=True,
-                                                                          read=True,
-                                                                          data_len=None,
-                                                                          device_path=device)
+            cqe = self.submit_sqe(sqe, device, data_len=None, read=True)
         except:
             return None
     
-        cqe = CompletionQueueEntry()
-        cqe.populate_cqe(status_dwords, output)
         return cqe
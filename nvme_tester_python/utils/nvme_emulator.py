@@ -0,0 +1,17 @@
+#!/usr/bin/env python3
+"""
+Ejecutable sustituto de nvme-cli respaldado por src/emulator.py.
+
+Uso:
+    export NVME_CLI=$PWD/utils/nvme_emulator.py NVME_EMULATOR_DIR=/tmp/nvme-emu
+    utils/nvme_emulator.py list --output-format=json
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.emulator import main
+
+if __name__ == "__main__":
+    sys.exit(main())